@@ -5,6 +5,10 @@ Add food code chunks to knowledge base.
 import json
 from pathlib import Path
 from embeddings import ChunkEmbeddingManager, create_embedding_generator
+from embedding_cache import create_chunk_embedding_cache
+from embedding_checkpoint import EmbeddingCheckpoint, checkpoint_path
+from citation_graph import CITATION_GRAPH_FILE, build_citation_graph
+from fact_index import FACT_INDEX_FILE, build_fact_index
 import os
 
 def main():
@@ -26,14 +30,27 @@ def main():
         api_key=os.getenv('OPENAI_API_KEY')
     )
     
-    food_code_with_embeddings = []
-    for i, chunk in enumerate(food_code_chunks):
-        print(f'Generating embedding {i+1}/{len(food_code_chunks)}: {chunk["citation"]}')
-        embedding = embedding_generator.generate_embedding(chunk['content'])
-        chunk['embedding'] = embedding
-        food_code_with_embeddings.append(chunk)
+    # Only chunks whose content changed are sent to the provider
+    chunk_embedding_cache = create_chunk_embedding_cache(existing_file.parent)
+    embedding_manager = ChunkEmbeddingManager(
+        embedding_generator,
+        str(existing_file.parent),
+        embedding_cache=chunk_embedding_cache
+    )
+    
+    # Completed batches are checkpointed; rerunning after a failure resumes from there
+    checkpoint = EmbeddingCheckpoint(checkpoint_path(existing_file), embedding_generator.model)
+    
+    # Generate embeddings in token-packed batches (up to the provider limits)
+    food_code_with_embeddings = embedding_manager.embed_chunk_list(
+        food_code_chunks,
+        checkpoint=checkpoint,
+        keep_embeddings=False
+    )
     
     print(f'\n✓ Generated embeddings for {len(food_code_with_embeddings)} chunks')
+    cache_stats = chunk_embedding_cache.stats()
+    print(f'  Reused {cache_stats["hits"]} cached embeddings, generated {cache_stats["misses"]}')
     
     # Load existing chunks
     with open(existing_file, 'r') as f:
@@ -45,11 +62,15 @@ def main():
     merged_chunks = existing_chunks + food_code_with_embeddings
     print(f'Total chunks after merge: {len(merged_chunks)}')
     
-    # Save
-    with open(existing_file, 'w') as f:
-        json.dump(merged_chunks, f, indent=2, ensure_ascii=False)
+    # Save (food code embeddings streamed from the checkpoint)
+    checkpoint.write_index(merged_chunks, existing_file)
+    checkpoint.remove()
     
     print(f'✓ Saved merged chunks to {existing_file}')
+    
+    # Rebuild citation graph for the merged index
+    build_citation_graph(merged_chunks, str(existing_file.parent / CITATION_GRAPH_FILE))
+    build_fact_index(merged_chunks, str(existing_file.parent / FACT_INDEX_FILE))
     print(f'\nSummary:')
     print(f'  Existing chunks: {len(existing_chunks)}')
     print(f'  Food code chunks: {len(food_code_with_embeddings)}')
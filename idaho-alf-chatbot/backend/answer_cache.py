@@ -0,0 +1,178 @@
+"""
+Semantic answer cache for Idaho ALF RegNavigator
+Reuses answers for near-duplicate questions that retrieve the same regulations.
+"""
+
+import os
+import copy
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Bounded cache of answers keyed by query embedding, retrieved chunk set and KB version."""
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 512):
+        """
+        Initialize semantic answer cache.
+
+        Args:
+            similarity_threshold: Minimum cosine similarity between questions for a hit
+            max_entries: Maximum number of cached answers (least recently used are evicted;
+                0 stores nothing)
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+
+        # entry_id -> entry; the matrix row for an entry is entry["slot"]
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._free_slots: List[int] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self,
+        query_embedding: List[float],
+        chunk_ids: List[str],
+        kb_version: str,
+        params: Tuple = ()
+    ) -> Optional[Dict]:
+        """
+        Find a cached answer for a similar question with the same retrieved chunks.
+
+        Args:
+            query_embedding: Embedding of the new question
+            chunk_ids: Chunk IDs retrieved for the new question
+            kb_version: Version of the knowledge base the answer must come from
+            params: Generation parameters that must match (e.g. temperature)
+
+        Returns:
+            Copy of the cached entry ({"response", "similarity", "chunk_ids"}), or None
+        """
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            vector = self._normalize(query_embedding)
+            similarities = self._vectors @ vector
+            chunk_set = frozenset(chunk_ids)
+
+            best_id = None
+            best_similarity = self.similarity_threshold
+            for entry_id, entry in self._entries.items():
+                similarity = float(similarities[entry["slot"]])
+                if (
+                    similarity >= best_similarity
+                    and entry["kb_version"] == kb_version
+                    and entry["chunk_set"] == chunk_set
+                    and entry["params"] == params
+                ):
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            entry = self._entries[best_id]
+            return {
+                "response": copy.deepcopy(entry["response"]),
+                "chunk_ids": list(entry["chunk_ids"]),
+                "similarity": min(best_similarity, 1.0)
+            }
+
+    def store(
+        self,
+        query_embedding: List[float],
+        chunk_ids: List[str],
+        kb_version: str,
+        response: Dict,
+        params: Tuple = ()
+    ):
+        """Cache an answer, evicting the least recently used entry when full."""
+        if self.max_entries <= 0:
+            return
+        vector = self._normalize(query_embedding)
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+            if not self._free_slots:
+                _, evicted = self._entries.popitem(last=False)
+                self._free_slots.append(evicted["slot"])
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[self._next_id] = {
+                "slot": slot,
+                "chunk_ids": tuple(chunk_ids),
+                "chunk_set": frozenset(chunk_ids),
+                "kb_version": kb_version,
+                "params": params,
+                "response": copy.deepcopy(response)
+            }
+            self._next_id += 1
+
+    def clear(self):
+        """Drop all cached answers (e.g. after the knowledge base changes)."""
+        with self._lock:
+            self._entries.clear()
+            self._vectors = None
+            self._free_slots = []
+
+    def stats(self) -> Dict:
+        """Hit ratio and size for the /stats endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+def create_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Create the semantic answer cache configured in the environment.
+
+    ANSWER_CACHE: "false" to disable (default on)
+    ANSWER_CACHE_THRESHOLD: Minimum question similarity for a hit (default 0.95)
+    ANSWER_CACHE_SIZE: Maximum cached answers (default 512, 0 to disable)
+
+    Returns:
+        SemanticAnswerCache instance, or None when disabled
+    """
+    if os.getenv("ANSWER_CACHE", "true").lower() in ("0", "false", "no"):
+        return None
+
+    max_entries = int(os.getenv("ANSWER_CACHE_SIZE", 512))
+    if max_entries <= 0:
+        return None
+
+    return SemanticAnswerCache(
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95)),
+        max_entries=max_entries
+    )
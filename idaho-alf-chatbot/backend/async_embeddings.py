@@ -0,0 +1,312 @@
+"""
+Async embedding client for Idaho ALF RegNavigator
+Concurrent batch embedding over one pooled keep-alive connection, with adaptive rate limiting.
+"""
+
+import re
+import base64
+import random
+import asyncio
+from typing import List, Dict, Callable, Optional
+
+import httpx
+import numpy as np
+
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset values like "1s", "6m0s", "20ms" or "2.5" (seconds)."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def decode_stored_embedding(blob: bytes) -> np.ndarray:
+    """
+    Embedding stored as little-endian float64 bytes (caches, checkpoints) as float32.
+
+    Every tier returns the float32 vectors decode_embeddings gives for a provider
+    response, so callers see one type wherever an embedding came from.
+    """
+    return np.frombuffer(blob, dtype="<f8").astype(np.float32)
+
+
+def decode_embeddings(result: Dict) -> List[np.ndarray]:
+    """
+    Embeddings of an OpenAI-style response, in input order.
+
+    Base64 items (encoding_format="base64") are little-endian float32 buffers decoded
+    without per-element Python floats; float-list items are accepted as well.
+    """
+    # The provider may return items out of order; "index" restores input order
+    data = sorted(result["data"], key=lambda item: item.get("index", 0))
+    return [
+        np.frombuffer(base64.b64decode(item["embedding"]), dtype="<f4")
+        if isinstance(item["embedding"], str)
+        else np.asarray(item["embedding"], dtype=np.float32)
+        for item in data
+    ]
+
+
+class EmbeddingRequestError(Exception):
+    """An embedding request failed for good."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, splittable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        # Rejected because of its contents (e.g. too many tokens): smaller batches may pass
+        self.splittable = splittable
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit that backs off on throttling and recovers on success (AIMD).
+
+    Also pauses all requests while the provider reports no remaining request budget.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._condition:
+            while True:
+                pause = self._paused_until - loop.time()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                await self._condition.wait()
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase: one more slot after a full window of successes."""
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self, delay: float):
+        """Multiplicative decrease and a shared pause after a 429."""
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+        self.pause(delay)
+
+    def pause(self, delay: float):
+        """Hold new requests for delay seconds."""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + delay)
+
+
+class AsyncEmbeddingClient:
+    """OpenAI-compatible /embeddings client sending several batches concurrently."""
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        model: str,
+        max_concurrency: int = 4,
+        timeout: float = 60.0,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        encoding_format: Optional[str] = "base64"
+    ):
+        """
+        Initialize async embedding client.
+
+        Args:
+            api_url: Embeddings endpoint
+            api_key: Bearer token
+            model: Embedding model name
+            max_concurrency: Maximum batches in flight
+            timeout: Per-request timeout in seconds
+            max_retries: Retries for throttled, failed or timed-out requests
+            backoff_base: First retry delay in seconds (doubles per attempt, with jitter)
+            backoff_max: Maximum retry delay in seconds
+            encoding_format: Response encoding to request ("base64", or None for float lists)
+        """
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.encoding_format = encoding_format
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._limiter: Optional[AdaptiveConcurrency] = None
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.splits = 0
+
+    async def __aenter__(self) -> "AsyncEmbeddingClient":
+        # One pool sized to the concurrency, so batches reuse warm keep-alive connections
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            ),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+        )
+        self._limiter = AdaptiveConcurrency(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    def _payload(self, texts: List[str]) -> Dict:
+        payload = {"input": texts, "model": self.model}
+        if self.encoding_format:
+            payload["encoding_format"] = self.encoding_format
+        return payload
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _observe_rate_limits(self, headers: httpx.Headers):
+        """Pause before the provider starts rejecting requests."""
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self._limiter.pause(reset)
+
+    async def _post(self, texts: List[str]) -> List[np.ndarray]:
+        """Send one batch, retrying throttled and transient failures."""
+        last_error = "no attempt made"
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+
+            await self._limiter.acquire()
+            try:
+                self.requests += 1
+                response = await self._client.post(self.api_url, json=self._payload(texts))
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+                response = None
+            finally:
+                await self._limiter.release()
+
+            if response is None:
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            self._observe_rate_limits(response.headers)
+
+            if response.status_code == 429:
+                self.throttled += 1
+                delay = parse_duration(response.headers.get("retry-after")) or self._backoff(attempt)
+                self._limiter.on_throttle(delay)
+                last_error = "429 Too Many Requests"
+                continue
+
+            if response.status_code >= 500:
+                last_error = f"{response.status_code} {response.text[:200]}"
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code >= 400:
+                raise EmbeddingRequestError(
+                    f"{response.status_code} {response.text[:200]}",
+                    status_code=response.status_code,
+                    splittable=response.status_code in (400, 413)
+                )
+
+            self._limiter.on_success()
+            embeddings = decode_embeddings(response.json())
+            if len(embeddings) != len(texts):
+                raise EmbeddingRequestError(
+                    f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+                )
+            return embeddings
+
+        raise EmbeddingRequestError(f"Giving up after {self.max_retries + 1} attempts: {last_error}")
+
+    async def embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed one batch, splitting it in halves if the provider rejects it as a whole."""
+        try:
+            return await self._post(texts)
+        except EmbeddingRequestError as e:
+            if not e.splittable or len(texts) == 1:
+                raise
+            self.splits += 1
+            middle = len(texts) // 2
+            left, right = await asyncio.gather(
+                self.embed_batch(texts[:middle]),
+                self.embed_batch(texts[middle:])
+            )
+            return left + right
+
+    async def embed_batches(
+        self,
+        batches: List[List[str]],
+        on_batch: Optional[Callable[[int, List[np.ndarray]], None]] = None
+    ) -> List[List[np.ndarray]]:
+        """
+        Embed batches concurrently.
+
+        Args:
+            batches: Text batches (one request each, unless split)
+            on_batch: Called with (batch index, embeddings) as each batch completes
+
+        Returns:
+            Embeddings per batch, in input order regardless of completion order
+        """
+        results: List[Optional[List[np.ndarray]]] = [None] * len(batches)
+
+        async def run(index: int):
+            results[index] = await self.embed_batch(batches[index])
+            if on_batch is not None:
+                on_batch(index, results[index])
+
+        await asyncio.gather(*(run(index) for index in range(len(batches))))
+        return results
+
+    def stats(self) -> Dict:
+        """Request counters for ingest reports."""
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "splits": self.splits,
+            "concurrency_limit": self._limiter.limit if self._limiter else self.max_concurrency
+        }
@@ -0,0 +1,94 @@
+"""
+Token-aware batch packing for Idaho ALF RegNavigator
+Fills embedding requests up to provider item and token limits, splitting oversized
+chunks into pieces whose embeddings are recombined afterwards.
+"""
+
+import math
+from typing import List
+
+import numpy as np
+
+
+# Conservative for regulatory text (English prose averages about 4 characters per token)
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Upper-bound token estimate for a text."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a text into pieces of at most max_tokens estimated tokens.
+
+    Cuts at the last paragraph break, sentence end or space in the second half of
+    each window, so pieces stay readable.
+
+    Args:
+        text: Text to split
+        max_tokens: Token budget per piece
+
+    Returns:
+        Pieces in order ([text] if it already fits)
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    rest = text
+
+    while len(rest) > max_chars:
+        window = rest[:max_chars]
+        cut = -1
+        for separator in ("\n\n", ". ", "\n", " "):
+            position = window.rfind(separator, max_chars // 2)
+            if position != -1:
+                cut = position + len(separator)
+                break
+        if cut == -1:
+            cut = max_chars
+
+        pieces.append(rest[:cut])
+        rest = rest[cut:]
+
+    if rest or not pieces:
+        pieces.append(rest)
+    return pieces
+
+
+def pack_batches(token_counts: List[int], max_items: int, max_tokens: int) -> List[List[int]]:
+    """
+    Group items into requests in order, filling each up to the item and token limits.
+
+    Args:
+        token_counts: Estimated tokens per item (each at most max_tokens)
+        max_items: Items per request
+        max_tokens: Tokens per request
+
+    Returns:
+        Batches of item positions, covering every item once in order
+    """
+    batches = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for position, tokens in enumerate(token_counts):
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(position)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def combine_embeddings(embeddings: List[List[float]], weights: List[float]) -> List[float]:
+    """Unit-normalized weighted mean of piece embeddings (weights: tokens per piece)."""
+    if len(embeddings) == 1:
+        return embeddings[0]
+    combined = np.average(np.asarray(embeddings, dtype=np.float64), axis=0, weights=weights)
+    norm = np.linalg.norm(combined)
+    return (combined / norm if norm else combined).tolist()
@@ -0,0 +1,170 @@
+"""
+Micro-benchmarks for Idaho ALF RegNavigator
+Measures costs that do not need API keys (prompt assembly, section chunking).
+"""
+
+import io
+import json
+import time
+import random
+import contextlib
+import tracemalloc
+from pathlib import Path
+from typing import List, Dict, Callable
+
+from prompt_context import PromptBlockCache, build_context, STYLE_BASIC, STYLE_IMPROVED
+from txt_processor import IDAPATextProcessor
+
+
+def _measure(build: Callable[[List[Dict]], str], requests: List[List[Dict]]) -> Dict:
+    """Mean wall time and traced allocations per request."""
+    start = time.perf_counter()
+    for retrieved in requests:
+        build(retrieved)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    allocated = 0
+    peak = 0
+    for retrieved in requests:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        prompt = build(retrieved)
+        _, request_peak = tracemalloc.get_traced_memory()
+        peak = max(peak, request_peak - before)
+        # Everything except the returned prompt is temporary garbage
+        allocated += request_peak - before - len(prompt)
+        del prompt
+    tracemalloc.stop()
+
+    return {
+        "mean_us": elapsed / len(requests) * 1e6,
+        "mean_temp_bytes": allocated / len(requests),
+        "peak_bytes": peak
+    }
+
+
+def benchmark_prompt_build(chunks: List[Dict], iterations: int = 2000, top_k: int = 15, seed: int = 0) -> Dict:
+    """
+    Compare per-request context rendering with memoized context blocks.
+
+    Args:
+        chunks: Index chunks to sample retrieved sets from
+        iterations: Number of simulated requests
+        top_k: Chunks per request
+        seed: Random seed for the sampled requests
+
+    Returns:
+        Results per style and mode
+    """
+    rng = random.Random(seed)
+    k = min(top_k, len(chunks))
+    requests = [rng.sample(chunks, k) for _ in range(iterations)]
+
+    results = {}
+    for style, max_length in ((STYLE_BASIC, 2000), (STYLE_IMPROVED, 2000)):
+        # Fresh cache per request == rendering every block from scratch
+        uncached = _measure(
+            lambda retrieved: build_context(retrieved, PromptBlockCache(), max_length, style),
+            requests
+        )
+
+        blocks = PromptBlockCache()
+        for retrieved in requests:
+            build_context(retrieved, blocks, max_length, style)
+        memoized = _measure(
+            lambda retrieved: build_context(retrieved, blocks, max_length, style),
+            requests
+        )
+
+        results[style] = {"uncached": uncached, "memoized": memoized}
+
+    return results
+
+
+def benchmark_chunking(raw_dir: Path, iterations: int = 7) -> Dict:
+    """
+    Section chunking throughput over the raw regulation files (best of several runs).
+
+    Args:
+        raw_dir: Directory with raw .txt files
+        iterations: Number of timed runs
+
+    Returns:
+        Bytes, chunks, best wall time and MB/s
+    """
+    processor = IDAPATextProcessor(str(raw_dir), str(Path(raw_dir).parent / "processed"))
+    files = sorted(path.name for path in Path(raw_dir).glob("*.txt"))
+    total_bytes = sum((Path(raw_dir) / name).stat().st_size for name in files)
+
+    best = float("inf")
+    chunks = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        # Per-file progress lines are not part of the measurement
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = sum(len(processor.process_file(name)) for name in files)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "files": len(files),
+        "bytes": total_bytes,
+        "chunks": chunks,
+        "seconds": best,
+        "mb_per_second": total_bytes / 1024 / 1024 / best
+    }
+
+
+def main():
+    """Run micro-benchmarks against a chunks file (or the raw files with --raw-dir)."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RegNavigator micro-benchmarks")
+    parser.add_argument(
+        "--data-dir",
+        default=str(Path(__file__).parent.parent / "data" / "processed"),
+        help="Directory with processed chunks"
+    )
+    parser.add_argument(
+        "--chunks-file",
+        default="chunks_with_embeddings.json",
+        help="Chunks file to sample from"
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument(
+        "--raw-dir",
+        default=None,
+        help="Benchmark section chunking of the raw .txt files in this directory instead"
+    )
+
+    args = parser.parse_args()
+
+    if args.raw_dir:
+        stats = benchmark_chunking(Path(args.raw_dir))
+        print(
+            f"Chunking: {stats['files']} files, {stats['bytes'] / 1024 / 1024:.2f} MB -> "
+            f"{stats['chunks']} chunks in {stats['seconds'] * 1000:.1f} ms "
+            f"({stats['mb_per_second']:.1f} MB/s)"
+        )
+        return
+
+    with open(Path(args.data_dir) / args.chunks_file, 'r', encoding='utf-8') as f:
+        chunks = json.load(f)
+
+    print(f"Loaded {len(chunks)} chunks")
+    print(f"Prompt build: {args.iterations} requests, top_k={args.top_k}\n")
+
+    results = benchmark_prompt_build(chunks, args.iterations, args.top_k)
+    for style, modes in results.items():
+        print(f"{style}:")
+        for mode, stats in modes.items():
+            print(
+                f"  {mode:9s} {stats['mean_us']:8.1f} µs/request  "
+                f"{stats['mean_temp_bytes'] / 1024:8.1f} KiB temporary/request  "
+                f"{stats['peak_bytes'] / 1024:8.1f} KiB peak"
+            )
+
+
+if __name__ == "__main__":
+    main()
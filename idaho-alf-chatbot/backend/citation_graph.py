@@ -0,0 +1,320 @@
+"""
+Citation Graph for Idaho ALF RegNavigator
+Parses cross-references between regulation sections into a graph stored with the index.
+"""
+
+import re
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable
+
+from subsections import is_subsection
+from index_fingerprint import IndexFingerprint, index_fingerprint
+
+
+# Default file name, stored next to chunks_with_embeddings.json
+CITATION_GRAPH_FILE = "citation_graph.json"
+
+# "IDAPA 16.03.22", "IDAPA 16.03.22.600", "IDAPA 16.03.22.600.02"
+IDAPA_REF_PATTERN = re.compile(r"\bIDAPA\s+(\d{2}\.\d{2}\.\d{2})(?:\.(\d{3}))?(?:\.(\d{2}))?")
+# "Subsection 600.02", "Subsections 325.04"
+SUBSECTION_REF_PATTERN = re.compile(r"\bSubsections?\s+(\d{3})\.(\d{2})")
+# "Section 100" (same document), but not page footers like "Section 000 Page 5"
+SECTION_REF_PATTERN = re.compile(r"\bSections?\s+(\d{3})(?![\d.\-])(?!\s+Page\b)")
+# "Section 54-4205, Idaho Code", "Sections 39-3305 and 39-3358, Idaho Code"
+STATUTE_REF_PATTERN = re.compile(
+    r"\bSections?\s+((?:\d{1,2}-\d{3,4}[A-Z]?(?:\([^)]*\))*(?:,\s*|\s+(?:and|or|through)\s+)?)+),?\s*Idaho\s+Code"
+)
+STATUTE_NUMBER_PATTERN = re.compile(r"\d{1,2}-\d{3,4}[A-Z]?")
+
+
+def document_key(citation: str) -> str:
+    """Return the document part of a chunk citation ("IDAPA 16.03.22.600" -> "IDAPA 16.03.22")."""
+    return citation.rsplit(".", 1)[0] if "." in citation else citation
+
+
+class CitationGraph:
+    """Directed graph of section-to-section references between chunks."""
+
+    def __init__(
+        self,
+        edges: Optional[Dict[str, List[Dict]]] = None,
+        external: Optional[Dict[str, List[str]]] = None,
+        fingerprint: Optional[str] = None
+    ):
+        """
+        Initialize citation graph.
+
+        Args:
+            edges: Mapping of chunk_id to resolved references
+                   ({"target": chunk_id, "ref": text, "kind": kind})
+            external: Mapping of chunk_id to references that point outside the index
+            fingerprint: index_fingerprint of the chunk set the graph was built from
+        """
+        self.edges = edges or {}
+        self.external = external or {}
+        self.fingerprint = fingerprint
+
+        # Reverse lookup for "what cites this section"
+        self.cited_by: Dict[str, List[str]] = {}
+        for source, refs in self.edges.items():
+            for ref in refs:
+                self.cited_by.setdefault(ref["target"], []).append(source)
+
+    @classmethod
+    def from_chunks(
+        cls,
+        chunks: Iterable[Dict],
+        by_citation: Optional[Dict[str, str]] = None
+    ) -> "CitationGraph":
+        """
+        Parse references out of chunk content and resolve them against the chunk set.
+
+        Args:
+            chunks: Index chunks
+            by_citation: citation_lookup of the chunk set if already known; chunks are
+                         then read in one pass and may be a stream
+        """
+        if by_citation is None:
+            chunks = list(chunks)
+            by_citation = citation_lookup(chunks)
+
+        edges = {}
+        external = {}
+        fingerprint = IndexFingerprint()
+
+        for chunk in chunks:
+            fingerprint.update(chunk)
+            # Subsection chunks repeat their section's text; references resolve per section
+            if is_subsection(chunk):
+                continue
+            resolved, unresolved = cls._parse_references(chunk, by_citation)
+            if resolved:
+                edges[chunk["chunk_id"]] = resolved
+            if unresolved:
+                external[chunk["chunk_id"]] = unresolved
+
+        return cls(edges, external, fingerprint.hexdigest())
+
+    @staticmethod
+    def _parse_references(chunk: Dict, by_citation: Dict[str, str]):
+        """Extract resolved and unresolved references from a single chunk."""
+        content = chunk["content"]
+        own_id = chunk["chunk_id"]
+        own_document = document_key(chunk["citation"])
+
+        resolved = []
+        unresolved = []
+        seen_targets = set()
+
+        def add_edge(target_citation: str, ref_text: str, kind: str, subsection: Optional[str] = None):
+            target = by_citation.get(target_citation)
+            if target is None:
+                if ref_text not in unresolved:
+                    unresolved.append(ref_text)
+                return
+            if target == own_id or target in seen_targets:
+                return
+            seen_targets.add(target)
+            edge = {"target": target, "ref": ref_text, "kind": kind}
+            if subsection:
+                edge["subsection"] = subsection
+            resolved.append(edge)
+
+        # Explicit IDAPA references (possibly to other documents)
+        for match in IDAPA_REF_PATTERN.finditer(content):
+            document = f"IDAPA {match.group(1)}"
+            section = match.group(2)
+            if section:
+                add_edge(f"{document}.{section}", match.group(0), "idapa", match.group(3))
+            elif document != own_document and match.group(0) not in unresolved:
+                # Whole-document reference: keep for display, never expanded
+                unresolved.append(match.group(0))
+
+        # Subsection references within the same document
+        for match in SUBSECTION_REF_PATTERN.finditer(content):
+            add_edge(f"{own_document}.{match.group(1)}", match.group(0), "subsection", match.group(2))
+
+        # Section references within the same document
+        for match in SECTION_REF_PATTERN.finditer(content):
+            add_edge(f"{own_document}.{match.group(1)}", match.group(0), "section")
+
+        # Idaho Code statutes are not part of the index (yet)
+        for match in STATUTE_REF_PATTERN.finditer(content):
+            for number in STATUTE_NUMBER_PATTERN.findall(match.group(1)):
+                ref_text = f"Section {number}, Idaho Code"
+                if ref_text not in unresolved:
+                    unresolved.append(ref_text)
+
+        return resolved, unresolved
+
+    def references(self, chunk_id: str) -> List[Dict]:
+        """Resolved references made by a chunk, in document order."""
+        return self.edges.get(chunk_id, [])
+
+    def expand(
+        self,
+        chunk_ids: List[str],
+        max_expansion: int = 3
+    ) -> List[Dict]:
+        """
+        Find sections cited by the given chunks that are not already among them.
+
+        Args:
+            chunk_ids: Retrieved chunk IDs, best match first
+            max_expansion: Maximum number of cited sections to add
+
+        Returns:
+            List of {"chunk_id", "cited_by", "ref"} dicts, in retrieval order
+        """
+        present = set(chunk_ids)
+        expansion = []
+
+        for chunk_id in chunk_ids:
+            for edge in self.references(chunk_id):
+                if len(expansion) >= max_expansion:
+                    return expansion
+                if edge["target"] in present:
+                    continue
+                present.add(edge["target"])
+                expansion.append({
+                    "chunk_id": edge["target"],
+                    "cited_by": chunk_id,
+                    "ref": edge["ref"]
+                })
+
+        return expansion
+
+    def to_dict(self) -> Dict:
+        """Convert graph to its JSON form."""
+        return {
+            "fingerprint": self.fingerprint,
+            "edges": self.edges,
+            "external": self.external
+        }
+
+    def save(self, path: str) -> Path:
+        """Save graph to a JSON file."""
+        path = Path(path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "CitationGraph":
+        """Load graph from a JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get("edges"), data.get("external"), data.get("fingerprint"))
+
+    def stats(self) -> Dict:
+        """Summary counts for ingest reports."""
+        return {
+            "chunks_with_references": len(self.edges),
+            "resolved_references": sum(len(refs) for refs in self.edges.values()),
+            "external_references": sum(len(refs) for refs in self.external.values())
+        }
+
+
+def add_citations(by_citation: Dict[str, str], chunk: Dict):
+    """
+    Add a section chunk to a citation lookup, with the citations it stands in for.
+
+    Deduplicated chunks list their identical copies under "aliases" (see dedup); a
+    reference to an alias citation resolves to the stored chunk.
+    """
+    if is_subsection(chunk):
+        return
+    by_citation[chunk["citation"]] = chunk["chunk_id"]
+    for alias in chunk.get("aliases", []):
+        by_citation.setdefault(alias["citation"], chunk["chunk_id"])
+
+
+def citation_lookup(chunks: Iterable[Dict]) -> Dict[str, str]:
+    """Citation -> chunk_id lookup of the section chunks and their aliases, used to resolve references."""
+    by_citation: Dict[str, str] = {}
+    for chunk in chunks:
+        add_citations(by_citation, chunk)
+    return by_citation
+
+
+def build_citation_graph(
+    chunks: Iterable[Dict],
+    output_path: str,
+    by_citation: Optional[Dict[str, str]] = None
+) -> CitationGraph:
+    """Build the citation graph for a chunk set and store it next to the index."""
+    graph = CitationGraph.from_chunks(chunks, by_citation)
+    graph.save(output_path)
+
+    stats = graph.stats()
+    print(f"✓ Saved citation graph to {output_path}")
+    print(f"  Chunks with references: {stats['chunks_with_references']}")
+    print(f"  Resolved references: {stats['resolved_references']}")
+    print(f"  External references: {stats['external_references']}")
+
+    return graph
+
+
+def load_or_build_citation_graph(
+    chunks: List[Dict],
+    index_path: Path,
+    fingerprint: Optional[str] = None
+) -> CitationGraph:
+    """
+    Load the graph stored with an index, or rebuild it if it is missing or stale.
+
+    A graph built from another chunk set (the index was rewritten without it) would
+    expand to wrong or missing chunk ids; it is rebuilt and saved over the stale file.
+
+    Args:
+        chunks: Index chunks
+        index_path: Path of the index file the graph is stored next to
+        fingerprint: index_fingerprint of chunks, if already computed
+    """
+    graph_path = Path(index_path).parent / CITATION_GRAPH_FILE
+    if fingerprint is None:
+        fingerprint = index_fingerprint(chunks)
+
+    if graph_path.exists():
+        graph = CitationGraph.load(str(graph_path))
+        if graph.fingerprint == fingerprint:
+            return graph
+        print(f"⚠️  {graph_path.name} was built from another index; rebuilding")
+
+    graph = CitationGraph.from_chunks(chunks)
+    try:
+        graph.save(str(graph_path))
+    except OSError as e:
+        print(f"⚠️  Could not save {graph_path.name}: {e}")
+    return graph
+
+
+def main():
+    """Build the citation graph for an existing chunks file."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build citation graph for regulation chunks")
+    parser.add_argument(
+        "--data-dir",
+        default=str(Path(__file__).parent.parent / "data" / "processed"),
+        help="Directory with processed chunks"
+    )
+    parser.add_argument(
+        "--chunks-file",
+        default="chunks_with_embeddings.json",
+        help="Input chunks file"
+    )
+
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    with open(data_dir / args.chunks_file, 'r', encoding='utf-8') as f:
+        chunks = json.load(f)
+
+    print(f"Loaded {len(chunks)} chunks")
+    build_citation_graph(chunks, str(data_dir / CITATION_GRAPH_FILE))
+
+
+if __name__ == "__main__":
+    main()
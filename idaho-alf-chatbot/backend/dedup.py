@@ -0,0 +1,113 @@
+"""
+Ingest deduplication for Idaho ALF RegNavigator
+Collapses byte-identical raw files and chunks with identical content into one stored
+chunk (one embedding) that lists the other citations as aliases.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import List, Dict
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def group_identical_files(raw_dir: Path, filenames: List[str]) -> Dict[str, List[str]]:
+    """
+    Group byte-identical files.
+
+    Args:
+        raw_dir: Directory holding the files
+        filenames: Files in processing order
+
+    Returns:
+        First file of each group (in processing order) -> later identical files
+    """
+    groups: Dict[str, List[str]] = {}
+    canonical_by_digest: Dict[str, str] = {}
+
+    for filename in filenames:
+        digest = file_digest(Path(raw_dir) / filename)
+        canonical = canonical_by_digest.get(digest)
+        if canonical is None:
+            canonical_by_digest[digest] = filename
+            groups[filename] = []
+        else:
+            groups[canonical].append(filename)
+
+    return groups
+
+
+class ChunkDeduplicator:
+    """
+    Keeps the first chunk for each exact content and records later ones as its aliases.
+
+    Aliases are attached when chunks are written (with_aliases), so a canonical chunk
+    that was already emitted still receives aliases found after it.
+    """
+
+    def __init__(self):
+        self._canonical: Dict[str, str] = {}  # content hash -> canonical chunk_id
+        self._aliases: Dict[str, List[Dict]] = {}  # canonical chunk_id -> alias records
+
+        self.unique_chunks = 0
+        self.duplicate_chunks = 0
+        self.duplicate_files = 0
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def add(self, chunk: Dict) -> bool:
+        """
+        Register a chunk.
+
+        Returns:
+            True if the chunk is new and should be stored, False if it is an alias
+        """
+        content_hash = self.content_hash(chunk["content"])
+        canonical = self._canonical.get(content_hash)
+
+        if canonical is None:
+            self._canonical[content_hash] = chunk["chunk_id"]
+            # A chunk read back from an index keeps the aliases it already had
+            if chunk.get("aliases"):
+                self._aliases[chunk["chunk_id"]] = list(chunk["aliases"])
+            self.unique_chunks += 1
+            return True
+
+        if chunk["chunk_id"] != canonical:
+            self._aliases.setdefault(canonical, []).append({
+                "chunk_id": chunk["chunk_id"],
+                "citation": chunk["citation"],
+                "source_file": chunk.get("source_file")
+            })
+        self.duplicate_chunks += 1
+        return False
+
+    def with_aliases(self, chunk: Dict) -> Dict:
+        """Chunk with its "aliases" (unchanged when it has none)."""
+        aliases = self._aliases.get(chunk["chunk_id"])
+        if not aliases:
+            return chunk
+        return dict(chunk, aliases=aliases)
+
+    def apply(self, chunks: List[Dict]) -> List[Dict]:
+        """Deduplicate a complete chunk list, keeping first occurrences in order."""
+        unique = [chunk for chunk in chunks if self.add(chunk)]
+        return [self.with_aliases(chunk) for chunk in unique]
+
+    def stats(self) -> Dict:
+        """Duplicate counts for ingest reports."""
+        return {
+            "unique_chunks": self.unique_chunks,
+            "duplicate_chunks": self.duplicate_chunks,
+            "duplicate_files": self.duplicate_files,
+            "chunks_with_aliases": len(self._aliases)
+        }
@@ -0,0 +1,326 @@
+"""
+Embedding caches for Idaho ALF RegNavigator
+Query-embedding cache with an in-memory LRU tier and a shared SQLite tier,
+plus a persistent content-addressed cache of chunk embeddings for ingestion.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from embeddings import EmbeddingGenerator
+from async_embeddings import decode_stored_embedding
+
+
+# Default file names, stored next to chunks_with_embeddings.json
+QUERY_EMBEDDING_CACHE_FILE = "query_embedding_cache.sqlite"
+CHUNK_EMBEDDING_CACHE_FILE = "chunk_embedding_cache.sqlite"
+
+
+def normalize_query(text: str) -> str:
+    """Fold case and whitespace so trivially different questions share a cache entry."""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Two-tier cache of query embeddings: bounded in-memory LRU plus optional SQLite store."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 86400,
+        disk_path: Optional[str] = None
+    ):
+        """
+        Initialize query embedding cache.
+
+        Args:
+            max_entries: Maximum number of embeddings kept in memory
+            ttl_seconds: Entry lifetime in both tiers (None or 0 for no expiry)
+            disk_path: SQLite file shared by all workers (None for memory only)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds or None
+        self.disk_path = Path(disk_path) if disk_path else None
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_path is not None:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+                "embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread SQLite connection (WAL lets several workers share the file)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.disk_path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Cache key for a (model, normalized query) pair."""
+        return hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding (float32 from either tier), or None on a miss."""
+        key = self.make_key(model, text)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                embedding, created_at = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return embedding
+                del self._memory[key]
+
+        if self.disk_path is not None:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT embedding, created_at FROM query_embeddings WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                blob, created_at = row
+                if not self._expired(created_at):
+                    embedding = decode_stored_embedding(blob)
+                    self._remember(key, embedding, created_at)
+                    with self._lock:
+                        self.disk_hits += 1
+                    return embedding
+                conn.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                conn.commit()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Store an embedding in both tiers."""
+        key = self.make_key(model, text)
+        created_at = time.time()
+        self._remember(key, embedding, created_at)
+
+        if self.disk_path is not None:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, embedding, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, np.asarray(embedding, dtype="<f8").tobytes(), created_at)
+            )
+            conn.commit()
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store several embeddings."""
+        for text, embedding in zip(texts, embeddings):
+            self.put(model, text, embedding)
+
+    def _remember(self, key: str, embedding: List[float], created_at: float):
+        """Insert into the memory tier (as float32), evicting least recently used entries."""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._memory[key] = (embedding, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.disk_path is not None:
+            conn = self._connection()
+            conn.execute("DELETE FROM query_embeddings")
+            conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit ratios and sizes for the /stats endpoint."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_path": str(self.disk_path) if self.disk_path else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_hit_ratio": self.memory_hits / lookups if lookups else 0.0
+            }
+
+
+class ContentEmbeddingCache:
+    """Persistent chunk embeddings keyed by (model, sha256 of the exact chunk content)."""
+
+    def __init__(self, path: str):
+        """
+        Initialize content embedding cache.
+
+        Args:
+            path: SQLite file holding the cache
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+            "model TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, PRIMARY KEY (model, content_hash))"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """sha256 of the chunk content (no normalization: any edit is a miss)."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Return the stored embedding (float32), or None on a miss."""
+        row = self._connection().execute(
+            "SELECT embedding FROM chunk_embeddings WHERE model = ? AND content_hash = ?",
+            (model, self.content_hash(text))
+        ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return decode_stored_embedding(row[0])
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Store one embedding."""
+        self.put_many(model, [text], [embedding])
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store a batch of embeddings in one transaction."""
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunk_embeddings (model, content_hash, embedding) VALUES (?, ?, ?)",
+            [
+                (model, self.content_hash(text), np.asarray(embedding, dtype="<f8").tobytes())
+                for text, embedding in zip(texts, embeddings)
+            ]
+        )
+        conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit counts for ingest reports."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+class CachedEmbeddingGenerator(EmbeddingGenerator):
+    """Embedding generator that consults a cache (query or content) before calling the provider."""
+
+    def __init__(self, generator: EmbeddingGenerator, cache):
+        super().__init__(generator.api_key)
+        self.generator = generator
+        self.cache = cache
+        self.model = getattr(generator, 'model', 'unknown')
+
+    def embed(self, text: str) -> Tuple[List[float], bool]:
+        """Embedding for a single text and whether it was served from the cache."""
+        embedding = self.cache.get(self.model, text)
+        if embedding is not None:
+            return embedding, True
+        embedding = self.generator.generate_embedding(text)
+        self.cache.put(self.model, text, embedding)
+        return embedding, False
+
+    def generate_embedding(self, text: str) -> List[float]:
+        """Generate embedding for a single text, using the cache."""
+        return self.embed(text)[0]
+
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts, sending only cache misses to the provider."""
+        embeddings = [self.cache.get(self.model, text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            generated = self.generator.generate_embeddings(missing_texts)
+            self.cache.put_many(self.model, missing_texts, generated)
+            for i, embedding in zip(missing, generated):
+                embeddings[i] = embedding
+
+        return embeddings
+
+
+def create_query_embedding_cache(default_dir: Path) -> Optional[QueryEmbeddingCache]:
+    """
+    Create the query embedding cache configured in the environment.
+
+    QUERY_EMBEDDING_CACHE: "false" to disable caching (default on)
+    QUERY_EMBEDDING_CACHE_SIZE: In-memory entries (default 1024)
+    QUERY_EMBEDDING_CACHE_TTL: Entry lifetime in seconds (default 86400, 0 for none)
+    QUERY_EMBEDDING_CACHE_PATH: SQLite file ("" for memory only; default next to the index)
+
+    Returns:
+        QueryEmbeddingCache instance, or None when disabled
+    """
+    if os.getenv("QUERY_EMBEDDING_CACHE", "true").lower() in ("0", "false", "no"):
+        return None
+
+    disk_path = os.getenv("QUERY_EMBEDDING_CACHE_PATH")
+    if disk_path is None:
+        disk_path = str(Path(default_dir) / QUERY_EMBEDDING_CACHE_FILE)
+
+    return QueryEmbeddingCache(
+        max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024)),
+        ttl_seconds=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 86400)),
+        disk_path=disk_path or None
+    )
+
+
+def create_chunk_embedding_cache(processed_data_dir: Path) -> ContentEmbeddingCache:
+    """Open the content-addressed chunk embedding cache stored next to the index."""
+    return ContentEmbeddingCache(str(Path(processed_data_dir) / CHUNK_EMBEDDING_CACHE_FILE))
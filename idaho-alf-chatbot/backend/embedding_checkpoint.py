@@ -0,0 +1,187 @@
+"""
+Embedding job checkpoints for Idaho ALF RegNavigator
+Append-only JSONL of completed embeddings, so an interrupted embedding job resumes
+where it stopped and the final index is streamed from disk.
+"""
+
+import os
+import json
+import base64
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+from async_embeddings import decode_stored_embedding
+
+
+# Suffix appended to the output file name (chunks_with_embeddings.json.checkpoint.jsonl)
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+
+
+def checkpoint_path(output_path: Path) -> Path:
+    """Checkpoint file for an index output file."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + CHECKPOINT_SUFFIX)
+
+
+def write_json_array(items: Iterable[Dict], output_path: Path) -> int:
+    """
+    Stream dicts to a JSON array file, one at a time, replacing it atomically.
+
+    The output matches json.dump(list(items), f, indent=2, ensure_ascii=False).
+
+    Returns:
+        Number of items written
+    """
+    output_path = Path(output_path)
+    temp_path = output_path.with_name(output_path.name + ".tmp")
+
+    count = 0
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for item in items:
+            text = json.dumps(item, indent=2, ensure_ascii=False)
+            f.write(("," if count else "") + "\n  " + text.replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "]")
+
+    os.replace(temp_path, output_path)
+    return count
+
+
+def unique_chunks(chunks: Iterable[Dict]) -> Iterator[Dict]:
+    """Pass chunks through, raising ValueError on a repeated chunk_id (checked while writing an index)."""
+    seen = set()
+    for chunk in chunks:
+        chunk_id = chunk["chunk_id"]
+        if chunk_id in seen:
+            raise ValueError(f"Duplicate chunk_id in index: {chunk_id}")
+        seen.add(chunk_id)
+        yield chunk
+
+
+class EmbeddingCheckpoint:
+    """
+    Completed embeddings of one job, keyed by sha256 of the chunk content.
+
+    The first line records the model; every further line is one embedding (base64 of
+    little-endian float64, lossless for both wire formats). Records are appended and
+    fsynced as each batch completes, so a crash loses only the batches in flight: one
+    when batches are sent one after another, up to the request concurrency otherwise
+    (plus the finished pieces of split chunks still waiting for their other pieces).
+    Keying by content keeps records valid when chunk order or the chunk set changes.
+    """
+
+    def __init__(self, path: Path, model: str):
+        """
+        Open a checkpoint, resuming it if it was written for the same model.
+
+        Args:
+            path: Checkpoint file (see checkpoint_path)
+            model: Embedding model of the job
+        """
+        self.path = Path(path)
+        self.model = model
+        self.offsets: Dict[str, int] = {}  # content hash -> byte offset of its record
+        self.dimensions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+        self._writer = open(self.path, "ab")
+        self._reader = open(self.path, "rb")
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        header = json.dumps({"checkpoint": "embeddings", "model": self.model}).encode("utf-8") + b"\n"
+
+        if self.path.exists():
+            with open(self.path, "r+b") as f:
+                if f.readline() == header:
+                    offset = f.tell()
+                    for line in iter(f.readline, b""):
+                        if not line.endswith(b"\n"):
+                            # Torn write from a crash: drop the partial record
+                            f.truncate(offset)
+                            break
+                        self.offsets[json.loads(line)["hash"]] = offset
+                        offset += len(line)
+                    return
+
+        # Missing, or written for another model: start over
+        with open(self.path, "wb") as f:
+            f.write(header)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, text: str) -> bool:
+        return self.content_hash(text) in self.offsets
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Embedding recorded for a chunk content (float32), or None."""
+        offset = self.offsets.get(self.content_hash(text))
+        if offset is None:
+            return None
+        self._reader.seek(offset)
+        record = json.loads(self._reader.readline())
+        embedding = decode_stored_embedding(base64.b64decode(record["embedding"]))
+        self.dimensions = len(embedding)
+        return embedding
+
+    def append(self, texts: List[str], embeddings: List[List[float]]):
+        """Durably record a completed batch."""
+        offset = self._writer.seek(0, os.SEEK_END)
+        lines = []
+        for text, embedding in zip(texts, embeddings):
+            content_hash = self.content_hash(text)
+            encoded = base64.b64encode(np.asarray(embedding, dtype="<f8").tobytes()).decode("ascii")
+            line = json.dumps({"hash": content_hash, "embedding": encoded}).encode("utf-8") + b"\n"
+            self.offsets[content_hash] = offset
+            offset += len(line)
+            lines.append(line)
+            self.dimensions = len(embedding)
+
+        self._writer.write(b"".join(lines))
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+
+    def write_index(self, chunks: List[Dict], output_path: Path) -> int:
+        """
+        Stream chunks to a JSON index file, filling embeddings from the checkpoint.
+
+        Chunks that already carry an embedding are written as they are. Only one chunk's
+        embedding is held in memory at a time (see write_json_array). A repeated
+        chunk_id raises ValueError and leaves the existing index in place.
+
+        Returns:
+            Number of chunks written
+        """
+        def filled():
+            for i, chunk in enumerate(chunks):
+                if "embedding" not in chunk:
+                    embedding = self.get(chunk["content"])
+                    if embedding is None:
+                        raise KeyError(f"No embedding recorded for chunk {chunk.get('chunk_id', i)}")
+                    # Chunk dicts are saved as JSON: plain floats
+                    chunk = dict(
+                        chunk,
+                        embedding=np.asarray(embedding, dtype=np.float64).tolist(),
+                        embedding_model=self.model
+                    )
+                yield chunk
+
+        return write_json_array(unique_chunks(filled()), output_path)
+
+    def close(self):
+        self._writer.close()
+        self._reader.close()
+
+    def remove(self):
+        """Close and delete the checkpoint once the index is written."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -6,17 +6,48 @@ Supports both Voyage AI and OpenAI embeddings.
 
 import os
 import json
+import time
+import asyncio
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Optional
 import requests
 
+from async_embeddings import AsyncEmbeddingClient, decode_embeddings
+from batch_packing import estimate_tokens, split_text, pack_batches, combine_embeddings
+from embedding_checkpoint import EmbeddingCheckpoint, checkpoint_path
+from citation_graph import CITATION_GRAPH_FILE, build_citation_graph
+from fact_index import FACT_INDEX_FILE, build_fact_index
+
+
+# Maximum chunks per embedding request during ingestion (override with EMBEDDING_BATCH_SIZE;
+# by default requests are filled up to the provider's item and token limits)
+DEFAULT_EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 0)) or None
+
+# Embedding requests in flight during ingestion (override with EMBEDDING_CONCURRENCY; 1 = sequential)
+DEFAULT_EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+
+# Seconds before an embedding request is abandoned
+EMBEDDING_REQUEST_TIMEOUT = 60.0
+
 
 class EmbeddingGenerator:
     """Base class for embedding generation."""
 
+    # Provider request limits (inputs per request, tokens per request, tokens per input)
+    max_batch_items = 96
+    max_batch_tokens = 100000
+    max_input_tokens = 8000
+
+    # Response encoding requested from the provider: base64 float32 is ~4x smaller than
+    # JSON float lists and decodes straight into numpy (None for float lists)
+    encoding_format = "base64"
+
     def __init__(self, api_key: str):
         self.api_key = api_key
+        # Reused across calls so requests share keep-alive connections
+        self.session = requests.Session()
+        self.timeout = EMBEDDING_REQUEST_TIMEOUT
 
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text."""
@@ -26,17 +57,32 @@ class EmbeddingGenerator:
         """Generate embeddings for multiple texts."""
         raise NotImplementedError
 
+    def create_async_client(self, max_concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY) -> AsyncEmbeddingClient:
+        """Async client for the same endpoint and model, sending batches concurrently."""
+        return AsyncEmbeddingClient(
+            self.api_url,
+            self.api_key,
+            self.model,
+            max_concurrency=max_concurrency,
+            timeout=self.timeout,
+            encoding_format=self.encoding_format
+        )
+
 
 class VoyageEmbedding(EmbeddingGenerator):
     """Voyage AI embedding generator."""
 
-    def __init__(self, api_key: str, model: str = "voyage-large-2-instruct"):
+    max_batch_items = 128
+    max_batch_tokens = 120000
+    max_input_tokens = 16000
+
+    def __init__(self, api_key: str, model: str = "voyage-large-2-instruct", api_url: Optional[str] = None):
         super().__init__(api_key)
         self.model = model
-        self.api_url = "https://api.voyageai.com/v1/embeddings"
+        self.api_url = api_url or "https://api.voyageai.com/v1/embeddings"
 
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using Voyage AI API."""
+    def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Generate embeddings using Voyage AI API (float32 arrays)."""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -46,16 +92,15 @@ class VoyageEmbedding(EmbeddingGenerator):
             "input": texts,
             "model": self.model
         }
+        if self.encoding_format:
+            payload["encoding_format"] = self.encoding_format
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = self.session.post(self.api_url, headers=headers, json=payload, timeout=self.timeout)
         response.raise_for_status()
 
-        result = response.json()
-        embeddings = [item["embedding"] for item in result["data"]]
-
-        return embeddings
+        return decode_embeddings(response.json())
 
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a single text."""
         return self.generate_embeddings([text])[0]
 
@@ -63,13 +108,17 @@ class VoyageEmbedding(EmbeddingGenerator):
 class OpenAIEmbedding(EmbeddingGenerator):
     """OpenAI embedding generator."""
 
-    def __init__(self, api_key: str, model: str = "text-embedding-3-large"):
+    max_batch_items = 2048
+    max_batch_tokens = 300000
+    max_input_tokens = 8191
+
+    def __init__(self, api_key: str, model: str = "text-embedding-3-large", api_url: Optional[str] = None):
         super().__init__(api_key)
         self.model = model
-        self.api_url = "https://api.openai.com/v1/embeddings"
+        self.api_url = api_url or "https://api.openai.com/v1/embeddings"
 
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using OpenAI API."""
+    def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Generate embeddings using OpenAI API (float32 arrays)."""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -79,16 +128,15 @@ class OpenAIEmbedding(EmbeddingGenerator):
             "input": texts,
             "model": self.model
         }
+        if self.encoding_format:
+            payload["encoding_format"] = self.encoding_format
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = self.session.post(self.api_url, headers=headers, json=payload, timeout=self.timeout)
         response.raise_for_status()
 
-        result = response.json()
-        embeddings = [item["embedding"] for item in result["data"]]
+        return decode_embeddings(response.json())
 
-        return embeddings
-
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a single text."""
         return self.generate_embeddings([text])[0]
 
@@ -99,16 +147,26 @@ class ChunkEmbeddingManager:
     def __init__(
         self,
         embedding_generator: EmbeddingGenerator,
-        processed_data_dir: str
+        processed_data_dir: str,
+        embedding_cache=None
     ):
+        """
+        Initialize chunk embedding manager.
+
+        Args:
+            embedding_generator: Generator used for cache misses
+            processed_data_dir: Directory with processed chunks
+            embedding_cache: Optional content-addressed cache (see embedding_cache.ContentEmbeddingCache)
+        """
         self.embedding_generator = embedding_generator
         self.processed_data_dir = Path(processed_data_dir)
+        self.embedding_cache = embedding_cache
 
     def embed_chunks(
         self,
         chunks_file: str = "all_chunks.json",
         output_file: str = "chunks_with_embeddings.json",
-        batch_size: int = 100
+        batch_size: Optional[int] = DEFAULT_EMBEDDING_BATCH_SIZE
     ) -> str:
         """
         Generate embeddings for all chunks and save to file.
@@ -116,7 +174,7 @@ class ChunkEmbeddingManager:
         Args:
             chunks_file: Input JSON file with chunks
             output_file: Output JSON file with chunks + embeddings
-            batch_size: Number of chunks to embed at once
+            batch_size: Maximum chunks per request (None for the provider limit)
 
         Returns:
             Path to output file
@@ -131,44 +189,190 @@ class ChunkEmbeddingManager:
 
         print(f"Loaded {len(chunks)} chunks")
 
-        # Generate embeddings in batches
-        print("Generating embeddings...")
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            batch_texts = [chunk["content"] for chunk in batch]
-
-            print(f"  Processing batch {i // batch_size + 1} ({i+1}-{min(i+batch_size, len(chunks))} of {len(chunks)})")
-
-            try:
-                embeddings = self.embedding_generator.generate_embeddings(batch_texts)
-
-                # Add embeddings to chunks
-                for j, embedding in enumerate(embeddings):
-                    chunks[i + j]["embedding"] = embedding
-                    chunks[i + j]["embedding_model"] = getattr(
-                        self.embedding_generator,
-                        'model',
-                        'unknown'
-                    )
-
-            except Exception as e:
-                print(f"  ERROR in batch {i // batch_size + 1}: {e}")
-                raise
+        # Completed batches go to a checkpoint, so a rerun resumes after a failure
+        model = getattr(self.embedding_generator, 'model', 'unknown')
+        checkpoint = EmbeddingCheckpoint(checkpoint_path(output_path), model)
+        self.embed_chunk_list(chunks, batch_size, checkpoint=checkpoint, keep_embeddings=False)
 
-        # Save chunks with embeddings
+        # Save chunks with embeddings, streamed from the checkpoint
         print(f"Saving chunks with embeddings to {output_path}...")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, indent=2, ensure_ascii=False)
+        checkpoint.write_index(chunks, output_path)
+        embedding_dims = checkpoint.dimensions
+        checkpoint.remove()
+
+        # Artifacts stored with the index describe the old chunk set: rebuild them
+        build_citation_graph(chunks, str(output_path.parent / CITATION_GRAPH_FILE))
+        build_fact_index(chunks, str(output_path.parent / FACT_INDEX_FILE))
 
         print(f"✓ Successfully generated embeddings for {len(chunks)} chunks")
 
         # Print statistics
-        embedding_dims = len(chunks[0]["embedding"]) if chunks else 0
         print(f"  Embedding dimensions: {embedding_dims}")
         print(f"  File size: {output_path.stat().st_size / 1024 / 1024:.2f} MB")
 
         return str(output_path)
 
+    def embed_chunk_list(
+        self,
+        chunks: List[Dict],
+        batch_size: Optional[int] = DEFAULT_EMBEDDING_BATCH_SIZE,
+        concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY,
+        checkpoint: Optional[EmbeddingCheckpoint] = None,
+        keep_embeddings: bool = True
+    ) -> List[Dict]:
+        """
+        Add embeddings to chunk dicts in place.
+
+        Shared by embed_chunks and the ingestion scripts. Requests are packed up to the
+        generator's item and token limits; chunks longer than one input allows are split
+        and their piece embeddings averaged.
+
+        Args:
+            chunks: Chunk dicts with "content"
+            batch_size: Maximum chunks per request (None for the provider limit)
+            concurrency: Requests in flight at once (1 sends batches one after another)
+            checkpoint: Records every batch as it completes (a crash loses up to concurrency
+                batches in flight); chunks already in it are not re-embedded
+            keep_embeddings: Attach embeddings to the chunk dicts (False with a checkpoint
+                leaves them on disk, for EmbeddingCheckpoint.write_index)
+
+        Returns:
+            The same chunks, each with "embedding" and "embedding_model" if keep_embeddings
+        """
+        if checkpoint is None:
+            keep_embeddings = True
+        generator = self.embedding_generator
+        model = getattr(generator, 'model', 'unknown')
+
+        # Resume from the checkpoint, then reuse cached embeddings; only the rest go to the provider
+        pending = list(range(len(chunks)))
+        if checkpoint is not None and len(checkpoint):
+            pending = [i for i in pending if chunks[i]["content"] not in checkpoint]
+            if keep_embeddings:
+                for i in range(len(chunks)):
+                    if chunks[i]["content"] in checkpoint:
+                        chunks[i]["embedding"] = np.asarray(
+                            checkpoint.get(chunks[i]["content"]), dtype=np.float64
+                        ).tolist()
+                        chunks[i]["embedding_model"] = model
+            print(f"  Resuming: {len(chunks) - len(pending)} chunks already in checkpoint {checkpoint.path.name}")
+
+        if self.embedding_cache is not None:
+            misses = []
+            hits = []
+            for i in pending:
+                cached = self.embedding_cache.get(model, chunks[i]["content"])
+                if cached is None:
+                    misses.append(i)
+                else:
+                    hits.append((i, cached))
+                    if keep_embeddings:
+                        chunks[i]["embedding"] = np.asarray(cached, dtype=np.float64).tolist()
+                        chunks[i]["embedding_model"] = model
+            if checkpoint is not None and hits:
+                checkpoint.append([chunks[i]["content"] for i, _ in hits], [cached for _, cached in hits])
+            print(f"  {len(hits)} embeddings reused from cache, {len(misses)} to generate")
+            pending = misses
+
+        # One embedding input per piece: (chunk index, text, estimated tokens)
+        max_input_tokens = getattr(generator, 'max_input_tokens', EmbeddingGenerator.max_input_tokens)
+        pieces = []
+        piece_counts = {}
+        for i in pending:
+            parts = split_text(chunks[i]["content"], max_input_tokens)
+            piece_counts[i] = len(parts)
+            pieces.extend((i, part, estimate_tokens(part)) for part in parts)
+
+        max_items = getattr(generator, 'max_batch_items', EmbeddingGenerator.max_batch_items)
+        if batch_size:
+            max_items = min(max_items, batch_size)
+        max_tokens = getattr(generator, 'max_batch_tokens', EmbeddingGenerator.max_batch_tokens)
+        batches = pack_batches([tokens for _, _, tokens in pieces], max_items, max_tokens)
+
+        create_async_client = getattr(generator, 'create_async_client', None)
+        concurrent = create_async_client is not None and concurrency > 1 and len(batches) > 1
+
+        split_chunks = sum(1 for count in piece_counts.values() if count > 1)
+        print(
+            f"Generating embeddings ({len(pending)} chunks as {len(pieces)} inputs in {len(batches)} requests"
+            f"{f', {concurrency} at a time' if concurrent else ''})..."
+        )
+        if split_chunks:
+            print(f"  {split_chunks} chunks over {max_input_tokens} tokens split into pieces")
+        start_time = time.perf_counter()
+        completed = {"batches": 0, "chunks": 0}
+        partial = {}  # chunk index -> {piece position: (embedding, tokens)}
+
+        def store(batch_index: int, embeddings: List[np.ndarray]):
+            """Attach one completed batch (batches may complete out of order)."""
+            finished = []
+            for position, embedding in zip(batches[batch_index], embeddings):
+                i, _, tokens = pieces[position]
+                parts = partial.setdefault(i, {})
+                parts[position] = (embedding, tokens)
+                if len(parts) == piece_counts[i]:
+                    ordered = [parts[key] for key in sorted(parts)]
+                    finished.append((i, combine_embeddings(
+                        [part[0] for part in ordered], [part[1] for part in ordered]
+                    )))
+                    del partial[i]
+
+            finished_texts = [chunks[i]["content"] for i, _ in finished]
+            finished_embeddings = [embedding for _, embedding in finished]
+            if checkpoint is not None and finished:
+                checkpoint.append(finished_texts, finished_embeddings)
+            if self.embedding_cache is not None and finished:
+                self.embedding_cache.put_many(model, finished_texts, finished_embeddings)
+            if keep_embeddings:
+                # Chunk dicts are saved as JSON: plain floats
+                for i, embedding in finished:
+                    chunks[i]["embedding"] = np.asarray(embedding, dtype=np.float64).tolist()
+                    chunks[i]["embedding_model"] = model
+
+            completed["batches"] += 1
+            completed["chunks"] += len(finished)
+            elapsed = time.perf_counter() - start_time
+            print(
+                f"  Batch {completed['batches']}/{len(batches)}: {completed['chunks']}/{len(pending)} chunks "
+                f"({completed['chunks'] / elapsed if elapsed else 0:.1f} chunks/s)"
+            )
+
+        def texts(batch_index: int) -> List[str]:
+            return [pieces[position][1] for position in batches[batch_index]]
+
+        if concurrent:
+            async def embed_all():
+                async with create_async_client(max_concurrency=concurrency) as client:
+                    await client.embed_batches([texts(b) for b in range(len(batches))], on_batch=store)
+                    return client.stats()
+
+            try:
+                client_stats = asyncio.run(embed_all())
+            except Exception as e:
+                print(f"  ERROR after {completed['batches']}/{len(batches)} batches: {e}")
+                raise
+            print(
+                f"  {client_stats['requests']} requests, {client_stats['throttled']} throttled, "
+                f"{client_stats['retries']} retries, {client_stats['splits']} batch splits"
+            )
+        else:
+            for batch_index in range(len(batches)):
+                try:
+                    embeddings = generator.generate_embeddings(texts(batch_index))
+                except Exception as e:
+                    print(f"  ERROR in batch {batch_index + 1}: {e}")
+                    raise
+                store(batch_index, embeddings)
+
+        elapsed = time.perf_counter() - start_time
+        if pending:
+            print(
+                f"  Embedded {len(pending)} chunks in {elapsed:.1f}s "
+                f"({len(pending) / elapsed if elapsed else 0:.1f} chunks/s)"
+            )
+
+        return chunks
+
     def compute_similarity(
         self,
         embedding1: List[float],
@@ -225,7 +429,8 @@ class ChunkEmbeddingManager:
 
 def create_embedding_generator(
     provider: str = "voyage",
-    api_key: Optional[str] = None
+    api_key: Optional[str] = None,
+    api_url: Optional[str] = None
 ) -> EmbeddingGenerator:
     """
     Factory function to create embedding generator.
@@ -233,23 +438,28 @@ def create_embedding_generator(
     Args:
         provider: "voyage" or "openai"
         api_key: API key (if None, reads from environment)
+        api_url: Endpoint override (if None, reads EMBEDDING_API_URL, e.g. a local
+            stub_embedding_server; otherwise the provider's API)
 
     Returns:
         EmbeddingGenerator instance
     """
+    if api_url is None:
+        api_url = os.getenv("EMBEDDING_API_URL") or None
+
     if provider.lower() == "voyage":
         if api_key is None:
             api_key = os.getenv("VOYAGE_API_KEY")
         if not api_key:
             raise ValueError("VOYAGE_API_KEY not found in environment")
-        return VoyageEmbedding(api_key)
+        return VoyageEmbedding(api_key, api_url=api_url)
 
     elif provider.lower() == "openai":
         if api_key is None:
             api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment")
-        return OpenAIEmbedding(api_key)
+        return OpenAIEmbedding(api_key, api_url=api_url)
 
     else:
         raise ValueError(f"Unknown provider: {provider}. Use 'voyage' or 'openai'")
@@ -296,8 +506,13 @@ def main():
     # Create embedding generator
     embedding_gen = create_embedding_generator(provider=args.provider)
 
-    # Create manager
-    manager = ChunkEmbeddingManager(embedding_gen, args.data_dir)
+    # Create manager (content-addressed cache so unchanged chunks are not re-embedded)
+    from embedding_cache import create_chunk_embedding_cache
+    manager = ChunkEmbeddingManager(
+        embedding_gen,
+        args.data_dir,
+        embedding_cache=create_chunk_embedding_cache(args.data_dir)
+    )
 
     # Generate embeddings
     output_path = manager.embed_chunks(
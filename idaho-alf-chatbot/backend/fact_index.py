@@ -0,0 +1,377 @@
+"""
+Numeric Fact Index for Idaho ALF RegNavigator
+Extracts quantity/unit/subject facts from regulation chunks for direct answers.
+"""
+
+import re
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable, Set, Tuple
+
+from subsections import is_subsection
+from index_fingerprint import IndexFingerprint, index_fingerprint
+
+
+# Default file name, stored next to chunks_with_embeddings.json
+FACT_INDEX_FILE = "fact_index.json"
+
+# Amendment markers like "(3-15-22)" carry no meaning for facts
+AMENDMENT_MARKER_PATTERN = re.compile(r"\(\d{1,2}-\d{1,2}-\d{2}\)")
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.;:])\s+")
+
+# "one (1) flushing toilet for every six (6) residents"
+RATIO_PATTERN = re.compile(
+    r"(?:[a-z\-]+\s+)?\((\d+)\)\s+([^;.()]{1,80}?)\s+for\s+(?:every|each)\s+(?:[a-z\-]+\s+)?\((\d+)\)\s+([a-z]+)",
+    re.IGNORECASE
+)
+# "5°C (41°F)", "135ºF", "165 degrees F"
+TEMPERATURE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(?:[°º]\s*|degrees?\s+)(F|C)(?:ahrenheit|elsius)?\b",
+    re.IGNORECASE
+)
+# "thirty (30) square feet", "(60) days", "fourteen (14) consecutive hours"
+MEASURE_PATTERN = re.compile(
+    r"(?:[a-z\-]+\s+)?\((\d+(?:\.\d+)?)\)\s+((?:consecutive\s+|calendar\s+|business\s+|licensed\s+)?"
+    r"(?:square\s+feet|feet|foot|inches|inch|days?|hours?|minutes?|months?|years?|residents?|beds?))\b",
+    re.IGNORECASE
+)
+
+# Question keywords that signal which kind of fact is being asked for
+INTENT_KEYWORDS = {
+    "temperature": {"temperature", "temperatures", "degrees", "hot", "cold", "cook", "cooking",
+                    "cooling", "reheat", "reheating", "holding", "fahrenheit", "celsius"},
+    "ratio": {"ratio", "ratios", "every", "per", "many", "number", "toilets", "showers", "staffing"},
+    "area": {"square", "footage", "feet", "space", "size", "big", "large", "ceiling", "height"},
+    "duration": {"days", "hours", "long", "within", "notice", "deadline", "when", "often", "months", "years"}
+}
+
+# Question words that only name the kind of quantity; the remaining terms are the subject
+# the fact has to be about ("hot holding temperature for food" -> hot, holding, food)
+KIND_TERMS = {
+    "temperature", "degree", "fahrenheit", "celsius", "ratio", "number", "many", "per", "every",
+    "square", "feet", "footage", "size", "big", "large", "long", "often", "within", "deadline",
+    "when", "day", "days", "hour", "minute", "month", "year", "minimum", "maximum"
+}
+
+# Unit words in a question -> unit text of the facts they ask for
+QUESTION_UNITS = {
+    "fahrenheit": "°F", "celsius": "°C",
+    "days": "day", "hours": "hour", "minutes": "minute", "months": "month", "years": "year",
+    "feet": "feet", "inches": "inch"
+}
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "at", "by", "is", "are", "be",
+    "what", "which", "how", "do", "does", "i", "we", "my", "our", "must", "should", "can",
+    "there", "that", "this", "with", "about", "tell", "me", "any", "required", "requirement",
+    "requirements", "idaho", "facility", "facilities"
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with plurals folded ("toilets" -> "toilet")."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS or len(token) <= 2:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def unit_kind(unit: str) -> str:
+    """Map a unit to the kind of fact it expresses."""
+    unit = unit.lower()
+    if "feet" in unit or "foot" in unit or "inch" in unit:
+        return "area"
+    if any(word in unit for word in ("day", "hour", "minute", "month", "year")):
+        return "duration"
+    return "ratio"
+
+
+class FactIndex:
+    """Inverted index of numeric requirement facts."""
+
+    def __init__(self, facts: Optional[List[Dict]] = None, fingerprint: Optional[str] = None):
+        """
+        Initialize fact index.
+
+        Args:
+            facts: Extracted facts (see extract_facts for the fact format)
+            fingerprint: index_fingerprint of the chunk set the facts were extracted from
+        """
+        self.facts = facts or []
+        self.fingerprint = fingerprint
+
+        # Term -> fact positions, for millisecond lookups
+        self.postings: Dict[str, List[int]] = {}
+        # (chunk_id, subject) -> (quantity, unit) pairs stated by that sentence
+        self.sentence_values: Dict[Tuple[str, str], Set[Tuple[float, str]]] = {}
+        for position, fact in enumerate(self.facts):
+            for term in set(tokenize(fact["subject"]) + tokenize(fact.get("section_title", ""))):
+                self.postings.setdefault(term, []).append(position)
+            self.sentence_values.setdefault((fact["chunk_id"], fact["subject"]), set()).add(
+                (fact["quantity"], fact["unit"])
+            )
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Dict]) -> "FactIndex":
+        """Extract facts from every section chunk (subsection chunks repeat their text); chunks may be a stream."""
+        facts = []
+        fingerprint = IndexFingerprint()
+        for chunk in chunks:
+            fingerprint.update(chunk)
+            if not is_subsection(chunk):
+                facts.extend(extract_facts(chunk))
+        return cls(facts, fingerprint.hexdigest())
+
+    def lookup(self, question: str, min_score: float = 3.5, min_margin: float = 1.0) -> Optional[Dict]:
+        """
+        Find the fact that best answers a numeric question.
+
+        Only facts of the asked-for kind whose subject or section title contains every
+        subject term of the question qualify; a fact in a unit the question did not ask
+        for is penalized. The answer is sent to users without an LLM, so the lookup
+        declines (returns None) unless the best sentence beats every sentence stating
+        other values by min_margin.
+
+        Args:
+            question: User question
+            min_score: Minimum score for a fact to be returned
+            min_margin: Minimum lead over the best sentence stating different values
+
+        Returns:
+            Best matching fact with an "answer" string, or None
+        """
+        question_words = set(TOKEN_PATTERN.findall(question.lower()))
+
+        intents = {
+            kind for kind, keywords in INTENT_KEYWORDS.items()
+            if question_words & keywords
+        }
+        # Not a numeric question: leave it to the full RAG pipeline
+        if not intents:
+            return None
+
+        subject_terms = set(tokenize(question)) - KIND_TERMS
+        if not subject_terms:
+            return None
+        units = {QUESTION_UNITS[word] for word in question_words if word in QUESTION_UNITS}
+
+        matches: Dict[int, int] = {}
+        for term in subject_terms:
+            for position in self.postings.get(term, []):
+                matches[position] = matches.get(position, 0) + 1
+
+        # Best fact and score per stating sentence
+        sentences: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+        for position, matched in matches.items():
+            fact = self.facts[position]
+            if matched < len(subject_terms) or fact["kind"] not in intents:
+                continue
+            score = matched + 1.5
+            if units and not any(unit in fact["unit"] for unit in units):
+                score -= 1.0
+            key = (fact["chunk_id"], fact["subject"])
+            if key not in sentences or score > sentences[key][0]:
+                sentences[key] = (score, fact)
+
+        if not sentences:
+            return None
+        best_score, best = max(sentences.values(), key=lambda entry: entry[0])
+        if best_score < min_score:
+            return None
+
+        # Another sentence stating other values nearly as well: ambiguous
+        best_key = (best["chunk_id"], best["subject"])
+        best_values = self.sentence_values[best_key]
+        for key, (score, fact) in sentences.items():
+            if (
+                key != best_key
+                and best_score - score < min_margin
+                and not self.sentence_values[key] & best_values
+            ):
+                return None
+
+        return {
+            **best,
+            "score": best_score,
+            "answer": f"{best['subject']} [{best['citation']}]"
+        }
+
+    def to_dict(self) -> Dict:
+        """Convert index to its JSON form."""
+        return {"fingerprint": self.fingerprint, "facts": self.facts}
+
+    def save(self, path: str) -> Path:
+        """Save index to a JSON file."""
+        path = Path(path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "FactIndex":
+        """Load index from a JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get("facts"), data.get("fingerprint"))
+
+    def stats(self) -> Dict:
+        """Summary counts for ingest reports."""
+        kinds = {}
+        for fact in self.facts:
+            kinds[fact["kind"]] = kinds.get(fact["kind"], 0) + 1
+        return {"total_facts": len(self.facts), "by_kind": kinds}
+
+
+def extract_facts(chunk: Dict) -> List[Dict]:
+    """
+    Extract numeric facts from a single chunk.
+
+    Each fact has quantity, unit, kind ("ratio", "temperature", "area", "duration"),
+    subject (the sentence stating it) and the source chunk_id, citation and section_title.
+    """
+    content = AMENDMENT_MARKER_PATTERN.sub("", chunk["content"])
+    content = " ".join(content.split())
+
+    facts = []
+    seen = set()
+
+    def add_fact(quantity: float, unit: str, kind: str, subject: str, per: Optional[float] = None):
+        key = (quantity, unit, per, subject)
+        if key in seen:
+            return
+        seen.add(key)
+        fact = {
+            "quantity": quantity,
+            "unit": unit,
+            "kind": kind,
+            "subject": subject,
+            "chunk_id": chunk["chunk_id"],
+            "citation": chunk["citation"],
+            "section_title": chunk.get("section_title", "")
+        }
+        if per is not None:
+            fact["per"] = per
+        facts.append(fact)
+
+    for sentence in SENTENCE_SPLIT_PATTERN.split(content):
+        sentence = sentence.strip()
+        if len(sentence) < 15:
+            continue
+        subject = sentence if len(sentence) <= 300 else sentence[:297] + "..."
+
+        ratio_spans = []
+        for match in RATIO_PATTERN.finditer(sentence):
+            ratio_spans.append(match.span())
+            add_fact(
+                float(match.group(1)),
+                f"{match.group(2).strip()} per {match.group(4).lower()}",
+                "ratio",
+                subject,
+                per=float(match.group(3))
+            )
+
+        for match in TEMPERATURE_PATTERN.finditer(sentence):
+            add_fact(float(match.group(1)), f"°{match.group(2).upper()}", "temperature", subject)
+
+        for match in MEASURE_PATTERN.finditer(sentence):
+            # Quantities already captured as part of a ratio
+            if any(start <= match.start() < end for start, end in ratio_spans):
+                continue
+            unit = " ".join(match.group(2).lower().split())
+            add_fact(float(match.group(1)), unit, unit_kind(unit), subject)
+
+    return facts
+
+
+def build_fact_index(chunks: Iterable[Dict], output_path: str) -> FactIndex:
+    """Build the fact index for a chunk set and store it next to the index."""
+    index = FactIndex.from_chunks(chunks)
+    index.save(output_path)
+
+    stats = index.stats()
+    print(f"✓ Saved fact index to {output_path}")
+    print(f"  Facts extracted: {stats['total_facts']}")
+    for kind, count in sorted(stats["by_kind"].items()):
+        print(f"    {kind}: {count}")
+
+    return index
+
+
+def load_or_build_fact_index(
+    chunks: List[Dict],
+    index_path: Path,
+    fingerprint: Optional[str] = None
+) -> FactIndex:
+    """
+    Load the fact index stored with an index, or rebuild it if it is missing or stale.
+
+    Facts are served as the whole answer on the skip_llm path, so facts extracted from
+    another chunk set (the index was rewritten without them) are never used; they are
+    rebuilt and saved over the stale file.
+
+    Args:
+        chunks: Index chunks
+        index_path: Path of the index file the fact index is stored next to
+        fingerprint: index_fingerprint of chunks, if already computed
+    """
+    fact_index_path = Path(index_path).parent / FACT_INDEX_FILE
+    if fingerprint is None:
+        fingerprint = index_fingerprint(chunks)
+
+    if fact_index_path.exists():
+        index = FactIndex.load(str(fact_index_path))
+        if index.fingerprint == fingerprint:
+            return index
+        print(f"⚠️  {fact_index_path.name} was built from another index; rebuilding")
+
+    index = FactIndex.from_chunks(chunks)
+    try:
+        index.save(str(fact_index_path))
+    except OSError as e:
+        print(f"⚠️  Could not save {fact_index_path.name}: {e}")
+    return index
+
+
+def main():
+    """Build the fact index for an existing chunks file."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build numeric fact index for regulation chunks")
+    parser.add_argument(
+        "--data-dir",
+        default=str(Path(__file__).parent.parent / "data" / "processed"),
+        help="Directory with processed chunks"
+    )
+    parser.add_argument(
+        "--chunks-file",
+        default="chunks_with_embeddings.json",
+        help="Input chunks file"
+    )
+    parser.add_argument(
+        "--query",
+        help="Optional question to look up after building"
+    )
+
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    with open(data_dir / args.chunks_file, 'r', encoding='utf-8') as f:
+        chunks = json.load(f)
+
+    print(f"Loaded {len(chunks)} chunks")
+    index = build_fact_index(chunks, str(data_dir / FACT_INDEX_FILE))
+
+    if args.query:
+        fact = index.lookup(args.query)
+        print(f"\nQuery: {args.query}")
+        print(f"Fact: {fact['answer'] if fact else 'no match'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Index fingerprints for Idaho ALF RegNavigator
+Identifies the chunk set an artifact stored next to the index (citation graph, fact
+index) was built from, so a stale artifact is rebuilt instead of served.
+"""
+
+import hashlib
+from typing import Dict, Iterable
+
+
+class IndexFingerprint:
+    """
+    Running sha256 of the chunk fields artifacts are derived from.
+
+    Covers chunk_id, citation, section_title, content and alias citations, in index
+    order; embeddings are left out, so re-embedding with another model keeps artifacts valid.
+    """
+
+    def __init__(self):
+        self._digest = hashlib.sha256()
+
+    def update(self, chunk: Dict):
+        """Add the next chunk of the index."""
+        fields = [
+            chunk["chunk_id"],
+            chunk.get("citation", ""),
+            chunk.get("section_title", ""),
+            chunk.get("content", "")
+        ]
+        fields.extend(alias["citation"] for alias in chunk.get("aliases", []))
+        self._digest.update("\x00".join(fields).encode("utf-8") + b"\x01")
+
+    def hexdigest(self) -> str:
+        """Fingerprint of the chunks added so far."""
+        return self._digest.hexdigest()[:16]
+
+
+def index_fingerprint(chunks: Iterable[Dict]) -> str:
+    """Fingerprint of a chunk set (see IndexFingerprint)."""
+    fingerprint = IndexFingerprint()
+    for chunk in chunks:
+        fingerprint.update(chunk)
+    return fingerprint.hexdigest()
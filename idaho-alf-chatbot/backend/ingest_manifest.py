@@ -0,0 +1,241 @@
+"""
+Incremental ingestion for Idaho ALF RegNavigator
+A manifest records every indexed raw file's sha256, the parser version that chunked it
+and the chunk ids it produced. Ingest compares it with the raw directory to get the exact
+add/change/remove delta, and reparses, re-embeds and re-indexes only the affected files.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import List, Dict, Set, Optional
+
+from txt_processor import IDAPATextProcessor, PARSER_VERSION
+from embeddings import ChunkEmbeddingManager
+from embedding_checkpoint import EmbeddingCheckpoint, checkpoint_path
+from dedup import ChunkDeduplicator, file_digest, group_identical_files
+from citation_graph import CITATION_GRAPH_FILE, build_citation_graph
+from fact_index import FACT_INDEX_FILE, build_fact_index
+
+
+# Written next to the index (data/processed/ingest_manifest.json)
+MANIFEST_FILE = "ingest_manifest.json"
+
+
+class IngestManifest:
+    """Raw files in the index: sha256, parser version and chunk ids of each."""
+
+    def __init__(self, path: Path):
+        """
+        Load a manifest (empty if the file does not exist yet).
+
+        Args:
+            path: Manifest file (see MANIFEST_FILE)
+        """
+        self.path = Path(path)
+        self.files: Dict[str, Dict] = {}  # filename -> {"sha256", "parser_version", "chunk_ids"}
+        self.exists = self.path.exists()
+        self._digests: Dict[str, str] = {}  # digests computed by diff, reused by record
+
+        if self.exists:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get("files", {})
+
+    def diff(self, raw_dir: Path, filenames: List[str]) -> Dict[str, List[str]]:
+        """
+        Compare the raw files with the manifest.
+
+        A file whose parser version differs from PARSER_VERSION counts as changed, so
+        chunker changes reach the index without a full rebuild.
+
+        Args:
+            raw_dir: Directory holding the files
+            filenames: Raw files that should be in the index, in processing order
+
+        Returns:
+            "added", "changed", "removed" and "unchanged" filenames
+        """
+        delta = {"added": [], "changed": [], "removed": [], "unchanged": []}
+
+        for filename in filenames:
+            digest = file_digest(Path(raw_dir) / filename)
+            self._digests[filename] = digest
+            entry = self.files.get(filename)
+            if entry is None:
+                delta["added"].append(filename)
+            elif entry["sha256"] != digest or entry.get("parser_version") != PARSER_VERSION:
+                delta["changed"].append(filename)
+            else:
+                delta["unchanged"].append(filename)
+
+        present = set(filenames)
+        delta["removed"] = [filename for filename in self.files if filename not in present]
+        return delta
+
+    def chunk_ids(self, filenames) -> Set[str]:
+        """Chunk ids recorded for some files."""
+        ids = set()
+        for filename in filenames:
+            ids.update(self.files.get(filename, {}).get("chunk_ids", []))
+        return ids
+
+    def record(self, raw_dir: Path, filename: str, chunk_ids: List[str]):
+        """Record a file as indexed with the current parser."""
+        digest = self._digests.get(filename) or file_digest(Path(raw_dir) / filename)
+        self.files[filename] = {
+            "sha256": digest,
+            "parser_version": PARSER_VERSION,
+            "chunk_ids": list(chunk_ids)
+        }
+
+    def forget(self, filename: str):
+        self.files.pop(filename, None)
+
+    def reset(self, raw_dir: Path, filenames: List[str], chunk_ids_by_file: Dict[str, List[str]]):
+        """Replace the manifest after a full rebuild of the index from these files."""
+        self.files = {}
+        for filename in filenames:
+            self.record(raw_dir, filename, chunk_ids_by_file.get(filename, []))
+
+    def save(self):
+        """Write the manifest atomically."""
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.files}, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self.exists = True
+
+
+def affected_files(chunks: List[Dict], files: Set[str]) -> Set[str]:
+    """
+    Expand files to everything linked to them through citation aliases.
+
+    A stored chunk and its aliases come from different files but share one entry, so when
+    any of those files changes the others are reindexed with it.
+    """
+    affected = set(files)
+    groups = [
+        {chunk.get("source_file")} | {alias.get("source_file") for alias in chunk["aliases"]}
+        for chunk in chunks if chunk.get("aliases")
+    ]
+
+    changed = True
+    while changed:
+        changed = False
+        for group in groups:
+            if group & affected and not group <= affected:
+                affected |= group
+                changed = True
+
+    return affected
+
+
+def update_index(
+    processor: IDAPATextProcessor,
+    embedding_manager: ChunkEmbeddingManager,
+    index_path: Path,
+    manifest: Optional[IngestManifest] = None,
+    filenames: Optional[List[str]] = None
+) -> Dict:
+    """
+    Bring the index in line with the raw directory, touching only affected files.
+
+    Chunks of changed and removed files are dropped, changed and added files are
+    reparsed and only their new content is embedded. Without a manifest every raw file
+    counts as added, so the first run replaces the index once.
+
+    Args:
+        processor: Parser for the raw data directory
+        embedding_manager: Embeds new chunks (through its cache when it has one)
+        index_path: Index file (chunks_with_embeddings.json)
+        manifest: Manifest of the index (MANIFEST_FILE next to it if None)
+        filenames: Raw files that should be in the index (processor.source_files() if None)
+
+    Returns:
+        Update report with the file and chunk delta
+    """
+    index_path = Path(index_path)
+    raw_dir = processor.raw_data_dir
+    if manifest is None:
+        manifest = IngestManifest(index_path.parent / MANIFEST_FILE)
+    if filenames is None:
+        filenames = processor.source_files()
+
+    delta = manifest.diff(raw_dir, filenames)
+    report = {
+        "added_files": delta["added"],
+        "changed_files": delta["changed"],
+        "removed_files": delta["removed"],
+        "unchanged_files": len(delta["unchanged"]),
+        "reparsed_files": [],
+        "added_chunks": 0,
+        "updated_chunks": 0,
+        "removed_chunks": 0,
+        "embedded_chunks": 0,
+        "duplicate_chunks": 0,
+        "chunks": None
+    }
+    if not (delta["added"] or delta["changed"] or delta["removed"]):
+        return report
+
+    existing_chunks = []
+    if index_path.exists():
+        with open(index_path, 'r', encoding='utf-8') as f:
+            existing_chunks = json.load(f)
+
+    # Files whose chunks are rewritten: the delta plus files sharing aliased chunks with it
+    affected = affected_files(
+        existing_chunks,
+        set(delta["added"]) | set(delta["changed"]) | set(delta["removed"])
+    )
+    kept_chunks = [chunk for chunk in existing_chunks if chunk.get("source_file") not in affected]
+    reparse = [filename for filename in filenames if filename in affected]
+    report["reparsed_files"] = reparse
+
+    # Kept chunks are registered first, so new duplicates of them become their aliases
+    deduplicator = ChunkDeduplicator()
+    for chunk in kept_chunks:
+        deduplicator.add(chunk)
+
+    duplicate_files = group_identical_files(raw_dir, reparse)
+    deduplicator.duplicate_files = sum(len(duplicates) for duplicates in duplicate_files.values())
+    chunk_ids_by_file: Dict[str, List[str]] = {filename: [] for filename in reparse}
+    new_chunks = []
+    for chunk in processor.iter_all_chunks(list(duplicate_files), duplicate_files):
+        chunk_ids_by_file[chunk.source_file].append(chunk.chunk_id)
+        chunk_dict = chunk.to_dict()
+        if deduplicator.add(chunk_dict):
+            new_chunks.append(chunk_dict)
+
+    # Chunk-level delta against what the affected files produced before
+    old_ids = manifest.chunk_ids(affected)
+    new_ids = {chunk_id for ids in chunk_ids_by_file.values() for chunk_id in ids}
+    report["added_chunks"] = len(new_ids - old_ids)
+    report["updated_chunks"] = len(new_ids & old_ids)
+    report["removed_chunks"] = len(old_ids - new_ids)
+
+    # Only new content is embedded; completed batches are checkpointed for resuming
+    checkpoint = EmbeddingCheckpoint(
+        checkpoint_path(index_path),
+        getattr(embedding_manager.embedding_generator, 'model', 'unknown')
+    )
+    embedding_manager.embed_chunk_list(new_chunks, checkpoint=checkpoint, keep_embeddings=False)
+    report["embedded_chunks"] = len(new_chunks)
+
+    chunks = [deduplicator.with_aliases(chunk) for chunk in kept_chunks + new_chunks]
+    checkpoint.write_index(chunks, index_path)
+    checkpoint.remove()
+
+    build_citation_graph(chunks, str(index_path.parent / CITATION_GRAPH_FILE))
+    build_fact_index(chunks, str(index_path.parent / FACT_INDEX_FILE))
+
+    # The manifest follows the index, so a failed run is simply repeated
+    for filename in delta["removed"]:
+        manifest.forget(filename)
+    for filename in reparse:
+        manifest.record(raw_dir, filename, chunk_ids_by_file[filename])
+    manifest.save()
+
+    report["chunks"] = len(chunks)
+    report["duplicate_chunks"] = deduplicator.stats()["duplicate_chunks"]
+    return report
@@ -0,0 +1,421 @@
+"""
+Streaming ingestion pipeline for Idaho ALF RegNavigator
+Raw files to index in one pass: a parser thread feeds a bounded queue, packed batches are
+embedded concurrently and written as index segments as they complete, and the final
+index is streamed from the segments. Parsing overlaps with embedding, and memory is
+bounded by the queue and the segments in flight rather than by corpus size. Identical
+files and chunks are stored once, with the other citations as aliases.
+"""
+
+import os
+import json
+import time
+import queue
+import shutil
+import asyncio
+import resource
+import threading
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from txt_processor import IDAPATextProcessor
+from embeddings import EmbeddingGenerator, DEFAULT_EMBEDDING_CONCURRENCY, create_embedding_generator
+from embedding_cache import create_chunk_embedding_cache
+from embedding_checkpoint import write_json_array, unique_chunks
+from dedup import ChunkDeduplicator, group_identical_files
+from ingest_manifest import MANIFEST_FILE, IngestManifest
+from batch_packing import estimate_tokens, split_text, pack_batches, combine_embeddings
+from citation_graph import CITATION_GRAPH_FILE, add_citations, build_citation_graph
+from fact_index import FACT_INDEX_FILE, build_fact_index
+
+
+# Segment files, written next to the index while a run is in progress
+SEGMENT_DIR = "index_segments"
+
+# Parsed chunks waiting for embedding (backpressure on the parser)
+DEFAULT_QUEUE_SIZE = 256
+
+_DONE = object()
+
+
+class IngestPipeline:
+    """Parses, embeds and indexes raw regulation files as one pipelined job."""
+
+    def __init__(
+        self,
+        processor: IDAPATextProcessor,
+        embedding_generator: EmbeddingGenerator,
+        output_path: Path,
+        embedding_cache=None,
+        concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        keep_segments: bool = False
+    ):
+        """
+        Initialize ingestion pipeline.
+
+        Args:
+            processor: Parser for the raw data directory
+            embedding_generator: Generator providing the async client and request limits
+            output_path: Index file to write (chunks_with_embeddings.json)
+            embedding_cache: Optional content-addressed cache (see embedding_cache.ContentEmbeddingCache)
+            concurrency: Embedding requests in flight
+            queue_size: Parsed chunks buffered ahead of embedding
+            keep_segments: Keep segment files after the index is written
+        """
+        self.processor = processor
+        self.embedding_generator = embedding_generator
+        self.output_path = Path(output_path)
+        self.embedding_cache = embedding_cache
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.keep_segments = keep_segments
+        self.segment_dir = self.output_path.parent / SEGMENT_DIR
+
+        self.model = getattr(embedding_generator, 'model', 'unknown')
+        self.max_items = embedding_generator.max_batch_items
+        self.max_tokens = embedding_generator.max_batch_tokens
+        self.max_input_tokens = embedding_generator.max_input_tokens
+
+        self.deduplicator = ChunkDeduplicator()
+
+        self.chunks_parsed = 0
+        self.chunks_embedded = 0
+        self.cache_hits = 0
+        self.segments_written = 0
+        self.parse_seconds = 0.0
+        self.client_stats: Dict = {}
+        self.chunk_ids_by_file: Dict[str, List[str]] = {}
+        self._producer_error: Optional[BaseException] = None
+        self._segment_errors: List[BaseException] = []
+        self._start_time = 0.0
+
+    def _segment_path(self, number: int) -> Path:
+        return self.segment_dir / f"segment_{number:06d}.jsonl"
+
+    def _produce(self, duplicate_files: Dict[str, List[str]], chunk_queue: queue.Queue):
+        """Parser thread: push chunk dicts, blocking while the queue is full."""
+        try:
+            chunks = self.processor.iter_all_chunks(list(duplicate_files), duplicate_files)
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    self.parse_seconds += time.perf_counter() - start
+                chunk_queue.put(chunk.to_dict())
+                self.chunk_ids_by_file.setdefault(chunk.source_file, []).append(chunk.chunk_id)
+                self.chunks_parsed += 1
+        except BaseException as e:
+            self._producer_error = e
+        finally:
+            chunk_queue.put(_DONE)
+
+    async def _consume(self, chunk_queue: queue.Queue) -> int:
+        """Pack queued chunks into segments and embed them concurrently; returns the segment count."""
+        loop = asyncio.get_running_loop()
+        # Segments held in memory at once: enough to keep every request slot busy
+        slots = asyncio.Semaphore(self.concurrency * 2)
+        tasks = set()
+
+        segment: List[Dict] = []
+        segment_items = 0
+        segment_tokens = 0
+        sequence = 0
+
+        def finished(task: asyncio.Future):
+            tasks.discard(task)
+            slots.release()
+            if not task.cancelled() and task.exception() is not None:
+                self._segment_errors.append(task.exception())
+
+        async with self.embedding_generator.create_async_client(max_concurrency=self.concurrency) as client:
+            async def flush():
+                nonlocal segment, segment_items, segment_tokens, sequence
+                if not segment:
+                    return
+                chunks, number = segment, sequence
+                segment, segment_items, segment_tokens = [], 0, 0
+                sequence += 1
+
+                await slots.acquire()
+                task = asyncio.ensure_future(self._embed_segment(client, number, chunks))
+                tasks.add(task)
+                task.add_done_callback(finished)
+
+            while True:
+                chunk = await loop.run_in_executor(None, chunk_queue.get)
+                if chunk is _DONE:
+                    break
+                if self._segment_errors:
+                    raise self._segment_errors[0]
+                if not self.deduplicator.add(chunk):
+                    continue
+
+                cached = None
+                if self.embedding_cache is not None:
+                    cached = self.embedding_cache.get(self.model, chunk["content"])
+
+                if cached is not None:
+                    # Segments are JSON: plain floats
+                    chunk["embedding"] = np.asarray(cached, dtype=np.float64).tolist()
+                    chunk["embedding_model"] = self.model
+                    self.cache_hits += 1
+                    pieces = 0
+                    tokens = 0
+                else:
+                    parts = split_text(chunk["content"], self.max_input_tokens)
+                    pieces = len(parts)
+                    tokens = sum(estimate_tokens(part) for part in parts)
+
+                if segment and (
+                    len(segment) >= self.max_items
+                    or segment_items + pieces > self.max_items
+                    or segment_tokens + tokens > self.max_tokens
+                ):
+                    await flush()
+
+                segment.append(chunk)
+                segment_items += pieces
+                segment_tokens += tokens
+
+            await flush()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.client_stats = client.stats()
+
+        if self._segment_errors:
+            raise self._segment_errors[0]
+        return sequence
+
+    async def _embed_segment(self, client, number: int, chunks: List[Dict]):
+        """Embed the uncached chunks of a segment and write it to disk."""
+        pending = [chunk for chunk in chunks if "embedding" not in chunk]
+
+        if pending:
+            pieces = []
+            owners = []
+            for index, chunk in enumerate(pending):
+                for part in split_text(chunk["content"], self.max_input_tokens):
+                    pieces.append(part)
+                    owners.append(index)
+
+            tokens = [estimate_tokens(piece) for piece in pieces]
+            batches = pack_batches(tokens, self.max_items, self.max_tokens)
+            results = await client.embed_batches([[pieces[i] for i in batch] for batch in batches])
+            embeddings = [embedding for batch in results for embedding in batch]
+
+            parts: Dict[int, list] = {}
+            for owner, embedding, piece_tokens in zip(owners, embeddings, tokens):
+                parts.setdefault(owner, []).append((embedding, piece_tokens))
+
+            for index, chunk in enumerate(pending):
+                combined = combine_embeddings(
+                    [part[0] for part in parts[index]], [part[1] for part in parts[index]]
+                )
+                chunk["embedding"] = np.asarray(combined, dtype=np.float64).tolist()
+                chunk["embedding_model"] = self.model
+
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(
+                    self.model,
+                    [chunk["content"] for chunk in pending],
+                    [chunk["embedding"] for chunk in pending]
+                )
+
+        path = self._segment_path(number)
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        os.replace(temp_path, path)
+
+        self.chunks_embedded += len(pending)
+        self.segments_written += 1
+        elapsed = time.perf_counter() - self._start_time
+        print(
+            f"  Segment {number + 1}: {len(chunks)} chunks ({len(pending)} embedded) | "
+            f"{self.chunks_parsed} parsed, {self.chunks_embedded + self.cache_hits} indexed "
+            f"({(self.chunks_embedded + self.cache_hits) / elapsed if elapsed else 0:.1f} chunks/s)"
+        )
+
+    def _read_segments(self, segment_count: int) -> Iterator[Dict]:
+        """Chunks of the written segments in index order, with their aliases, one at a time."""
+        for number in range(segment_count):
+            with open(self._segment_path(number), 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield self.deduplicator.with_aliases(json.loads(line))
+
+    def _merge_segments(self, segment_count: int) -> Tuple[int, Dict[str, str]]:
+        """
+        Stream segments in order into the index.
+
+        Returns:
+            Number of chunks written and the citation lookup of the index (see
+            citation_graph.add_citations), the only chunk data kept in memory
+        """
+        by_citation: Dict[str, str] = {}
+
+        def chunks():
+            for chunk in self._read_segments(segment_count):
+                add_citations(by_citation, chunk)
+                yield chunk
+
+        count = write_json_array(unique_chunks(chunks()), self.output_path)
+        return count, by_citation
+
+    def run(self, filenames: Optional[List[str]] = None) -> Dict:
+        """
+        Run the pipeline and write the index, citation graph and fact index.
+
+        Args:
+            filenames: Raw files to ingest (processor.source_files() if None)
+
+        Returns:
+            Ingest report
+        """
+        self._start_time = time.perf_counter()
+        shutil.rmtree(self.segment_dir, ignore_errors=True)
+        self.segment_dir.mkdir(parents=True)
+
+        # Byte-identical files are parsed once; their chunks become aliases
+        if filenames is None:
+            filenames = self.processor.source_files()
+        duplicate_files = group_identical_files(self.processor.raw_data_dir, filenames)
+        self.deduplicator.duplicate_files = sum(len(duplicates) for duplicates in duplicate_files.values())
+
+        chunk_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        producer = threading.Thread(target=self._produce, args=(duplicate_files, chunk_queue), daemon=True)
+        producer.start()
+
+        segment_count = asyncio.run(self._consume(chunk_queue))
+        producer.join()
+        if self._producer_error is not None:
+            raise self._producer_error
+
+        print(f"Writing index to {self.output_path}...")
+        chunk_count, by_citation = self._merge_segments(segment_count)
+
+        # Graph and fact extraction stream the segments again rather than holding the text
+        build_citation_graph(
+            self._read_segments(segment_count),
+            str(self.output_path.parent / CITATION_GRAPH_FILE),
+            by_citation
+        )
+        build_fact_index(self._read_segments(segment_count), str(self.output_path.parent / FACT_INDEX_FILE))
+        if not self.keep_segments:
+            shutil.rmtree(self.segment_dir, ignore_errors=True)
+
+        # The index now holds exactly these files (see ingest_manifest.update_index)
+        manifest = IngestManifest(self.output_path.parent / MANIFEST_FILE)
+        manifest.reset(self.processor.raw_data_dir, filenames, self.chunk_ids_by_file)
+        manifest.save()
+
+        elapsed = time.perf_counter() - self._start_time
+        dedup_stats = self.deduplicator.stats()
+        return {
+            "chunks": chunk_count,
+            "duplicate_files": dedup_stats["duplicate_files"],
+            "duplicate_chunks": dedup_stats["duplicate_chunks"],
+            "embedded": self.chunks_embedded,
+            "cache_hits": self.cache_hits,
+            "segments": segment_count,
+            "requests": self.client_stats.get("requests", 0),
+            "throttled": self.client_stats.get("throttled", 0),
+            "parse_seconds": self.parse_seconds,
+            "elapsed_seconds": elapsed,
+            "chunks_per_second": chunk_count / elapsed if elapsed else 0.0,
+            # ru_maxrss is in KB on Linux (bytes on macOS)
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        }
+
+
+def main():
+    """Run the streaming ingestion pipeline from the command line."""
+    import argparse
+
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Parse, embed and index regulation files in one pass")
+    parser.add_argument(
+        "--provider",
+        choices=["voyage", "openai"],
+        default="openai",
+        help="Embedding provider (default: openai)"
+    )
+    parser.add_argument(
+        "--raw-dir",
+        default=str(base_dir / "data" / "raw"),
+        help="Directory with raw .txt regulation files"
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(base_dir / "data" / "processed"),
+        help="Directory for the index and its caches"
+    )
+    parser.add_argument(
+        "--output-file",
+        default="chunks_with_embeddings.json",
+        help="Index file name (default: chunks_with_embeddings.json)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_EMBEDDING_CONCURRENCY,
+        help=f"Embedding requests in flight (default: {DEFAULT_EMBEDDING_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Parsed chunks buffered ahead of embedding (default: {DEFAULT_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        "--keep-segments",
+        action="store_true",
+        help="Keep index segment files after the index is written"
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="Raw files to ingest (default: every .txt file in --raw-dir)"
+    )
+
+    args = parser.parse_args()
+
+    print("="*80)
+    print("IDAHO ALF REGULATIONS - STREAMING INGEST")
+    print("="*80)
+    print(f"Raw directory: {args.raw_dir}")
+    print(f"Output: {Path(args.data_dir) / args.output_file}")
+    print(f"Concurrency: {args.concurrency}, queue size: {args.queue_size}")
+    print("="*80 + "\n")
+
+    pipeline = IngestPipeline(
+        IDAPATextProcessor(args.raw_dir, args.data_dir),
+        create_embedding_generator(provider=args.provider),
+        Path(args.data_dir) / args.output_file,
+        embedding_cache=create_chunk_embedding_cache(args.data_dir),
+        concurrency=args.concurrency,
+        queue_size=args.queue_size,
+        keep_segments=args.keep_segments
+    )
+    report = pipeline.run(args.files or None)
+
+    print("\n" + "="*80)
+    print("INGEST COMPLETE")
+    print("="*80)
+    print(f"Chunks indexed: {report['chunks']} ({report['embedded']} embedded, {report['cache_hits']} from cache)")
+    print(f"Duplicates collapsed: {report['duplicate_chunks']} chunks, {report['duplicate_files']} identical files")
+    print(f"Segments: {report['segments']}, requests: {report['requests']}, throttled: {report['throttled']}")
+    print(f"Parsing: {report['parse_seconds']:.1f}s (overlapped with embedding)")
+    print(f"Wall time: {report['elapsed_seconds']:.1f}s ({report['chunks_per_second']:.1f} chunks/s)")
+    print(f"Peak memory: {report['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,22 @@ FastAPI application for Idaho ALF RegNavigator chatbot.
 """
 
 import os
+import json
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from pathlib import Path
 
 from rag_engine import RAGEngine
+from reranker import create_reranker
+from payloads import PayloadCache, PrecomputedPayload, accepts_gzip, chunks_payload, categories_payload
+from single_flight import create_single_flight
+from embedding_cache import normalize_query
+from sessions import UnknownSessionError
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -32,6 +41,12 @@ CHUNKS_PATH = Path(__file__).parent.parent / "data" / "processed" / "chunks_with
 
 rag_engine = None
 
+# /chunks and /categories bodies, serialized once per knowledge-base version
+payload_cache = PayloadCache()
+
+# Identical concurrent questions share one RAG pipeline run
+single_flight = create_single_flight()
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -46,7 +61,8 @@ async def startup_event():
     rag_engine = RAGEngine(
         chunks_with_embeddings_path=str(CHUNKS_PATH),
         embedding_provider="openai",
-        claude_model="claude-sonnet-4-20250514"
+        claude_model="claude-sonnet-4-20250514",
+        reranker=create_reranker()
     )
 
     print("✓ RAG engine initialized successfully")
@@ -63,6 +79,10 @@ class QueryRequest(BaseModel):
     conversation_history: Optional[List[Message]] = None
     top_k: int = 12  # Increased from 5 for better context
     temperature: float = 0.5  # Increased from 0.3 for more natural responses
+    citation_expansion: int = 0  # Max cited sections to add via the citation graph
+    fast_path: bool = False  # Answer numeric lookups directly from the fact index
+    skip_llm: bool = False  # With fast_path, return the fact without an LLM answer
+    session_id: Optional[str] = None  # Server-side session (replaces conversation_history)
 
 
 class Citation(BaseModel):
@@ -77,6 +97,20 @@ class RetrievedChunk(BaseModel):
     chunk_id: str
     similarity: float
     content: str
+    citation_aliases: List[str] = []  # Identical text published under other citations
+    subsections: List[str] = []  # Matching subsection citations (the prompt carried only these)
+
+
+class Fact(BaseModel):
+    answer: str
+    quantity: float
+    unit: str
+    kind: str
+    per: Optional[float] = None
+    subject: str
+    citation: str
+    section_title: str
+    chunk_id: str
 
 
 class QueryResponse(BaseModel):
@@ -84,6 +118,8 @@ class QueryResponse(BaseModel):
     citations: List[Citation]
     retrieved_chunks: List[RetrievedChunk]
     usage: dict
+    fact: Optional[Fact] = None
+    session_id: Optional[str] = None
 
 
 class HealthResponse(BaseModel):
@@ -116,104 +152,265 @@ async def health_check():
     )
 
 
+@app.get("/stats", response_model=dict)
+async def stats():
+    """Runtime statistics for retrieval stages and AI providers."""
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="RAG engine not initialized")
+
+    return {
+        **rag_engine.get_stats(),
+        "single_flight": single_flight.stats() if single_flight else None,
+        "ai_service": rag_engine.ai_service.get_stats()
+    }
+
+
+def _conversation_history(request: QueryRequest) -> Optional[List[dict]]:
+    """Convert Pydantic models to dicts for conversation history."""
+    if not request.conversation_history:
+        return None
+    return [
+        {"role": msg.role, "content": msg.content}
+        for msg in request.conversation_history
+    ]
+
+
+def _lookup_fact(request: QueryRequest) -> Optional[Fact]:
+    """Run the fact index fast path if the request asks for it."""
+    if not request.fast_path:
+        return None
+    fact = rag_engine.lookup_fact(request.question)
+    return Fact(**fact) if fact else None
+
+
+def _fact_response(fact: Fact) -> QueryResponse:
+    """Build a response from a fact alone (no LLM call)."""
+    return QueryResponse(
+        response=fact.answer,
+        citations=[
+            Citation(
+                citation=fact.citation,
+                section_title=fact.section_title,
+                chunk_id=fact.chunk_id
+            )
+        ],
+        retrieved_chunks=[],
+        usage={"provider": "fact_index", "chunks_retrieved": 0},
+        fact=fact
+    )
+
+
+def _answer(request: QueryRequest) -> dict:
+    """Run the full RAG pipeline for a request."""
+    return rag_engine.answer_question(
+        question=request.question,
+        conversation_history=_conversation_history(request),
+        top_k=request.top_k,
+        temperature=request.temperature,
+        citation_expansion=request.citation_expansion,
+        session_id=request.session_id,
+        verbose=False
+    )
+
+
+def _provider_calls(result: dict) -> int:
+    """
+    Provider calls a pipeline run made, as reported by the engine (query embedding
+    unless the query embedding cache had it, LLM unless the answer cache had it).
+
+    Session summaries run after the response, once per session, and are not shared.
+    """
+    return sum(result["usage"].get("provider_calls", {}).values())
+
+
+async def _answer_coalesced(request: QueryRequest) -> dict:
+    """Run the RAG pipeline, sharing in-flight runs for identical requests."""
+    if single_flight is None:
+        return await run_in_threadpool(_answer, request)
+
+    key = single_flight.make_key(
+        normalize_query(request.question),
+        _conversation_history(request),
+        request.top_k,
+        request.temperature,
+        request.citation_expansion,
+        request.session_id
+    )
+    return await single_flight.do(
+        key,
+        lambda: run_in_threadpool(_answer, request),
+        provider_calls=_provider_calls
+    )
+
+
+async def _require_session(request: QueryRequest):
+    """404 for a session_id that was not created with POST /sessions (or has been dropped)."""
+    if request.session_id and await run_in_threadpool(rag_engine.sessions.get, request.session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+
+def _summarize_session(session_id: Optional[str]):
+    """Update the session's rolling summary after an answer (runs after the response is sent)."""
+    if session_id and rag_engine is not None:
+        rag_engine.summarize_session(session_id)
+
+
+def _format_response(
+    result: dict,
+    fact: Optional[Fact] = None,
+    session_id: Optional[str] = None
+) -> QueryResponse:
+    """Format a RAG engine result as a QueryResponse."""
+    return QueryResponse(
+        response=result["response"],
+        citations=[
+            Citation(**citation) for citation in result["citations"]
+        ],
+        retrieved_chunks=[
+            RetrievedChunk(
+                citation=chunk["citation"],
+                section_title=chunk["section_title"],
+                chunk_id=chunk["chunk_id"],
+                similarity=chunk["similarity"],
+                content=chunk["content"][:500] + "...",  # Truncate for response size
+                citation_aliases=[alias["citation"] for alias in chunk.get("aliases", [])],
+                subsections=chunk.get("subsections", [])
+            )
+            for chunk in result["retrieved_chunks"]
+        ],
+        usage=result["usage"],
+        fact=fact,
+        session_id=session_id
+    )
+
+
 @app.post("/query", response_model=QueryResponse)
-async def query(request: QueryRequest):
+async def query(request: QueryRequest, background_tasks: BackgroundTasks):
     """
     Answer a question about Idaho ALF regulations.
 
     Args:
-        request: QueryRequest with question and optional conversation history
+        request: QueryRequest with question and optional conversation history or session_id
 
     Returns:
         QueryResponse with answer, citations, and retrieved chunks
     """
     if rag_engine is None:
         raise HTTPException(status_code=503, detail="RAG engine not initialized")
+    await _require_session(request)
 
     try:
-        # Convert Pydantic models to dicts for conversation history
-        conversation_history = None
-        if request.conversation_history:
-            conversation_history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in request.conversation_history
-            ]
+        # Numeric lookups can be answered from the fact index alone
+        fact = _lookup_fact(request)
+        if fact and request.skip_llm:
+            return _fact_response(fact)
 
         # Get answer from RAG engine
-        result = rag_engine.answer_question(
-            question=request.question,
-            conversation_history=conversation_history,
-            top_k=request.top_k,
-            temperature=request.temperature,
-            verbose=False
-        )
+        result = await _answer_coalesced(request)
+
+        # Fold the turn into the session summary once the response is sent
+        if request.session_id:
+            background_tasks.add_task(_summarize_session, request.session_id)
 
         # Format response
-        return QueryResponse(
-            response=result["response"],
-            citations=[
-                Citation(**citation) for citation in result["citations"]
-            ],
-            retrieved_chunks=[
-                RetrievedChunk(
-                    citation=chunk["citation"],
-                    section_title=chunk["section_title"],
-                    chunk_id=chunk["chunk_id"],
-                    similarity=chunk["similarity"],
-                    content=chunk["content"][:500] + "..."  # Truncate for response size
-                )
-                for chunk in result["retrieved_chunks"]
-            ],
-            usage=result["usage"]
-        )
+        return _format_response(result, fact, request.session_id)
 
+    except UnknownSessionError:
+        # Dropped while the question was waiting
+        raise HTTPException(status_code=404, detail="Session not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Answer a question as newline-delimited JSON events.
+
+    With fast_path, a "fact" event is sent as soon as the fact index matches,
+    followed by the full "answer" event (unless skip_llm is set).
+    """
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="RAG engine not initialized")
+    await _require_session(request)
+
+    async def events():
+        try:
+            fact = _lookup_fact(request)
+            if fact:
+                yield json.dumps({"type": "fact", "fact": fact.model_dump()}) + "\n"
+                if request.skip_llm:
+                    return
+
+            result = await _answer_coalesced(request)
+            answer = _format_response(result, fact, request.session_id)
+            yield json.dumps({"type": "answer", **answer.model_dump()}) + "\n"
+
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": f"Error processing query: {str(e)}"}) + "\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(_summarize_session, request.session_id)
+    )
+
+
+@app.post("/sessions", response_model=dict)
+async def create_session():
+    """Start a server-side conversation session; pass its session_id with each /query."""
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="RAG engine not initialized")
+
+    session = rag_engine.sessions.create()
+    return {"session_id": session.session_id}
+
+
+@app.delete("/sessions/{session_id}", response_model=dict)
+async def delete_session(session_id: str):
+    """End a conversation session."""
+    if rag_engine is None:
+        raise HTTPException(status_code=503, detail="RAG engine not initialized")
+
+    if not await run_in_threadpool(rag_engine.sessions.delete, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"deleted": session_id}
+
+
+def _payload_response(http_request: Request, payload: PrecomputedPayload) -> Response:
+    """Serve a precomputed payload: 304 when the client's copy is current, gzip when accepted."""
+    headers = {"ETag": payload.etag, "Vary": "Accept-Encoding"}
+
+    if payload.matches(http_request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+
+    if accepts_gzip(http_request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload.gzipped, media_type="application/json", headers=headers)
+
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
 @app.get("/chunks", response_model=dict)
-async def list_chunks():
+async def list_chunks(http_request: Request):
     """List all available regulation chunks."""
     if rag_engine is None:
         raise HTTPException(status_code=503, detail="RAG engine not initialized")
 
-    chunks_summary = [
-        {
-            "chunk_id": chunk["chunk_id"],
-            "citation": chunk["citation"],
-            "section_title": chunk["section_title"],
-            "category": chunk["category"],
-            "content": chunk["content"],
-            "content_length": len(chunk["content"]),
-            "effective_date": chunk.get("effective_date", "2022-03-15"),
-            "source_pdf_page": chunk.get("source_pdf_page", 1)
-        }
-        for chunk in rag_engine.chunks
-    ]
-
-    return {
-        "total_chunks": len(chunks_summary),
-        "chunks": chunks_summary
-    }
+    engine = rag_engine
+    payload = payload_cache.get("chunks", engine.kb_version, lambda: chunks_payload(engine.chunks))
+    return _payload_response(http_request, payload)
 
 
 @app.get("/categories", response_model=dict)
-async def list_categories():
+async def list_categories(http_request: Request):
     """List all regulation categories."""
     if rag_engine is None:
         raise HTTPException(status_code=503, detail="RAG engine not initialized")
 
-    categories = {}
-    for chunk in rag_engine.chunks:
-        category = chunk["category"]
-        if category not in categories:
-            categories[category] = 0
-        categories[category] += 1
-
-    return {
-        "total_categories": len(categories),
-        "categories": categories
-    }
+    engine = rag_engine
+    payload = payload_cache.get("categories", engine.kb_version, lambda: categories_payload(engine.chunks))
+    return _payload_response(http_request, payload)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+"""
+Precomputed API payloads for Idaho ALF RegNavigator
+Serializes corpus-wide responses once per knowledge-base version, pre-gzipped, with ETags.
+"""
+
+import gzip
+import json
+import hashlib
+import threading
+from typing import List, Dict, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+from subsections import section_chunks
+
+
+def dumps(payload: Dict) -> bytes:
+    """Serialize a payload to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Whether an Accept-Encoding header value allows a gzip response.
+
+    gzip (or x-gzip) must be listed, or covered by "*", with a nonzero q-value;
+    "gzip;q=0" refuses it even when "*" is accepted.
+    """
+    if not accept_encoding:
+        return False
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+
+    for coding in ("gzip", "x-gzip"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return qualities.get("*", 0.0) > 0
+
+
+class PrecomputedPayload:
+    """A serialized response body, its gzip encoding and its ETag."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9)
+        # Weak: the same ETag validates both the plain and the gzip encoding
+        self.etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header value validates this payload."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags:
+            return True
+        opaque = self.etag[2:]
+        return any(tag.removeprefix("W/") == opaque for tag in tags)
+
+
+class PayloadCache:
+    """Precomputed payloads keyed by name, rebuilt when the knowledge-base version changes."""
+
+    def __init__(self):
+        self._payloads: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, kb_version: str, build: Callable[[], Dict]) -> PrecomputedPayload:
+        """
+        Return the payload for the current version, building it on first use.
+
+        Args:
+            name: Payload name (e.g. "chunks")
+            kb_version: Version of the knowledge base the payload is built from
+            build: Builds the payload dict
+        """
+        entry = self._payloads.get(name)
+        if entry is not None and entry[0] == kb_version:
+            return entry[1]
+
+        with self._lock:
+            entry = self._payloads.get(name)
+            if entry is None or entry[0] != kb_version:
+                entry = (kb_version, PrecomputedPayload(dumps(build())))
+                self._payloads[name] = entry
+            return entry[1]
+
+
+def chunks_payload(chunks: List[Dict]) -> Dict:
+    """Body of the /chunks endpoint (sections only, not their subsection chunks)."""
+    chunks_summary = [
+        {
+            "chunk_id": chunk["chunk_id"],
+            "citation": chunk["citation"],
+            "section_title": chunk["section_title"],
+            "category": chunk["category"],
+            "content": chunk["content"],
+            "content_length": len(chunk["content"]),
+            "effective_date": chunk.get("effective_date", "2022-03-15"),
+            "source_pdf_page": chunk.get("source_pdf_page", 1)
+        }
+        for chunk in section_chunks(chunks)
+    ]
+
+    return {
+        "total_chunks": len(chunks_summary),
+        "chunks": chunks_summary
+    }
+
+
+def categories_payload(chunks: List[Dict]) -> Dict:
+    """Body of the /categories endpoint."""
+    categories = {}
+    for chunk in section_chunks(chunks):
+        category = chunk["category"]
+        if category not in categories:
+            categories[category] = 0
+        categories[category] += 1
+
+    return {
+        "total_categories": len(categories),
+        "categories": categories
+    }
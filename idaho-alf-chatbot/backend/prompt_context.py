@@ -0,0 +1,111 @@
+"""
+Prompt context blocks for Idaho ALF RegNavigator
+Memoizes the rendered "citation - section_title" + truncated content block of each chunk.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict
+
+
+# Block styles used by the two engines
+STYLE_BASIC = "basic"        # RAGEngine._build_prompt
+STYLE_IMPROVED = "improved"  # ImprovedRAGEngine._build_improved_prompt
+
+
+def render_block(chunk: Dict, max_length: int, style: str) -> str:
+    """Render the context block for one chunk (without its [n] number)."""
+    if style == STYLE_BASIC:
+        return f"**{chunk['citation']} - {chunk['section_title']}**\n{chunk['content'][:max_length]}..."
+
+    content = chunk['content']
+    if len(content) > max_length:
+        content = content[:max_length] + "..."
+    return f"{chunk['citation']} - {chunk['section_title']}\n{content}"
+
+
+class PromptBlockCache:
+    """LRU cache of rendered context blocks keyed by (chunk_id, style, truncation length)."""
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Initialize prompt block cache.
+
+        Args:
+            max_entries: Maximum number of cached blocks; subsection views get one block
+                         per combination of matched subsections, so the key space is open
+        """
+        self.max_entries = max_entries
+
+        self._blocks: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def block(self, chunk: Dict, max_length: int, style: str) -> str:
+        """Return the rendered block for a chunk, rendering it on first use."""
+        key = (chunk['chunk_id'], style, max_length)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return block
+
+        block = render_block(chunk, max_length, style)
+        with self._lock:
+            self._blocks[key] = block
+            self._blocks.move_to_end(key)
+            self.misses += 1
+            while len(self._blocks) > self.max_entries:
+                self._blocks.popitem(last=False)
+                self.evictions += 1
+        return block
+
+    def clear(self):
+        """Drop all blocks (called when the index is swapped)."""
+        with self._lock:
+            self._blocks.clear()
+
+    def stats(self) -> Dict:
+        """Hit ratio and size for the /stats endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "blocks": len(self._blocks),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+def create_prompt_block_cache() -> PromptBlockCache:
+    """
+    Create the prompt block cache configured in the environment.
+
+    PROMPT_BLOCK_CACHE_SIZE: Maximum cached blocks (default 4096)
+    """
+    return PromptBlockCache(max_entries=int(os.getenv("PROMPT_BLOCK_CACHE_SIZE", 4096)))
+
+
+def build_context(
+    retrieved_chunks: List[Dict],
+    blocks: PromptBlockCache,
+    max_length: int,
+    style: str
+) -> str:
+    """Join the numbered context blocks for a prompt in a single copy."""
+    # The improved prompt also starts the first block on a new line
+    first_prefix = "" if style == STYLE_BASIC else "\n"
+
+    parts = []
+    for i, chunk in enumerate(retrieved_chunks, 1):
+        prefix = first_prefix if i == 1 else "\n\n"
+        parts.append(f"{prefix}[{i}] ")
+        parts.append(blocks.block(chunk, max_length, style))
+    return "".join(parts)
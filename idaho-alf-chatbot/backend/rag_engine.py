@@ -3,64 +3,25 @@ RAG Engine for Idaho ALF RegNavigator
 Combines vector search and Claude API for question answering.
 """
 
-import json
 from pathlib import Path
 from typing import List, Dict, Optional
-from embeddings import ChunkEmbeddingManager, create_embedding_generator
-from ai_service import ai_service
+from rag_engine_base import RAGEngineBase
+from prompt_context import build_context, STYLE_BASIC
+from subsections import HITS_PER_RESULT, roll_up, prompt_chunk
 
 
-class RAGEngine:
+class RAGEngine(RAGEngineBase):
     """Retrieval-Augmented Generation engine for regulatory Q&A."""
 
-    def __init__(
-        self,
-        chunks_with_embeddings_path: str,
-        embedding_provider: str = "openai",
-        claude_model: str = "claude-sonnet-4-20250514",
-        embedding_api_key: Optional[str] = None,
-        claude_api_key: Optional[str] = None
-    ):
-        """
-        Initialize RAG engine.
-
-        Args:
-            chunks_with_embeddings_path: Path to JSON file with chunks and embeddings
-            embedding_provider: "voyage" or "openai"
-            claude_model: Claude model to use
-            embedding_api_key: API key for embedding provider
-            claude_api_key: Anthropic API key
-        """
-        self.chunks_with_embeddings_path = Path(chunks_with_embeddings_path)
-
-        # Load chunks with embeddings
-        print(f"Loading chunks from {self.chunks_with_embeddings_path}...")
-        with open(self.chunks_with_embeddings_path, 'r', encoding='utf-8') as f:
-            self.chunks = json.load(f)
-        print(f"✓ Loaded {len(self.chunks)} chunks")
-
-        # Initialize embedding generator
-        self.embedding_generator = create_embedding_generator(
-            provider=embedding_provider,
-            api_key=embedding_api_key
-        )
-        print(f"✓ Embedding generator initialized ({embedding_provider})")
-
-        # Initialize embedding manager
-        self.embedding_manager = ChunkEmbeddingManager(
-            self.embedding_generator,
-            str(self.chunks_with_embeddings_path.parent)
-        )
-
-        # Use unified AI service instead of direct Claude client
-        self.ai_service = ai_service
-        print(f"✓ AI service initialized (unified with fallback)")
-
     def retrieve_relevant_chunks(
         self,
         query: str,
         top_k: int = 5,
-        similarity_threshold: float = 0.0
+        similarity_threshold: float = 0.0,
+        citation_expansion: int = 0,
+        rerank_budget_ms: Optional[float] = None,
+        query_embedding: Optional[List[float]] = None,
+        prior_rows: Optional[List[int]] = None
     ) -> List[Dict]:
         """
         Retrieve most relevant chunks for a query.
@@ -69,35 +30,78 @@ class RAGEngine:
             query: User question
             top_k: Number of chunks to retrieve
             similarity_threshold: Minimum similarity score (0.0-1.0)
+            citation_expansion: Maximum number of cited sections to append
+            rerank_budget_ms: Time budget for the rerank stage (reranker default if None)
+            query_embedding: Precomputed query embedding (generated if None)
+            prior_rows: Chunk rows retrieved for the previous turn of the conversation
 
         Returns:
             List of relevant chunks with similarity scores
         """
         # Generate query embedding
-        query_embedding = self.embedding_generator.generate_embedding(query)
+        if query_embedding is None:
+            query_embedding = self.embedding_generator.generate_embedding(query)
+
+        # Repeated searches are served from the retrieval cache (row indices, not chunk copies)
+        cache_key = self._retrieval_cache_key(
+            query_embedding,
+            prior_rows,
+            rerank_budget_ms,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold,
+            citation_expansion=citation_expansion
+        )
+        if cache_key is not None:
+            rows = self.retrieval_cache.get(cache_key)
+            if rows is not None:
+                return self._results_from_rows(rows)
+
+        # Re-score a wider shortlist with local signals before cutting to top k
+        shortlist_size = top_k
+        if self.reranker is not None:
+            shortlist_size = max(top_k, self.reranker.shortlist_size)
+
+        # Follow-up turns keep prior chunks still relevant to the new question
+        # and only search for the remaining shortlist slots
+        similarities = self._retained_results(
+            query_embedding, prior_rows, similarity_threshold, top_k // 2
+        )
+        retained_ids = {result["chunk"]["chunk_id"] for result in similarities}
+
+        # Subsection hits roll up to their sections, so more rows are ranked per result
+        limit = shortlist_size + len(retained_ids)
+        if self.has_subsections:
+            limit *= HITS_PER_RESULT
+
+        # Compute similarities (one matrix-vector product over the index)
+        rows, scores = self.embedding_matrix.ranked(query_embedding, similarity_threshold, limit=limit)
+        new_hits = list(roll_up(
+            (
+                {"chunk": self.chunks[row], "similarity": float(score)}
+                for row, score in zip(rows, scores)
+            ),
+            self.chunks_by_id,
+            exclude_ids=retained_ids
+        ))
+        similarities.extend(new_hits[:shortlist_size - len(similarities)])
 
-        # Compute similarities
-        similarities = []
-        for chunk in self.chunks:
-            if "embedding" not in chunk:
-                continue
+        # Sort by similarity
+        similarities.sort(key=lambda x: x["similarity"], reverse=True)
 
-            similarity = self.embedding_manager.compute_similarity(
-                query_embedding,
-                chunk["embedding"]
-            )
+        if self.reranker is not None:
+            similarities = self.reranker.rerank(query, similarities, rerank_budget_ms)
 
-            if similarity >= similarity_threshold:
-                similarities.append({
-                    "chunk": chunk,
-                    "similarity": similarity
-                })
+        top_results = similarities[:top_k]
 
-        # Sort by similarity
-        similarities.sort(key=lambda x: x["similarity"], reverse=True)
+        # Add sections the top hits cite (graph lookup, no extra embedding queries)
+        if citation_expansion > 0:
+            top_results.extend(
+                self._expand_with_citations(query_embedding, top_results, citation_expansion)
+            )
 
-        # Return top k
-        return similarities[:top_k]
+        self._cache_retrieval(cache_key, top_results)
+
+        return top_results
 
     def answer_question(
         self,
@@ -106,6 +110,8 @@ class RAGEngine:
         top_k: int = 12,  # Increased from 5 for better context
         similarity_threshold: float = 0.0,  # Lowered from 0.3 to get more chunks
         temperature: float = 0.5,  # Increased from 0.3 for more natural responses
+        citation_expansion: int = 0,
+        session_id: Optional[str] = None,
         verbose: bool = False
     ) -> Dict:
         """
@@ -117,6 +123,9 @@ class RAGEngine:
             top_k: Number of chunks to retrieve
             similarity_threshold: Minimum similarity for retrieval
             temperature: Temperature for Claude response
+            citation_expansion: Maximum number of cited sections to add to the context
+            session_id: Server-side conversation session (its summary and recent turns
+                replace conversation_history; follow-ups reuse the previous turn's chunks)
             verbose: Print debug information
 
         Returns:
@@ -131,10 +140,21 @@ class RAGEngine:
         if verbose:
             print("Retrieving relevant regulations...")
 
+        # Embed the question once for retrieval and the answer cache
+        query_embedding, embedding_calls = self._embed_question(question)
+
+        # Server-side session: rolling summary, recent turns and the previous turn's rows
+        session, conversation_history, conversation_summary, prior_rows = self._open_session(
+            session_id, conversation_history
+        )
+
         results = self.retrieve_relevant_chunks(
             question,
             top_k=top_k,
-            similarity_threshold=similarity_threshold
+            similarity_threshold=similarity_threshold,
+            citation_expansion=citation_expansion,
+            query_embedding=query_embedding,
+            prior_rows=prior_rows
         )
 
         retrieved_chunks = [r["chunk"] for r in results]
@@ -147,12 +167,25 @@ class RAGEngine:
                 print(f"  {i}. {chunk['citation']} - {chunk['section_title']}")
                 print(f"     Similarity: {similarity:.4f}\n")
 
+        # Near-duplicate questions that retrieve the same regulations reuse a cached answer
+        use_answer_cache = self._use_answer_cache(session_id, conversation_history, conversation_summary)
+        chunk_ids = [chunk["chunk_id"] for chunk in retrieved_chunks]
+        cache_params = (temperature,)
+
+        if use_answer_cache:
+            cached = self.answer_cache.lookup(query_embedding, chunk_ids, self.kb_version, cache_params)
+            if cached is not None:
+                if verbose:
+                    print(f"✓ Answer served from cache (question similarity {cached['similarity']:.4f})\n")
+                return self._cached_answer(cached, results, embedding_calls)
+
         # Step 2: Generate answer with Claude
         if verbose:
             print("Generating answer with Claude...\n")
 
-        # Build prompt for AI service
-        prompt = self._build_prompt(question, retrieved_chunks, conversation_history)
+        # Build prompt for AI service (sections matched through subsections carry only those)
+        prompt_chunks = [prompt_chunk(result, self.chunks_by_id) for result in results]
+        prompt = self._build_prompt(question, prompt_chunks, conversation_history, conversation_summary)
         
         # Use unified AI service with fallback
         ai_response = self.ai_service.analyze_content(prompt, {
@@ -186,6 +219,7 @@ class RAGEngine:
             ],
             'usage': {
                 'provider': ai_response['provider'],
+                'provider_calls': {'embedding': embedding_calls, 'llm': 1},
                 'chunks_retrieved': len(retrieved_chunks),
                 'citations_used': len(used_citations),
                 'citations_expected': len(expected_citations),
@@ -193,21 +227,26 @@ class RAGEngine:
             }
         }
 
+        if use_answer_cache:
+            self.answer_cache.store(query_embedding, chunk_ids, self.kb_version, response, cache_params)
+
         if verbose:
             print("✓ Answer generated\n")
 
         # Add similarity scores to response
-        response["retrieved_chunks"] = [
-            {
-                **chunk,
-                "similarity": result["similarity"]
-            }
-            for result, chunk in zip(results, retrieved_chunks)
-        ]
+        response["retrieved_chunks"] = self._scored_chunks(results)
+
+        self._record_session_turn(session, question, response, results, prior_rows)
 
         return response
 
-    def _build_prompt(self, question: str, retrieved_chunks: List[Dict], conversation_history: Optional[List[Dict]] = None) -> str:
+    def _build_prompt(
+        self,
+        question: str,
+        retrieved_chunks: List[Dict],
+        conversation_history: Optional[List[Dict]] = None,
+        conversation_summary: Optional[str] = None
+    ) -> str:
         """Build prompt for AI service."""
         # System prompt
         system_prompt = """You are a regulatory compliance expert for Idaho assisted living facilities.
@@ -234,15 +273,14 @@ IMPORTANT: Every citation number [1], [2], [3], etc. that appears in the context
 Context from regulations (numbered [1], [2], [3], etc.):"""
 
         # Add retrieved chunks with numbered citations (increased from 1000 to 2000 chars per chunk)
-        context = "\n\n".join([
-            f"[{i+1}] **{chunk['citation']} - {chunk['section_title']}**\n{chunk['content'][:2000]}..."
-            for i, chunk in enumerate(retrieved_chunks)
-        ])
+        context = build_context(retrieved_chunks, self.prompt_blocks, 2000, STYLE_BASIC)
 
         # Add conversation history if provided
         history_text = ""
+        if conversation_summary:
+            history_text = f"\n\nConversation summary:\n{conversation_summary}\n"
         if conversation_history:
-            history_text = "\n\nPrevious conversation:\n"
+            history_text += "\n\nPrevious conversation:\n"
             for msg in conversation_history[-3:]:  # Last 3 messages
                 history_text += f"{msg['role']}: {msg['content']}\n"
 
@@ -282,7 +320,7 @@ Context from regulations (numbered [1], [2], [3], etc.):"""
             similarity_threshold=similarity_threshold
         )
 
-        retrieved_chunks = [r["chunk"] for r in results]
+        retrieved_chunks = [prompt_chunk(r, self.chunks_by_id) for r in results]
 
         # Stream response from Claude
         for text_chunk in self.claude_client.generate_response_streaming(
@@ -0,0 +1,424 @@
+"""
+Shared base of the RAG engines for Idaho ALF RegNavigator
+Index loading, result caches, citation expansion, fact lookups and conversation
+sessions; the engines subclass it with their own retrieval and prompting.
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+from embeddings import ChunkEmbeddingManager, create_embedding_generator
+from citation_graph import load_or_build_citation_graph
+from index_fingerprint import index_fingerprint
+from fact_index import load_or_build_fact_index
+from reranker import Reranker
+from embedding_cache import CachedEmbeddingGenerator, create_query_embedding_cache
+from answer_cache import create_answer_cache
+from retrieval_cache import create_retrieval_cache
+from prompt_context import create_prompt_block_cache
+from vector_index import EmbeddingMatrix
+from subsections import is_subsection, subsection_citations
+from sessions import Session, UnknownSessionError, create_session_store
+from ai_service import ai_service
+
+
+# Prior-turn chunks below this similarity to a follow-up question are dropped
+RETAIN_MIN_SIMILARITY = 0.35
+
+
+class RAGEngineBase:
+    """Index, caches and sessions shared by RAGEngine and ImprovedRAGEngine."""
+
+    def __init__(
+        self,
+        chunks_with_embeddings_path: str,
+        embedding_provider: str = "openai",
+        claude_model: str = "claude-sonnet-4-20250514",
+        embedding_api_key: Optional[str] = None,
+        claude_api_key: Optional[str] = None,
+        reranker: Optional[Reranker] = None
+    ):
+        """
+        Initialize the engine and load its index.
+
+        Args:
+            chunks_with_embeddings_path: Path to JSON file with chunks and embeddings
+            embedding_provider: "voyage" or "openai"
+            claude_model: Claude model to use
+            embedding_api_key: API key for embedding provider
+            claude_api_key: Anthropic API key
+            reranker: Optional rerank stage applied after first-stage retrieval
+        """
+        # Result caches (invalidated whenever the index is swapped)
+        self.retrieval_cache = create_retrieval_cache()
+        self.answer_cache = create_answer_cache()
+        self.prompt_blocks = create_prompt_block_cache()
+        self.sessions = create_session_store()
+        if self.answer_cache is not None:
+            print(f"✓ Answer cache enabled (threshold {self.answer_cache.similarity_threshold})")
+
+        # Optional local rerank stage
+        self.reranker = reranker
+        if self.reranker is not None:
+            print(f"✓ Reranker enabled ({type(self.reranker).__name__}, {self.reranker.time_budget_ms:.0f} ms budget)")
+
+        # Load chunks with embeddings
+        self.load_index(chunks_with_embeddings_path)
+
+        # Initialize embedding generator
+        self.embedding_generator = create_embedding_generator(
+            provider=embedding_provider,
+            api_key=embedding_api_key
+        )
+        print(f"✓ Embedding generator initialized ({embedding_provider})")
+
+        # Cache query embeddings (in-memory LRU + on-disk tier shared by workers)
+        self.query_embedding_cache = create_query_embedding_cache(self.chunks_with_embeddings_path.parent)
+        if self.query_embedding_cache is not None:
+            self.embedding_generator = CachedEmbeddingGenerator(
+                self.embedding_generator,
+                self.query_embedding_cache
+            )
+            print(f"✓ Query embedding cache enabled ({self.query_embedding_cache.max_entries} entries)")
+
+        # Initialize embedding manager
+        self.embedding_manager = ChunkEmbeddingManager(
+            self.embedding_generator,
+            str(self.chunks_with_embeddings_path.parent)
+        )
+
+        # Use unified AI service instead of direct Claude client
+        self.ai_service = ai_service
+        print(f"✓ AI service initialized (unified with fallback)")
+
+
+    def load_index(self, chunks_with_embeddings_path: str):
+        """
+        Load (or swap in) the chunk index and the artifacts stored with it.
+
+        Args:
+            chunks_with_embeddings_path: Path to JSON file with chunks and embeddings
+        """
+        index_path = Path(chunks_with_embeddings_path)
+
+        print(f"Loading chunks from {index_path}...")
+        with open(index_path, 'rb') as f:
+            raw_index = f.read()
+        chunks = json.loads(raw_index)
+
+        # Knowledge-base version: content hash of the index file
+        kb_version = hashlib.sha256(raw_index).hexdigest()[:16]
+        print(f"✓ Loaded {len(chunks)} chunks (version {kb_version})")
+
+        # Artifacts stored with the index are rebuilt if they come from another chunk set
+        fingerprint = index_fingerprint(chunks)
+
+        # Citation graph stored with the index
+        citation_graph = load_or_build_citation_graph(chunks, index_path, fingerprint)
+        print(f"✓ Citation graph loaded ({len(citation_graph.edges)} citing chunks)")
+
+        # Numeric fact index for the direct-answer fast path
+        fact_index = load_or_build_fact_index(chunks, index_path, fingerprint)
+        print(f"✓ Fact index loaded ({len(fact_index.facts)} facts)")
+
+        # Unit-normalized embedding matrix for vectorized scoring
+        embedding_matrix = EmbeddingMatrix(chunks)
+
+        # Swap everything in together
+        self.chunks_with_embeddings_path = index_path
+        self.chunks = chunks
+        self.chunks_by_id = {chunk["chunk_id"]: chunk for chunk in chunks}
+        self.row_by_id = {chunk["chunk_id"]: row for row, chunk in enumerate(chunks)}
+        self.has_subsections = any(is_subsection(chunk) for chunk in chunks)
+        self.embedding_matrix = embedding_matrix
+        self.kb_version = kb_version
+        self.citation_graph = citation_graph
+        self.fact_index = fact_index
+
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.invalidate()
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+        self.prompt_blocks.clear()
+        if self.reranker is not None:
+            self.reranker.clear()
+
+
+    def _retrieval_cache_key(
+        self,
+        query_embedding: List[float],
+        prior_rows: Optional[List[int]],
+        rerank_budget_ms: Optional[float],
+        **params
+    ) -> Optional[str]:
+        """
+        Retrieval cache key for a search (None without a retrieval cache).
+
+        Args:
+            query_embedding: Query embedding
+            prior_rows: Chunk rows retrieved for the previous turn of the conversation
+            rerank_budget_ms: Rerank time budget of the request (reranker default if None)
+            **params: Search parameters of the engine (top_k, thresholds, ...)
+        """
+        if self.retrieval_cache is None:
+            return None
+
+        # A different budget can rerank a different part of the shortlist
+        if self.reranker is None:
+            rerank_budget_ms = None
+        elif rerank_budget_ms is None:
+            rerank_budget_ms = self.reranker.time_budget_ms
+        return self.retrieval_cache.make_key(
+            query_embedding,
+            self.kb_version,
+            reranked=self.reranker is not None,
+            rerank_budget_ms=rerank_budget_ms,
+            prior_rows=tuple(prior_rows or ()),
+            **params
+        )
+
+    def _cache_retrieval(self, cache_key: Optional[str], results: List[Dict]):
+        """Store search results as rows, unless the rerank stage ran out of time (keep trying to rerank next time)."""
+        rerank_timed_out = (
+            self.reranker is not None and results and "rerank_score" not in results[0]
+        )
+        if cache_key is not None and not rerank_timed_out:
+            self.retrieval_cache.put(cache_key, self._rows_from_results(results))
+
+    def _retained_results(
+        self,
+        query_embedding: List[float],
+        prior_rows: Optional[List[int]],
+        similarity_threshold: float,
+        max_retained: int
+    ) -> List[Dict]:
+        """Re-score a previous turn's rows against the new query (one small matrix product)."""
+        prior_rows = [row for row in prior_rows or [] if self.embedding_matrix.position[row] >= 0]
+        if not prior_rows:
+            return []
+
+        threshold = max(similarity_threshold, RETAIN_MIN_SIMILARITY)
+        retained = [
+            {"chunk": self.chunks[row], "similarity": float(score), "retained": True}
+            for row, score in zip(prior_rows, self.embedding_matrix.scores(query_embedding, prior_rows))
+            if score >= threshold
+        ]
+        retained.sort(key=lambda x: x["similarity"], reverse=True)
+        return retained[:max_retained]
+
+    def _rows_from_results(self, results: List[Dict]) -> List[tuple]:
+        """Convert results to (row, similarity, extra fields) tuples for the retrieval cache."""
+        rows = []
+        for result in results:
+            extras = {
+                key: value for key, value in result.items()
+                if key not in ("chunk", "similarity")
+            }
+            rows.append((
+                self.row_by_id[result["chunk"]["chunk_id"]],
+                float(result["similarity"]),
+                extras or None
+            ))
+        return rows
+
+    def _results_from_rows(self, rows: List[tuple]) -> List[Dict]:
+        """Rebuild results from cached rows."""
+        return [
+            {
+                "chunk": self.chunks[row],
+                "similarity": similarity,
+                **(extras or {})
+            }
+            for row, similarity, extras in rows
+        ]
+
+    def _expand_with_citations(
+        self,
+        query_embedding: List[float],
+        results: List[Dict],
+        max_expansion: int
+    ) -> List[Dict]:
+        """Look up sections cited by retrieved chunks in the citation graph (scored in one matrix product)."""
+        expansion = self.citation_graph.expand(
+            [result["chunk"]["chunk_id"] for result in results],
+            max_expansion=max_expansion
+        )
+
+        refs = [(self.row_by_id.get(ref["chunk_id"], -1), ref) for ref in expansion]
+        refs = [(row, ref) for row, ref in refs if row >= 0 and self.embedding_matrix.position[row] >= 0]
+        if not refs:
+            return []
+
+        rows = [row for row, _ in refs]
+        return [
+            {"chunk": self.chunks[row], "similarity": float(score), "cited_by": ref["cited_by"]}
+            for (row, ref), score in zip(refs, self.embedding_matrix.scores(query_embedding, rows))
+        ]
+
+    def get_stats(self) -> Dict:
+        """Runtime statistics for the engine's optional stages."""
+        return {
+            "chunks_loaded": len(self.chunks),
+            "reranker": self.reranker.metrics.to_dict() if self.reranker else None,
+            "kb_version": self.kb_version,
+            "query_embedding_cache": (
+                self.query_embedding_cache.stats() if self.query_embedding_cache else None
+            ),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "retrieval_cache": self.retrieval_cache.stats() if self.retrieval_cache else None,
+            "prompt_blocks": self.prompt_blocks.stats(),
+            "sessions": self.sessions.stats()
+        }
+
+    def lookup_fact(self, question: str) -> Optional[Dict]:
+        """
+        Look up a numeric requirement that directly answers the question.
+
+        Args:
+            question: User question
+
+        Returns:
+            Matching fact with answer text and citation, or None
+        """
+        return self.fact_index.lookup(question)
+
+
+    def _embed_question(self, question: str) -> Tuple[List[float], int]:
+        """Query embedding and the provider calls it took (0 when the query embedding cache had it)."""
+        embed = getattr(self.embedding_generator, "embed", None)
+        if embed is not None:
+            embedding, cached = embed(question)
+            return embedding, 0 if cached else 1
+        return self.embedding_generator.generate_embedding(question), 1
+
+    def _open_session(
+        self,
+        session_id: Optional[str],
+        conversation_history: Optional[List[Dict]]
+    ) -> Tuple[Optional[Session], Optional[List[Dict]], Optional[str], Optional[List[int]]]:
+        """
+        Resolve the conversation context of a question.
+
+        A server-side session replaces conversation_history with its rolling summary
+        plus the turns not yet folded into it.
+
+        Returns:
+            (session, conversation_history, conversation_summary, prior_rows), where
+            prior_rows are the rows retrieved for the session's previous turn
+
+        Raises:
+            UnknownSessionError: session_id was not created by the session store
+        """
+        if not session_id:
+            return None, conversation_history, None, None
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise UnknownSessionError(session_id)
+
+        conversation_summary = session.summary or None
+        conversation_history = list(session.pending) or None
+        prior_rows = self.sessions.prior_rows(session, self.kb_version)
+        return session, conversation_history, conversation_summary, prior_rows
+
+    def _use_answer_cache(
+        self,
+        session_id: Optional[str],
+        conversation_history: Optional[List[Dict]],
+        conversation_summary: Optional[str]
+    ) -> bool:
+        """
+        Whether a question may be answered from (and stored in) the answer cache.
+
+        Near-duplicate questions that retrieve the same regulations reuse a cached
+        answer; conversation-dependent questions (any session turn) are never cached.
+        """
+        return (
+            self.answer_cache is not None
+            and not session_id
+            and not conversation_history
+            and not conversation_summary
+        )
+
+    def _scored_chunks(self, results: List[Dict]) -> List[Dict]:
+        """Retrieved chunks with their similarity scores and matched subsections, for responses."""
+        return [
+            {
+                **result["chunk"],
+                "similarity": result["similarity"],
+                "subsections": subsection_citations(result, self.chunks_by_id)
+            }
+            for result in results
+        ]
+
+    def _record_session_turn(
+        self,
+        session: Optional[Session],
+        question: str,
+        response: Dict,
+        results: List[Dict],
+        prior_rows: Optional[List[int]]
+    ):
+        """Add a completed turn to its session (no-op without a session)."""
+        if session is None:
+            return
+        self.sessions.record_turn(
+            session,
+            question,
+            response["response"],
+            [self.row_by_id[result["chunk"]["chunk_id"]] for result in results],
+            self.kb_version,
+            rows_reused=sum(1 for result in results if result.get("retained")) if prior_rows else None
+        )
+
+    def summarize_session(self, session_id: str) -> bool:
+        """
+        Fold a session's recent turns into its rolling summary (run after answering).
+
+        Returns:
+            True if a new summary was stored
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return False
+
+        claim = self.sessions.start_summary(session)
+        if claim is None:
+            return False
+        prompt, covered = claim
+
+        summary = None
+        try:
+            ai_response = self.ai_service.analyze_content(prompt, {
+                'maxTokens': 400,
+                'temperature': 0.0
+            })
+            summary = ai_response['content'].strip()
+        except Exception as e:
+            print(f"⚠️  Session summary failed: {e}")
+
+        self.sessions.finish_summary(session, summary, covered)
+        return summary is not None
+
+    def _cached_answer(self, cached: Dict, results: List[Dict], embedding_calls: int) -> Dict:
+        """Rebuild a response from a cached answer, keeping its citation numbering."""
+        response = cached["response"]
+        response["usage"]["answer_cache"] = {
+            "hit": True,
+            "question_similarity": cached["similarity"]
+        }
+        response["usage"]["provider_calls"] = {"embedding": embedding_calls, "llm": 0}
+
+        # Same chunk set as the cached answer, in the order its [n] citations refer to
+        result_by_id = {result["chunk"]["chunk_id"]: result for result in results}
+        response["retrieved_chunks"] = [
+            {
+                **self.chunks_by_id[chunk_id],
+                "similarity": result_by_id[chunk_id]["similarity"],
+                "subsections": subsection_citations(result_by_id[chunk_id], self.chunks_by_id)
+            }
+            for chunk_id in cached["chunk_ids"]
+        ]
+
+        return response
+
@@ -3,66 +3,28 @@ Improved RAG Engine for Idaho ALF RegNavigator
 Enhanced with better retrieval, reranking, and prompt optimization.
 """
 
-import json
+import heapq
 from pathlib import Path
 from typing import List, Dict, Optional
-from embeddings import ChunkEmbeddingManager, create_embedding_generator
-from ai_service import ai_service
+from rag_engine_base import RAGEngineBase
+from prompt_context import build_context, STYLE_IMPROVED
+from subsections import roll_up, prompt_chunk
 import numpy as np
 
 
-class ImprovedRAGEngine:
+class ImprovedRAGEngine(RAGEngineBase):
     """Enhanced RAG engine with better retrieval and reranking."""
 
-    def __init__(
-        self,
-        chunks_with_embeddings_path: str,
-        embedding_provider: str = "openai",
-        claude_model: str = "claude-sonnet-4-20250514",
-        embedding_api_key: Optional[str] = None,
-        claude_api_key: Optional[str] = None
-    ):
-        """
-        Initialize improved RAG engine.
-
-        Args:
-            chunks_with_embeddings_path: Path to JSON file with chunks and embeddings
-            embedding_provider: "voyage" or "openai"
-            claude_model: Claude model to use
-            embedding_api_key: API key for embedding provider
-            claude_api_key: Anthropic API key
-        """
-        self.chunks_with_embeddings_path = Path(chunks_with_embeddings_path)
-
-        # Load chunks with embeddings
-        print(f"Loading chunks from {self.chunks_with_embeddings_path}...")
-        with open(self.chunks_with_embeddings_path, 'r', encoding='utf-8') as f:
-            self.chunks = json.load(f)
-        print(f"✓ Loaded {len(self.chunks)} chunks")
-
-        # Initialize embedding generator
-        self.embedding_generator = create_embedding_generator(
-            provider=embedding_provider,
-            api_key=embedding_api_key
-        )
-        print(f"✓ Embedding generator initialized ({embedding_provider})")
-
-        # Initialize embedding manager
-        self.embedding_manager = ChunkEmbeddingManager(
-            self.embedding_generator,
-            str(self.chunks_with_embeddings_path.parent)
-        )
-
-        # Use unified AI service
-        self.ai_service = ai_service
-        print(f"✓ AI service initialized (unified with fallback)")
-
     def retrieve_relevant_chunks(
         self,
         query: str,
         top_k: int = 15,  # Increased from 5
         similarity_threshold: float = 0.0,  # Lowered from 0.3
-        diversity_threshold: float = 0.05  # NEW: minimum difference between chunks
+        diversity_threshold: float = 0.05,  # NEW: minimum difference between chunks
+        citation_expansion: int = 0,
+        rerank_budget_ms: Optional[float] = None,
+        query_embedding: Optional[List[float]] = None,
+        prior_rows: Optional[List[int]] = None
     ) -> List[Dict]:
         """
         Retrieve most relevant chunks with diversity.
@@ -72,32 +34,56 @@ class ImprovedRAGEngine:
             top_k: Number of chunks to retrieve
             similarity_threshold: Minimum similarity score (0.0-1.0)
             diversity_threshold: Minimum difference between chunks to ensure diversity
+            citation_expansion: Maximum number of cited sections to append
+            rerank_budget_ms: Time budget for the rerank stage (reranker default if None)
+            query_embedding: Precomputed query embedding (generated if None)
+            prior_rows: Chunk rows retrieved for the previous turn of the conversation
 
         Returns:
             List of relevant chunks with similarity scores
         """
         # Generate query embedding
-        query_embedding = self.embedding_generator.generate_embedding(query)
-
-        # Compute similarities for ALL chunks
-        similarities = []
-        for chunk in self.chunks:
-            if "embedding" not in chunk:
-                continue
-
-            similarity = self.embedding_manager.compute_similarity(
-                query_embedding,
-                chunk["embedding"]
-            )
-
-            if similarity >= similarity_threshold:
-                similarities.append({
-                    "chunk": chunk,
-                    "similarity": similarity
-                })
-
-        # Sort by similarity
-        similarities.sort(key=lambda x: x["similarity"], reverse=True)
+        if query_embedding is None:
+            query_embedding = self.embedding_generator.generate_embedding(query)
+
+        # Repeated searches are served from the retrieval cache (row indices, not chunk copies)
+        cache_key = self._retrieval_cache_key(
+            query_embedding,
+            prior_rows,
+            rerank_budget_ms,
+            top_k=top_k,
+            similarity_threshold=similarity_threshold,
+            diversity_threshold=diversity_threshold,
+            citation_expansion=citation_expansion
+        )
+        if cache_key is not None:
+            rows = self.retrieval_cache.get(cache_key)
+            if rows is not None:
+                return self._results_from_rows(rows)
+
+        # Collect a wider shortlist when a rerank stage follows
+        target_count = top_k
+        if self.reranker is not None:
+            target_count = max(top_k, self.reranker.shortlist_size)
+
+        # Follow-up turns keep prior chunks still relevant to the new question
+        retained = self._retained_results(
+            query_embedding, prior_rows, similarity_threshold, top_k // 2
+        )
+        retained_ids = {result["chunk"]["chunk_id"] for result in retained}
+
+        # Compute similarities for ALL chunks (one matrix-vector product), best first
+        # Subsection hits roll up to their sections as the ranking is consumed
+        rows, scores = self.embedding_matrix.ranked(query_embedding, similarity_threshold)
+        new_hits = roll_up(
+            (
+                {"chunk": self.chunks[row], "similarity": float(score)}
+                for row, score in zip(rows, scores)
+            ),
+            self.chunks_by_id,
+            exclude_ids=retained_ids
+        )
+        similarities = heapq.merge(retained, new_hits, key=lambda x: -x["similarity"])
 
         # Apply diversity filtering to avoid duplicate chunks
         diverse_results = []
@@ -109,9 +95,9 @@ class ImprovedRAGEngine:
                 is_diverse = True
                 for selected in diverse_results:
                     # Compute similarity between chunks
-                    chunk_sim = self.embedding_manager.compute_similarity(
-                        result["chunk"]["embedding"],
-                        selected["chunk"]["embedding"]
+                    chunk_sim = self.embedding_matrix.similarity(
+                        self.row_by_id[result["chunk"]["chunk_id"]],
+                        self.row_by_id[selected["chunk"]["chunk_id"]]
                     )
                     # If chunks are too similar, skip this one
                     if chunk_sim > (1 - diversity_threshold):
@@ -122,9 +108,21 @@ class ImprovedRAGEngine:
                     diverse_results.append(result)
             
             # Stop when we have enough diverse chunks
-            if len(diverse_results) >= top_k:
+            if len(diverse_results) >= target_count:
                 break
 
+        # Re-score the shortlist with local signals before cutting to top k
+        if self.reranker is not None:
+            diverse_results = self.reranker.rerank(query, diverse_results, rerank_budget_ms)[:top_k]
+
+        # Add sections the top hits cite (graph lookup, no extra embedding queries)
+        if citation_expansion > 0:
+            diverse_results.extend(
+                self._expand_with_citations(query_embedding, diverse_results, citation_expansion)
+            )
+
+        self._cache_retrieval(cache_key, diverse_results)
+
         return diverse_results
 
     def answer_question(
@@ -135,6 +133,8 @@ class ImprovedRAGEngine:
         similarity_threshold: float = 0.0,  # Lowered from 0.3
         temperature: float = 0.5,  # Increased from 0.3
         max_content_length: int = 2000,  # Increased from 1000
+        citation_expansion: int = 0,
+        session_id: Optional[str] = None,
         verbose: bool = False
     ) -> Dict:
         """
@@ -147,6 +147,9 @@ class ImprovedRAGEngine:
             similarity_threshold: Minimum similarity for retrieval
             temperature: Temperature for Claude response
             max_content_length: Maximum characters per chunk in prompt
+            citation_expansion: Maximum number of cited sections to add to the context
+            session_id: Server-side conversation session (its summary and recent turns
+                replace conversation_history; follow-ups reuse the previous turn's chunks)
             verbose: Print debug information
 
         Returns:
@@ -161,10 +164,21 @@ class ImprovedRAGEngine:
         if verbose:
             print("Retrieving relevant regulations...")
 
+        # Embed the question once for retrieval and the answer cache
+        query_embedding, embedding_calls = self._embed_question(question)
+
+        # Server-side session: rolling summary, recent turns and the previous turn's rows
+        session, conversation_history, conversation_summary, prior_rows = self._open_session(
+            session_id, conversation_history
+        )
+
         results = self.retrieve_relevant_chunks(
             question,
             top_k=top_k,
-            similarity_threshold=similarity_threshold
+            similarity_threshold=similarity_threshold,
+            citation_expansion=citation_expansion,
+            query_embedding=query_embedding,
+            prior_rows=prior_rows
         )
 
         retrieved_chunks = [r["chunk"] for r in results]
@@ -188,16 +202,29 @@ class ImprovedRAGEngine:
                 print(f"  {i}. {status} (Similarity: {similarity:.4f})")
                 print(f"     {chunk['citation']} - {chunk['section_title']}\n")
 
+        # Near-duplicate questions that retrieve the same regulations reuse a cached answer
+        use_answer_cache = self._use_answer_cache(session_id, conversation_history, conversation_summary)
+        chunk_ids = [chunk["chunk_id"] for chunk in retrieved_chunks]
+        cache_params = (temperature, max_content_length)
+
+        if use_answer_cache:
+            cached = self.answer_cache.lookup(query_embedding, chunk_ids, self.kb_version, cache_params)
+            if cached is not None:
+                if verbose:
+                    print(f"✓ Answer served from cache (question similarity {cached['similarity']:.4f})\n")
+                return self._cached_answer(cached, results, embedding_calls)
+
         # Step 2: Generate answer with Claude
         if verbose:
             print("Generating answer with Claude...\n")
 
-        # Build improved prompt
+        # Build improved prompt (sections matched through subsections carry only those)
         prompt = self._build_improved_prompt(
             question, 
-            retrieved_chunks, 
+            [prompt_chunk(result, self.chunks_by_id) for result in results], 
             conversation_history,
-            max_content_length
+            max_content_length,
+            conversation_summary
         )
         
         # Use unified AI service with fallback
@@ -219,22 +246,22 @@ class ImprovedRAGEngine:
             ],
             'usage': {
                 'provider': ai_response['provider'],
+                'provider_calls': {'embedding': embedding_calls, 'llm': 1},
                 'chunks_retrieved': len(retrieved_chunks),
                 'avg_similarity': np.mean([r["similarity"] for r in results])
             }
         }
 
+        if use_answer_cache:
+            self.answer_cache.store(query_embedding, chunk_ids, self.kb_version, response, cache_params)
+
         if verbose:
             print("✓ Answer generated\n")
 
         # Add similarity scores to response
-        response["retrieved_chunks"] = [
-            {
-                **chunk,
-                "similarity": result["similarity"]
-            }
-            for result, chunk in zip(results, retrieved_chunks)
-        ]
+        response["retrieved_chunks"] = self._scored_chunks(results)
+
+        self._record_session_turn(session, question, response, results, prior_rows)
 
         return response
 
@@ -243,7 +270,8 @@ class ImprovedRAGEngine:
         question: str, 
         retrieved_chunks: List[Dict], 
         conversation_history: Optional[List[Dict]] = None,
-        max_content_length: int = 2000
+        max_content_length: int = 2000,
+        conversation_summary: Optional[str] = None
     ) -> str:
         """Build improved prompt with better context and instructions."""
         
@@ -264,25 +292,15 @@ Response format:
 
 Context from regulations:"""
 
-        # Build context with better formatting and more content
-        context_parts = []
-        for i, chunk in enumerate(retrieved_chunks, 1):
-            # Include more content per chunk
-            content = chunk['content']
-            if len(content) > max_content_length:
-                content = content[:max_content_length] + "..."
-            
-            context_parts.append(
-                f"\n[{i}] {chunk['citation']} - {chunk['section_title']}\n"
-                f"{content}"
-            )
-        
-        context = "\n".join(context_parts)
+        # Build context with better formatting and more content (blocks are memoized per chunk)
+        context = build_context(retrieved_chunks, self.prompt_blocks, max_content_length, STYLE_IMPROVED)
 
         # Add conversation history if provided
         history_text = ""
+        if conversation_summary:
+            history_text = f"\n\nConversation summary:\n{conversation_summary}\n"
         if conversation_history:
-            history_text = "\n\nPrevious conversation:\n"
+            history_text += "\n\nPrevious conversation:\n"
             for msg in conversation_history[-5:]:  # Last 5 messages (increased from 3)
                 role = "User" if msg['role'] == 'user' else "Assistant"
                 history_text += f"{role}: {msg['content']}\n"
@@ -6,6 +6,12 @@ import json
 from pathlib import Path
 from txt_processor import IDAPATextProcessor
 from embeddings import ChunkEmbeddingManager, create_embedding_generator
+from embedding_cache import create_chunk_embedding_cache
+from embedding_checkpoint import EmbeddingCheckpoint, checkpoint_path
+from dedup import ChunkDeduplicator, group_identical_files
+from ingest_manifest import MANIFEST_FILE, IngestManifest
+from citation_graph import CITATION_GRAPH_FILE, build_citation_graph
+from fact_index import FACT_INDEX_FILE, build_fact_index
 import os
 
 
@@ -24,9 +30,9 @@ def main():
     # Initialize processor
     processor = IDAPATextProcessor(str(raw_dir), str(processed_dir))
     
-    # Process all text files
+    # Process all text files (large files split at section boundaries) across all cores
     print("Processing all regulation files...\n")
-    all_chunks_by_file = processor.process_all_files()
+    all_chunks_by_file = processor.process_all_files(workers=os.cpu_count() or 1)
     
     # Combine all chunks
     all_chunks = []
@@ -60,37 +66,71 @@ def main():
         api_key=os.getenv("OPENAI_API_KEY")
     )
     
+    # Only chunks whose content changed are sent to the provider
+    chunk_embedding_cache = create_chunk_embedding_cache(processed_dir)
+    
     embedding_manager = ChunkEmbeddingManager(
         embedding_generator,
-        str(processed_dir)
+        str(processed_dir),
+        embedding_cache=chunk_embedding_cache
     )
     
-    # Generate embeddings
-    chunks_with_embeddings = []
-    for i, chunk in enumerate(all_chunks):
-        print(f"Generating embedding {i+1}/{len(all_chunks)}: {chunk.citation}")
-        chunk_dict = chunk.to_dict()
-        
-        # Generate embedding
-        embedding = embedding_generator.generate_embedding(chunk.content)
-        chunk_dict["embedding"] = embedding
-        
-        chunks_with_embeddings.append(chunk_dict)
+    # Completed batches are checkpointed; rerunning after a failure resumes from there
+    output_file = processed_dir / "chunks_with_embeddings.json"
+    checkpoint = EmbeddingCheckpoint(checkpoint_path(output_file), embedding_generator.model)
+    
+    # Identical chunks (e.g. from byte-identical files) are stored once, with citation aliases
+    deduplicator = ChunkDeduplicator()
+    deduplicator.duplicate_files = sum(
+        len(duplicates)
+        for duplicates in group_identical_files(raw_dir, list(all_chunks_by_file)).values()
+    )
+    unique_chunks = deduplicator.apply([chunk.to_dict() for chunk in all_chunks])
+    dedup_stats = deduplicator.stats()
+    print(f"Duplicates collapsed: {dedup_stats['duplicate_chunks']} chunks "
+          f"({dedup_stats['duplicate_files']} identical files)\n")
+    
+    # Generate embeddings in token-packed batches (up to the provider limits)
+    chunks_with_embeddings = embedding_manager.embed_chunk_list(
+        unique_chunks,
+        checkpoint=checkpoint,
+        keep_embeddings=False
+    )
     
     print(f"\n✓ Generated embeddings for {len(chunks_with_embeddings)} chunks\n")
+    cache_stats = chunk_embedding_cache.stats()
+    print(f"  Reused {cache_stats['hits']} cached embeddings, generated {cache_stats['misses']}")
     
-    # Save chunks with embeddings
-    output_file = processed_dir / "chunks_with_embeddings.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(chunks_with_embeddings, f, indent=2, ensure_ascii=False)
+    # Save chunks with embeddings, streamed from the checkpoint
+    checkpoint.write_index(chunks_with_embeddings, output_file)
+    checkpoint.remove()
     
     print(f"✓ Saved chunks with embeddings to {output_file}\n")
     
+    # Record what the index was built from, so add_new_documents.py only handles the delta
+    manifest = IngestManifest(processed_dir / MANIFEST_FILE)
+    manifest.reset(
+        raw_dir,
+        list(all_chunks_by_file),
+        {filename: [chunk.chunk_id for chunk in chunks] for filename, chunks in all_chunks_by_file.items()}
+    )
+    manifest.save()
+    
+    # Build citation graph from cross-references
+    build_citation_graph(chunks_with_embeddings, str(processed_dir / CITATION_GRAPH_FILE))
+    
+    # Extract numeric facts for the direct-answer fast path
+    build_fact_index(chunks_with_embeddings, str(processed_dir / FACT_INDEX_FILE))
+    print()
+    
     # Print summary statistics
     print("="*80)
     print("SUMMARY STATISTICS")
     print("="*80)
     print(f"Total chunks: {len(chunks_with_embeddings)}")
+    print(f"Duplicate chunks collapsed: {dedup_stats['duplicate_chunks']} "
+          f"({dedup_stats['chunks_with_aliases']} chunks carry citation aliases)")
+    print(f"Identical raw files: {dedup_stats['duplicate_files']}")
     
     # Citations breakdown
     citations = {}
@@ -130,6 +170,9 @@ def main():
     print(f"\nOutput file: {output_file}")
     print(f"File size: {output_file.stat().st_size / 1024 / 1024:.2f} MB")
     print(f"Total chunks: {len(chunks_with_embeddings)}")
+    print(f"Duplicate chunks collapsed: {dedup_stats['duplicate_chunks']} "
+          f"({dedup_stats['chunks_with_aliases']} chunks carry citation aliases)")
+    print(f"Identical raw files: {dedup_stats['duplicate_files']}")
 
 
 if __name__ == "__main__":
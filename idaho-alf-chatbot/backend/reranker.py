@@ -0,0 +1,454 @@
+"""
+Reranking stage for Idaho ALF RegNavigator
+Re-scores a first-stage retrieval shortlist with cheap local signals under a time budget.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "at", "by", "is", "are", "be",
+    "what", "which", "how", "do", "does", "i", "we", "my", "our", "must", "should", "can",
+    "there", "that", "this", "with", "about", "tell", "me", "any", "need", "have"
+}
+
+# Only the head of each chunk is scanned for term proximity
+PROXIMITY_SCAN_CHARS = 4000
+
+# Loop steps between deadline checks inside feature extraction
+DEADLINE_CHECK_INTERVAL = 256
+
+# Default weights for the linear blend when no model file is configured
+DEFAULT_WEIGHTS = {
+    "similarity": 1.0,
+    "proximity": 0.15,
+    "title_match": 0.2,
+    "citation_prior": 1.0
+}
+
+# Small boosts for the core ALF rules over documents they incorporate by reference
+DEFAULT_CITATION_PRIORS = {
+    "IDAPA 16.03.22": 0.03,
+    "TITLE 39": 0.02
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class RerankTimeout(Exception):
+    """Raised when the rerank time budget runs out, also from inside score()."""
+
+
+def check_deadline(deadline: Optional[float]):
+    """Raise RerankTimeout once time.perf_counter() has passed deadline (None: no deadline)."""
+    if deadline is not None and time.perf_counter() > deadline:
+        raise RerankTimeout()
+
+
+class RerankMetrics:
+    """
+    Latency and rank-change counters for the rerank stage.
+
+    Live traffic has no relevance labels, so these only show how much the stage reorders;
+    whether it helps is measured offline with evaluate_reranker.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.timeouts = 0
+        self.top1_changed = 0
+        self.total_rank_shift = 0.0
+        self.latencies_ms = deque(maxlen=window)
+        # Engines rerank from several request threads at once
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, first_stage_ids: List[str], reranked_ids: List[str], timed_out: bool):
+        """Record one rerank call."""
+        rank_shift = 0.0
+        if reranked_ids:
+            positions = {chunk_id: i for i, chunk_id in enumerate(first_stage_ids)}
+            rank_shift = sum(
+                abs(positions[chunk_id] - i) for i, chunk_id in enumerate(reranked_ids)
+            ) / len(reranked_ids)
+
+        with self._lock:
+            self.calls += 1
+            self.latencies_ms.append(latency_ms)
+
+            if timed_out:
+                self.timeouts += 1
+                return
+
+            if first_stage_ids and reranked_ids and first_stage_ids[0] != reranked_ids[0]:
+                self.top1_changed += 1
+            self.total_rank_shift += rank_shift
+
+    def _percentile(self, percentile: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+    def to_dict(self) -> Dict:
+        """Metrics snapshot for the /stats endpoint."""
+        with self._lock:
+            completed = self.calls - self.timeouts
+            return {
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "timeout_rate": self.timeouts / self.calls if self.calls else 0.0,
+                "latency_ms_p50": self._percentile(0.5),
+                "latency_ms_p95": self._percentile(0.95),
+                "top1_changed_rate": self.top1_changed / completed if completed else 0.0,
+                "mean_rank_shift": self.total_rank_shift / completed if completed else 0.0
+            }
+
+
+class Reranker:
+    """Base class for rerank stages plugged into the RAG engines."""
+
+    def __init__(self, shortlist_size: int = 30, time_budget_ms: float = 25.0):
+        """
+        Initialize reranker.
+
+        Args:
+            shortlist_size: Number of first-stage candidates to re-score
+            time_budget_ms: Default time budget per request
+        """
+        self.shortlist_size = shortlist_size
+        self.time_budget_ms = time_budget_ms
+        self.metrics = RerankMetrics()
+
+    def score(self, query_terms: List[str], result: Dict, deadline: Optional[float] = None) -> float:
+        """
+        Score a single candidate ({"chunk", "similarity"}).
+
+        Implementations doing more than constant work call check_deadline(deadline)
+        as they go, so one slow candidate cannot overrun the budget.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop state derived from the current index (called when the engine swaps its index)."""
+
+    def rerank(
+        self,
+        query: str,
+        results: List[Dict],
+        time_budget_ms: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Re-score first-stage results within a time budget.
+
+        Args:
+            query: User question
+            results: First-stage results, best first
+            time_budget_ms: Budget, checked between candidates and during feature
+                extraction; falls back to first-stage order when exceeded (the overrun
+                is at most one check interval of work)
+
+        Returns:
+            Results in reranked order (or first-stage order on timeout)
+        """
+        if time_budget_ms is None:
+            time_budget_ms = self.time_budget_ms
+
+        start = time.perf_counter()
+        deadline = start + time_budget_ms / 1000.0
+        first_stage_ids = [result["chunk"]["chunk_id"] for result in results]
+
+        query_terms = tokenize(query)
+        scored = []
+        timed_out = False
+
+        try:
+            for position, result in enumerate(results):
+                check_deadline(deadline)
+                scored.append((self.score(query_terms, result, deadline), -position, result))
+        except RerankTimeout:
+            timed_out = True
+
+        latency_ms = (time.perf_counter() - start) * 1000.0
+
+        if timed_out:
+            self.metrics.record(latency_ms, first_stage_ids, [], timed_out=True)
+            return results
+
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        reranked = [
+            {**result, "rerank_score": score}
+            for score, _, result in scored
+        ]
+
+        self.metrics.record(
+            latency_ms,
+            first_stage_ids,
+            [result["chunk"]["chunk_id"] for result in reranked],
+            timed_out=False
+        )
+
+        return reranked
+
+
+class LocalReranker(Reranker):
+    """Reranker using term proximity, title match, citation priors and an optional local model."""
+
+    def __init__(
+        self,
+        shortlist_size: int = 30,
+        time_budget_ms: float = 25.0,
+        weights: Optional[Dict[str, float]] = None,
+        citation_priors: Optional[Dict[str, float]] = None,
+        model_path: Optional[str] = None
+    ):
+        """
+        Initialize local reranker.
+
+        Args:
+            shortlist_size: Number of first-stage candidates to re-score
+            time_budget_ms: Default time budget per request
+            weights: Linear blend weights per signal
+            citation_priors: Score boost per citation prefix (longest prefix wins)
+            model_path: Optional JSON logistic model {"weights": {...}, "bias": float}
+        """
+        super().__init__(shortlist_size, time_budget_ms)
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.citation_priors = citation_priors if citation_priors is not None else dict(DEFAULT_CITATION_PRIORS)
+        self._prior_prefixes = sorted(self.citation_priors, key=len, reverse=True)
+
+        self.model = None
+        if model_path:
+            with open(model_path, 'r', encoding='utf-8') as f:
+                self.model = json.load(f)
+
+        # chunk_id -> (token positions, title tokens), built on first use and cleared with the index
+        self._chunk_features: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._chunk_features.clear()
+
+    def _features_for_chunk(self, chunk: Dict, deadline: Optional[float] = None) -> tuple:
+        with self._lock:
+            cached = self._chunk_features.get(chunk["chunk_id"])
+        if cached is None:
+            # Built outside the lock; a concurrent build of the same chunk is identical
+            positions: Dict[str, List[int]] = {}
+            for i, token in enumerate(tokenize(chunk["content"][:PROXIMITY_SCAN_CHARS])):
+                if i % DEADLINE_CHECK_INTERVAL == 0:
+                    check_deadline(deadline)
+                positions.setdefault(token, []).append(i)
+            cached = (positions, set(tokenize(chunk.get("section_title", ""))))
+            with self._lock:
+                self._chunk_features[chunk["chunk_id"]] = cached
+        return cached
+
+    @staticmethod
+    def _proximity(
+        query_terms: List[str],
+        positions: Dict[str, List[int]],
+        deadline: Optional[float] = None
+    ) -> float:
+        """Coverage of query terms times the density of the tightest window containing them."""
+        terms = [term for term in set(query_terms) if term in positions]
+        if not terms:
+            return 0.0
+
+        events = sorted(
+            (position, term) for term in terms for position in positions[term]
+        )
+
+        # Smallest window containing every matched term (sliding window)
+        counts: Dict[str, int] = {}
+        covered = 0
+        best_span = None
+        left = 0
+        for right, (position, term) in enumerate(events):
+            if right % DEADLINE_CHECK_INTERVAL == 0:
+                check_deadline(deadline)
+            counts[term] = counts.get(term, 0) + 1
+            if counts[term] == 1:
+                covered += 1
+            while covered == len(terms):
+                span = position - events[left][0] + 1
+                if best_span is None or span < best_span:
+                    best_span = span
+                left_term = events[left][1]
+                counts[left_term] -= 1
+                if counts[left_term] == 0:
+                    covered -= 1
+                left += 1
+
+        coverage = len(terms) / len(set(query_terms))
+        return coverage * len(terms) / best_span
+
+    def _citation_prior(self, citation: str) -> float:
+        for prefix in self._prior_prefixes:
+            if citation.startswith(prefix):
+                return self.citation_priors[prefix]
+        return 0.0
+
+    def features(self, query_terms: List[str], result: Dict, deadline: Optional[float] = None) -> Dict[str, float]:
+        """Signals for a single candidate (raises RerankTimeout past deadline)."""
+        chunk = result["chunk"]
+        positions, title_terms = self._features_for_chunk(chunk, deadline)
+        unique_terms = set(query_terms)
+
+        return {
+            "similarity": float(result["similarity"]),
+            "proximity": self._proximity(query_terms, positions, deadline),
+            "title_match": len(unique_terms & title_terms) / len(unique_terms) if unique_terms else 0.0,
+            "citation_prior": self._citation_prior(chunk.get("citation", ""))
+        }
+
+    def score(self, query_terms: List[str], result: Dict, deadline: Optional[float] = None) -> float:
+        features = self.features(query_terms, result, deadline)
+
+        if self.model:
+            logit = self.model.get("bias", 0.0) + sum(
+                weight * features.get(name, 0.0)
+                for name, weight in self.model.get("weights", {}).items()
+            )
+            return 1.0 / (1.0 + math.exp(-logit))
+
+        return sum(self.weights.get(name, 0.0) * value for name, value in features.items())
+
+
+def reciprocal_rank(results: List[Dict], relevant_citations: List[str]) -> float:
+    """
+    Reciprocal rank of the first relevant result (0.0 if none is relevant).
+
+    Relevance is labeled by section citation; a subsection of a relevant section counts.
+    """
+    for rank, result in enumerate(results, 1):
+        citation = result["chunk"].get("citation", "")
+        if any(citation == relevant or citation.startswith(relevant + ".") for relevant in relevant_citations):
+            return 1.0 / rank
+    return 0.0
+
+
+def evaluate_reranker(
+    reranker: Reranker,
+    labeled_queries: List[Dict],
+    first_stage: Callable[[str], List[Dict]]
+) -> Dict:
+    """
+    Measure rerank quality on labeled questions (offline).
+
+    Each question's first-stage shortlist is reranked without a time budget and the
+    mean reciprocal rank of the first relevant section is compared before and after.
+
+    Args:
+        reranker: Rerank stage to evaluate
+        labeled_queries: [{"question": str, "relevant": [section citations]}]
+        first_stage: Returns the first-stage shortlist for a question, best first
+
+    Returns:
+        Query count, first-stage and reranked MRR, and per-question reciprocal ranks
+    """
+    per_query = []
+    for labeled in labeled_queries:
+        results = first_stage(labeled["question"])
+        reranked = reranker.rerank(labeled["question"], results, time_budget_ms=float("inf"))
+        per_query.append({
+            "question": labeled["question"],
+            "first_stage_rr": reciprocal_rank(results, labeled["relevant"]),
+            "reranked_rr": reciprocal_rank(reranked, labeled["relevant"])
+        })
+
+    count = len(per_query)
+    return {
+        "queries": count,
+        "first_stage_mrr": sum(q["first_stage_rr"] for q in per_query) / count if count else 0.0,
+        "reranked_mrr": sum(q["reranked_rr"] for q in per_query) / count if count else 0.0,
+        "per_query": per_query
+    }
+
+
+def create_reranker() -> Optional[Reranker]:
+    """
+    Create the reranker configured in the environment.
+
+    RERANK_ENABLED: "true" to enable the rerank stage (default off)
+    RERANK_TIME_BUDGET_MS: Per-request time budget (default 25)
+    RERANK_SHORTLIST: Number of candidates to re-score (default 30)
+    RERANK_MODEL_PATH: Optional local model file
+
+    Returns:
+        Reranker instance, or None when disabled
+    """
+    if os.getenv("RERANK_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    model_path = os.getenv("RERANK_MODEL_PATH")
+    if model_path and not Path(model_path).exists():
+        raise ValueError(f"RERANK_MODEL_PATH not found: {model_path}")
+
+    return LocalReranker(
+        shortlist_size=int(os.getenv("RERANK_SHORTLIST", 30)),
+        time_budget_ms=float(os.getenv("RERANK_TIME_BUDGET_MS", 25)),
+        model_path=model_path
+    )
+
+
+def main():
+    """Evaluate the configured reranker on the labeled question set."""
+    import argparse
+    from rag_engine import RAGEngine
+
+    data_dir = Path(__file__).parent.parent / "data"
+    parser = argparse.ArgumentParser(description="Measure rerank quality on labeled questions")
+    parser.add_argument(
+        "--index",
+        default=str(data_dir / "processed" / "chunks_with_embeddings.json"),
+        help="Chunks with embeddings"
+    )
+    parser.add_argument(
+        "--queries",
+        default=str(data_dir / "eval" / "rerank_queries.json"),
+        help="Labeled questions ([{\"question\", \"relevant\": [citations]}])"
+    )
+    parser.add_argument(
+        "--provider",
+        choices=["voyage", "openai"],
+        default="openai",
+        help="Embedding provider of the index (default: openai)"
+    )
+
+    args = parser.parse_args()
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        labeled_queries = json.load(f)
+
+    reranker = create_reranker() or LocalReranker()
+    engine = RAGEngine(args.index, embedding_provider=args.provider)
+
+    report = evaluate_reranker(
+        reranker,
+        labeled_queries,
+        lambda question: engine.retrieve_relevant_chunks(question, top_k=reranker.shortlist_size)
+    )
+
+    print(f"\n{'Question':60} {'first':>6} {'rerank':>6}")
+    for query in report["per_query"]:
+        print(f"{query['question'][:60]:60} {query['first_stage_rr']:6.3f} {query['reranked_rr']:6.3f}")
+    print(f"\nMRR over {report['queries']} questions: "
+          f"first stage {report['first_stage_mrr']:.3f}, reranked {report['reranked_mrr']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
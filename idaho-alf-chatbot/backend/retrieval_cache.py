@@ -0,0 +1,113 @@
+"""
+Retrieval result cache for Idaho ALF RegNavigator
+Caches ranked row indices per quantized query vector, search parameters and index version.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+
+# (row index into the engine's chunk list, similarity, extra result fields or None)
+CachedRow = Tuple[int, float, Optional[Dict]]
+
+
+class RetrievalCache:
+    """LRU cache of retrieval results stored as row-index lists."""
+
+    def __init__(self, max_entries: int = 2048, quantization_scale: int = 1000):
+        """
+        Initialize retrieval cache.
+
+        Args:
+            max_entries: Maximum number of cached result lists
+            quantization_scale: Query vectors are rounded to 1/scale before hashing
+        """
+        self.max_entries = max_entries
+        self.quantization_scale = quantization_scale
+
+        self._entries: "OrderedDict[str, List[CachedRow]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def make_key(self, query_embedding: List[float], index_version: str, **params) -> str:
+        """
+        Cache key for a query vector, search parameters/filters and index version.
+
+        Args:
+            query_embedding: Query embedding
+            index_version: Version of the index being searched
+            **params: Search parameters and filters (top_k, thresholds, ...)
+        """
+        quantized = np.round(
+            np.asarray(query_embedding, dtype=np.float32) * self.quantization_scale
+        ).astype(np.int32)
+
+        digest = hashlib.sha256(quantized.tobytes())
+        digest.update(index_version.encode("utf-8"))
+        digest.update(repr(sorted(params.items())).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[CachedRow]]:
+        """Return cached rows, or None on a miss."""
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def put(self, key: str, rows: List[CachedRow]):
+        """Store rows, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop all entries (called when the index is swapped)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Hit ratio and size for the /stats endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+def create_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Create the retrieval cache configured in the environment.
+
+    RETRIEVAL_CACHE: "false" to disable (default on)
+    RETRIEVAL_CACHE_SIZE: Maximum cached result lists (default 2048)
+
+    Returns:
+        RetrievalCache instance, or None when disabled
+    """
+    if os.getenv("RETRIEVAL_CACHE", "true").lower() in ("0", "false", "no"):
+        return None
+
+    return RetrievalCache(max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", 2048)))
@@ -0,0 +1,355 @@
+"""
+Conversation sessions for Idaho ALF RegNavigator
+Server-side session state: a rolling summary, the latest unsummarized turns and the
+chunk rows retrieved for the last turn, kept in a bounded LRU with optional SQLite spill.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Optional
+
+
+# Raw messages kept for the prompt until they are folded into the summary
+MAX_PENDING_MESSAGES = 6
+
+# Upper bound on the summary carried in prompts
+SUMMARY_MAX_WORDS = 150
+
+
+class UnknownSessionError(KeyError):
+    """Raised for a session_id that was not created by the store (or has been dropped)."""
+
+
+class Session:
+    """State of one conversation."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.summary = ""
+        self.pending: List[Dict] = []  # Messages not yet folded into the summary
+        self.retained_rows: List[int] = []
+        self.kb_version: Optional[str] = None  # Index version the retained rows refer to
+        self.turns = 0
+        self.messages_recorded = 0
+        self.updated_at = time.time()
+        self.summarizing = False
+
+    def to_dict(self) -> Dict:
+        """Convert session to its JSON form."""
+        return {
+            "session_id": self.session_id,
+            "summary": self.summary,
+            "pending": self.pending,
+            "retained_rows": self.retained_rows,
+            "kb_version": self.kb_version,
+            "turns": self.turns,
+            "messages_recorded": self.messages_recorded,
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Session":
+        """Create session from its JSON form."""
+        session = cls(data["session_id"])
+        session.summary = data.get("summary", "")
+        session.pending = data.get("pending", [])
+        session.retained_rows = data.get("retained_rows", [])
+        session.kb_version = data.get("kb_version")
+        session.turns = data.get("turns", 0)
+        session.messages_recorded = data.get("messages_recorded", len(session.pending))
+        session.updated_at = data.get("updated_at", time.time())
+        return session
+
+
+def build_summary_prompt(summary: str, messages: List[Dict], max_words: int = SUMMARY_MAX_WORDS) -> str:
+    """Prompt asking the model to fold new messages into the running summary."""
+    transcript = "\n".join(
+        f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+        for msg in messages
+    )
+    return (
+        "You maintain a running summary of a conversation about Idaho assisted living "
+        "facility regulations. Update the summary with the new messages. Keep the facility "
+        "details, topics and regulation citations discussed, and any open questions. "
+        f"Use at most {max_words} words. Reply with the summary only.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New messages:\n{transcript}\n\n"
+        "Updated summary:"
+    )
+
+
+class SessionStore:
+    """Bounded LRU of sessions; evicted sessions spill to SQLite when a path is configured."""
+
+    def __init__(self, max_sessions: int = 1024, spill_path: Optional[str] = None):
+        """
+        Initialize session store.
+
+        Args:
+            max_sessions: Maximum number of sessions kept in memory
+            spill_path: SQLite file for evicted sessions (None to drop them)
+        """
+        self.max_sessions = max_sessions
+        self.spill_path = Path(spill_path) if spill_path else None
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.created = 0
+        self.evicted = 0
+        self.restored = 0
+        self.follow_ups = 0
+        self.rows_reused = 0
+        self.summaries = 0
+        self.summary_failures = 0
+
+        if self.spill_path is not None:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.spill_path), timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Generate a session ID."""
+        return uuid.uuid4().hex
+
+    def create(self) -> Session:
+        """Start a new session under a fresh session ID."""
+        session = Session(self.new_session_id())
+        with self._lock:
+            self.created += 1
+            self._sessions[session.session_id] = session
+            evicted = self._evict_locked()
+
+        for old in evicted:
+            self._spill(old)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """
+        Return a session, restoring it from the spill file if needed.
+
+        Args:
+            session_id: Session ID returned by create()
+
+        Returns:
+            The session, or None if it was never created (or was evicted without a spill file)
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+
+        session = self._restore(session_id)
+        if session is None:
+            return None
+
+        with self._lock:
+            # Another thread may have loaded it meanwhile
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                return existing
+            self._sessions[session_id] = session
+            evicted = self._evict_locked()
+
+        for old in evicted:
+            self._spill(old)
+        return session
+
+    def _resident_locked(self, session: Session) -> tuple:
+        """
+        The in-memory copy of a session about to be changed (caller holds the lock).
+
+        A session evicted since the caller got it has already been spilled, so changes
+        to that object would be lost: it is put back in memory instead, or the copy
+        another thread restored from the spill file is changed in its place.
+
+        Returns:
+            (session to change, sessions evicted to make room)
+        """
+        current = self._sessions.get(session.session_id)
+        if current is not None:
+            self._sessions.move_to_end(session.session_id)
+            return current, []
+        self._sessions[session.session_id] = session
+        return session, self._evict_locked()
+
+    def _evict_locked(self) -> List[Session]:
+        evicted = []
+        while len(self._sessions) > self.max_sessions:
+            _, session = self._sessions.popitem(last=False)
+            evicted.append(session)
+            self.evicted += 1
+        return evicted
+
+    def _spill(self, session: Session):
+        if self.spill_path is None:
+            return
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session.session_id, json.dumps(session.to_dict()), session.updated_at)
+        )
+        conn.commit()
+
+    def _restore(self, session_id: str) -> Optional[Session]:
+        if self.spill_path is None:
+            return None
+        conn = self._connection()
+        row = conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+        self.restored += 1
+        return Session.from_dict(json.loads(row[0]))
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session from memory and the spill file."""
+        with self._lock:
+            found = self._sessions.pop(session_id, None) is not None
+        if self.spill_path is not None:
+            conn = self._connection()
+            cursor = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.commit()
+            found = found or cursor.rowcount > 0
+        return found
+
+    def prior_rows(self, session: Session, kb_version: str) -> Optional[List[int]]:
+        """Rows retrieved for the session's previous turn, if they refer to the current index."""
+        if session.retained_rows and session.kb_version == kb_version:
+            return list(session.retained_rows)
+        return None
+
+    def record_turn(
+        self,
+        session: Session,
+        question: str,
+        answer: str,
+        rows: List[int],
+        kb_version: str,
+        rows_reused: Optional[int] = None
+    ):
+        """
+        Record a completed turn.
+
+        Args:
+            session: Session the turn belongs to
+            question: User question
+            answer: Assistant answer
+            rows: Chunk rows retrieved for the turn
+            kb_version: Index version the rows refer to
+            rows_reused: Prior rows kept by a follow-up retrieval (None for a first turn)
+        """
+        with self._lock:
+            session, evicted = self._resident_locked(session)
+            session.pending.extend([
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer}
+            ])
+            # Summaries lagging behind: drop the oldest raw messages
+            del session.pending[:-MAX_PENDING_MESSAGES]
+            session.messages_recorded += 2
+            session.retained_rows = list(rows)
+            session.kb_version = kb_version
+            session.turns += 1
+            session.updated_at = time.time()
+
+            if rows_reused is not None:
+                self.follow_ups += 1
+                self.rows_reused += rows_reused
+
+        for old in evicted:
+            self._spill(old)
+
+    def start_summary(self, session: Session) -> Optional[tuple]:
+        """
+        Claim a session for summarization.
+
+        Returns:
+            (prompt, messages recorded so far), or None if there is nothing to do
+        """
+        with self._lock:
+            if session.summarizing or not session.pending:
+                return None
+            session.summarizing = True
+            messages = list(session.pending)
+            summary = session.summary
+            covered = session.messages_recorded
+
+        return build_summary_prompt(summary, messages), covered
+
+    def finish_summary(self, session: Session, summary: Optional[str], covered: int):
+        """
+        Store a new summary and drop the pending messages it covers.
+
+        Args:
+            session: Session being summarized
+            summary: New summary text (None if summarization failed)
+            covered: messages_recorded when summarization started
+        """
+        with self._lock:
+            session.summarizing = False
+            if summary is None:
+                self.summary_failures += 1
+                return
+            session, evicted = self._resident_locked(session)
+            session.summarizing = False
+            words = summary.split()
+            session.summary = " ".join(words[:SUMMARY_MAX_WORDS * 2])
+            # Keep only messages recorded while the summary was being computed
+            first_pending = session.messages_recorded - len(session.pending)
+            del session.pending[:max(0, covered - first_pending)]
+            self.summaries += 1
+
+        for old in evicted:
+            self._spill(old)
+
+    def stats(self) -> Dict:
+        """Session counts for the /stats endpoint."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "spill_path": str(self.spill_path) if self.spill_path else None,
+                "created": self.created,
+                "evicted": self.evicted,
+                "restored": self.restored,
+                "follow_ups": self.follow_ups,
+                "mean_rows_reused": self.rows_reused / self.follow_ups if self.follow_ups else 0.0,
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures
+            }
+
+
+def create_session_store() -> SessionStore:
+    """
+    Create the session store configured in the environment.
+
+    SESSIONS_MAX: Sessions kept in memory (default 1024)
+    SESSIONS_SPILL_PATH: SQLite file for sessions evicted from memory (default: dropped)
+    """
+    return SessionStore(
+        max_sessions=int(os.getenv("SESSIONS_MAX", 1024)),
+        spill_path=os.getenv("SESSIONS_SPILL_PATH") or None
+    )
@@ -0,0 +1,104 @@
+"""
+Single-flight request coalescing for Idaho ALF RegNavigator
+Identical concurrent requests share one in-flight computation instead of repeating provider calls.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one asyncio task.
+
+    The first caller (leader) starts the work; callers arriving while it is in flight
+    (followers) await the same task. Coalescing is per process: each worker has its own.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.leaders = 0
+        self.followers = 0
+        self.shared_errors = 0
+        self.provider_calls_saved = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Stable key for JSON-serializable request parts."""
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    async def do(
+        self,
+        key: str,
+        work: Callable[[], Awaitable[Any]],
+        provider_calls: Optional[Callable[[Any], int]] = None
+    ) -> Any:
+        """
+        Run work once per key among concurrent callers.
+
+        Args:
+            key: Coalescing key (see make_key)
+            work: Coroutine factory doing the actual computation
+            provider_calls: Provider calls a result cost (credited as saved for each follower)
+
+        Returns:
+            The shared result (followers must not mutate it)
+        """
+        task = self._inflight.get(key)
+        leader = task is None
+
+        if leader:
+            # A task, so a cancelled leader request does not cancel its followers
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        try:
+            result = await asyncio.shield(task)
+        except Exception:
+            if not leader:
+                self.shared_errors += 1
+            raise
+
+        if not leader:
+            self.provider_calls_saved += provider_calls(result) if provider_calls else 1
+        return result
+
+    def _release(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        """Coalescing counters for the /stats endpoint."""
+        requests = self.leaders + self.followers
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_rate": self.followers / requests if requests else 0.0,
+            "shared_errors": self.shared_errors,
+            "provider_calls_saved": self.provider_calls_saved
+        }
+
+
+def create_single_flight() -> Optional[SingleFlight]:
+    """
+    Create the single-flight layer configured in the environment.
+
+    SINGLE_FLIGHT: "false" to disable request coalescing (default on)
+
+    Returns:
+        SingleFlight instance, or None when disabled
+    """
+    if os.getenv("SINGLE_FLIGHT", "true").lower() in ("0", "false", "no"):
+        return None
+    return SingleFlight()
@@ -0,0 +1,245 @@
+"""
+Stand-in embedding server for Idaho ALF RegNavigator
+Local OpenAI-compatible /v1/embeddings endpoint for exercising the embedding clients
+without provider credentials: deterministic vectors, float-list or base64 responses,
+simulated latency, per-request item and token limits, and rate limiting with 429s and
+x-ratelimit-* headers.
+"""
+
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional
+
+import numpy as np
+
+
+def stub_embedding(text: str, dimensions: int) -> List[float]:
+    """Deterministic unit vector for a text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubEmbeddingServer:
+    """Threaded HTTP server answering embedding requests like the OpenAI API."""
+
+    def __init__(
+        self,
+        port: int = 0,
+        dimensions: int = 64,
+        latency: float = 0.05,
+        max_items: int = 2048,
+        max_tokens: int = 300000,
+        requests_per_second: Optional[float] = None,
+        shuffle: bool = True
+    ):
+        """
+        Initialize stand-in server.
+
+        Args:
+            port: Port to listen on (0 picks a free port)
+            dimensions: Embedding dimensions
+            latency: Seconds each request takes
+            max_items: Maximum inputs per request (400 above)
+            max_tokens: Maximum estimated tokens per request (400 above)
+            requests_per_second: Request budget per one-second window (None for unlimited)
+            shuffle: Return data items out of order (clients must sort by "index")
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.requests_per_second = requests_per_second
+        self.shuffle = shuffle
+
+        self.requests = 0
+        self.bytes_sent = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.connections = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Embeddings endpoint URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/embeddings"
+
+    def start(self) -> "StubEmbeddingServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubEmbeddingServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _admit(self) -> Dict[str, str]:
+        """Count a request against the rate window; returns rate-limit headers (empty if unlimited)."""
+        with self._lock:
+            self.requests += 1
+            if self.requests_per_second is None:
+                return {}
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_requests = 0
+            self._window_requests += 1
+            limit = int(self.requests_per_second)
+            remaining = max(0, limit - self._window_requests)
+            reset = max(0.0, 1.0 - (now - self._window_start))
+            headers = {
+                "x-ratelimit-limit-requests": str(limit),
+                "x-ratelimit-remaining-requests": str(remaining),
+                "x-ratelimit-reset-requests": f"{int(reset * 1000)}ms"
+            }
+            if self._window_requests > limit:
+                self.throttled += 1
+                headers["retry-after"] = f"{reset:.3f}"
+                headers["x-stub-throttled"] = "1"
+            return headers
+
+    def embed(self, payload: Dict) -> tuple:
+        """Build (status, body, headers) for a request payload."""
+        headers = self._admit()
+        if headers.pop("x-stub-throttled", None):
+            return 429, {"error": {"message": "Rate limit reached", "type": "requests"}}, headers
+
+        texts = payload.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+
+        tokens = sum(len(text) // 4 + 1 for text in texts)
+        if len(texts) > self.max_items or tokens > self.max_tokens:
+            with self._lock:
+                self.rejected += 1
+            message = f"Request has {len(texts)} inputs and ~{tokens} tokens; limits are {self.max_items} and {self.max_tokens}"
+            return 400, {"error": {"message": message, "type": "invalid_request_error"}}, headers
+
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        # Like the OpenAI API: base64 of little-endian float32 when asked for, float lists otherwise
+        if payload.get("encoding_format") == "base64":
+            encode = lambda vector: base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+        else:
+            encode = lambda vector: vector
+
+        data = [
+            {"object": "embedding", "index": index, "embedding": encode(stub_embedding(text, self.dimensions))}
+            for index, text in enumerate(texts)
+        ]
+        if self.shuffle:
+            random.shuffle(data)
+
+        body = {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+        return 200, body, headers
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_sent": self.bytes_sent,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+                "connections": self.connections,
+                "max_in_flight": self.max_in_flight
+            }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients can keep connections alive
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, body, headers = server.embed(payload)
+
+                encoded = json.dumps(body).encode("utf-8")
+                with server._lock:
+                    server.bytes_sent += len(encoded)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    """Run the stand-in server until interrupted."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the embeddings API")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--dimensions", type=int, default=64, help="Embedding dimensions (default: 64)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request (default: 0.05)")
+    parser.add_argument("--max-items", type=int, default=2048, help="Inputs per request (default: 2048)")
+    parser.add_argument("--max-tokens", type=int, default=300000, help="Tokens per request (default: 300000)")
+    parser.add_argument("--rps", type=float, default=None, help="Requests per second before 429s (default: unlimited)")
+    args = parser.parse_args()
+
+    server = StubEmbeddingServer(
+        port=args.port,
+        dimensions=args.dimensions,
+        latency=args.latency,
+        max_items=args.max_items,
+        max_tokens=args.max_tokens,
+        requests_per_second=args.rps
+    )
+    print(f"Stand-in embeddings API at {server.url}")
+    print("Point the clients at it with EMBEDDING_API_URL; press Ctrl+C to stop")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Subsection chunks for Idaho ALF RegNavigator
+Sections with numbered subsections ("01. Staffing Standards.") are indexed whole and as one
+child chunk per subsection, linked to the section by "parent_id". Retrieval scores the
+small children and rolls hits up to their section, so a prompt carries only the
+subsections that matched instead of the whole (truncated) section.
+"""
+
+from typing import List, Dict, Iterable, Iterator, Tuple
+
+
+# Ranked rows fetched per requested result when the index has subsection chunks
+# (a section's children tend to rank next to each other)
+HITS_PER_RESULT = 4
+
+
+def is_subsection(chunk: Dict) -> bool:
+    return "parent_id" in chunk
+
+
+def section_chunks(chunks: List[Dict]) -> List[Dict]:
+    """Chunks without subsection children (for artifacts built per section)."""
+    return [chunk for chunk in chunks if "parent_id" not in chunk]
+
+
+def roll_up(
+    hits: Iterable[Dict],
+    chunks_by_id: Dict[str, Dict],
+    exclude_ids: Iterable[str] = ()
+) -> Iterator[Dict]:
+    """
+    Merge subsection hits into one result per section, best first.
+
+    A section is yielded at the position of its best hit. If that hit is a subsection,
+    the result carries "subsections" (ids of the matching children), extended as later
+    hits for the same section arrive; if the section itself matched best, it is used whole.
+
+    Args:
+        hits: {"chunk", "similarity"} results, best first
+        chunks_by_id: Index chunks by chunk_id
+        exclude_ids: Sections to skip (e.g. already retained from a previous turn)
+
+    Yields:
+        Results whose "chunk" is always a section chunk
+    """
+    exclude_ids = set(exclude_ids)
+    sections: Dict[str, Dict] = {}
+
+    for hit in hits:
+        chunk = hit["chunk"]
+        parent = chunks_by_id.get(chunk.get("parent_id"))
+        section_id = parent["chunk_id"] if parent is not None else chunk["chunk_id"]
+        if section_id in exclude_ids:
+            continue
+
+        result = sections.get(section_id)
+        if result is None:
+            if parent is None:
+                result = hit
+            else:
+                result = dict(hit, chunk=parent, subsections=[chunk["chunk_id"]])
+            sections[section_id] = result
+            yield result
+        elif parent is not None and "subsections" in result:
+            result["subsections"].append(chunk["chunk_id"])
+
+
+def subsection_order(chunk_id: str) -> Tuple[int, int]:
+    """Document order of a section's subsection ids ("..._100.02" before "..._100.01_2")."""
+    number, _, run = chunk_id.rsplit(".", 1)[1].partition("_")
+    return int(run or 1), int(number)
+
+
+def prompt_chunk(result: Dict, chunks_by_id: Dict[str, Dict]) -> Dict:
+    """
+    Chunk to render in a prompt for a result: its section, cut down to the matching subsections.
+
+    The rendered chunk keeps the section's citation and title; its chunk_id names the
+    subsections so prompt blocks are memoized per combination.
+    """
+    chunk = result["chunk"]
+    subsection_ids = result.get("subsections")
+    if not subsection_ids:
+        return chunk
+
+    children = [chunks_by_id[chunk_id] for chunk_id in sorted(subsection_ids, key=subsection_order)]
+    return dict(
+        chunk,
+        chunk_id=chunk["chunk_id"] + "#" + "+".join(child["chunk_id"].rsplit(".", 1)[1] for child in children),
+        content="\n".join(child["content"] for child in children)
+    )
+
+
+def subsection_citations(result: Dict, chunks_by_id: Dict[str, Dict]) -> List[str]:
+    """Citations of the subsections a result matched (empty if it matched as a whole)."""
+    return [
+        chunks_by_id[chunk_id]["citation"]
+        for chunk_id in sorted(result.get("subsections") or [], key=subsection_order)
+    ]
@@ -1,14 +1,46 @@
 """
 Idaho ALF Regulation Text Processor
-Extracts and chunks regulatory text files by section with metadata.
+Extracts and chunks regulatory text files by section with metadata. Files without
+IDAPA-style section headers are chunked in overlapping, token-bounded windows instead.
 """
 
+import os
 import re
 import json
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from datetime import datetime
 
+from batch_packing import CHARS_PER_TOKEN, estimate_tokens, split_text
+
+
+# Recorded in the ingest manifest; bump when chunk output changes so indexed files are reparsed
+PARSER_VERSION = 5
+
+# ALL CAPS section headers like "100. LICENSING REQUIREMENTS."
+SECTION_HEADER_RE = re.compile(r'^(\d{3,4})\.\s+([A-Z][A-Z\s\-,&()]+)\.')
+# RESERVED range markers like "017 -- 099. (RESERVED)"
+RESERVED_RE = re.compile(r'^\d{3,4}\s*--\s*\d{3,4}\.\s*\(RESERVED\)')
+# Numbered subsections inside a section like "01. Staffing Standards."
+SUBSECTION_RE = re.compile(r'^(\d{2})\.\s+([A-Z][^.]{1,120})\.')
+# Numbered headings in other documents: "39-3301. LEGISLATIVE INTENT.", "3-201.11 Compliance with Food Law.", "4.6.3* Parking Spaces."
+NUMBERED_HEADING_RE = re.compile(r'^(\d+(?:[.-]\d+)+)\*?\.?\s+([A-Z][^.]{2,80})\.')
+# Sentence boundaries in running text (where sliding windows may start or end)
+SENTENCE_END_RE = re.compile(r'(?<=[.!?:])\s+(?=[("\'\[]?[A-Z0-9])')
+
+
+def _category_intervals(mapping: Dict[str, str]) -> Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[str, ...]]:
+    """Section ranges ("100-149" -> category) as parallel starts, ends and categories sorted by start."""
+    intervals = sorted(
+        (*map(int, section_range.split("-")), category)
+        for section_range, category in mapping.items()
+    )
+    starts, ends, categories = zip(*intervals)
+    return starts, ends, categories
+
 
 class RegulationChunk:
     """Represents a single chunk of regulatory text with metadata."""
@@ -22,7 +54,12 @@ class RegulationChunk:
         category: str,
         state: str = "Idaho",
         effective_date: Optional[str] = None,
-        source_file: Optional[str] = None
+        source_file: Optional[str] = None,
+        section_number: Optional[int] = None,
+        window_index: Optional[int] = None,
+        section_label: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        subsection: Optional[str] = None
     ):
         self.chunk_id = chunk_id
         self.content = content.strip()
@@ -32,10 +69,18 @@ class RegulationChunk:
         self.state = state
         self.effective_date = effective_date
         self.source_file = source_file
+        # Not serialized; used to relabel duplicate files
+        self.section_number = section_number
+        self.window_index = window_index  # Position of a sliding-window chunk in its file
+        self.section_label = section_label  # Numbered heading a window starts under ("39-3301")
+        self.subsection = subsection  # Subsection key of a child chunk ("01", "01_2" for a restarted run)
+
+        # Section chunk a subsection chunk belongs to (serialized for child chunks only)
+        self.parent_id = parent_id
 
     def to_dict(self) -> Dict:
         """Convert chunk to dictionary format."""
-        return {
+        data = {
             "chunk_id": self.chunk_id,
             "content": self.content,
             "citation": self.citation,
@@ -45,6 +90,9 @@ class RegulationChunk:
             "effective_date": self.effective_date,
             "source_file": self.source_file
         }
+        if self.parent_id is not None:
+            data["parent_id"] = self.parent_id
+        return data
 
 
 class IDAPATextProcessor:
@@ -69,42 +117,90 @@ class IDAPATextProcessor:
         "900-999": "enforcement"
     }
 
+    # Section ranges as sorted parallel tuples for bisect lookup
+    _CATEGORY_STARTS, _CATEGORY_ENDS, _CATEGORY_NAMES = _category_intervals(CATEGORY_MAPPING)
+
+    # Title keywords for sections outside every range, checked in order
+    CATEGORY_KEYWORDS = (
+        (("staff", "personnel", "employee"), "staffing"),
+        (("medication", "drug", "pharmaceutical"), "medications"),
+        (("food", "meal", "diet", "nutrition"), "dietary"),
+        (("building", "physical", "construction", "fire"), "physical_plant"),
+        (("license", "licensing", "permit"), "licensing"),
+        (("resident", "care", "service"), "resident_care"),
+        (("admission", "discharge", "agreement"), "admission_discharge"),
+        (("nursing", "assessment", "health"), "nursing_assessment"),
+        (("infection", "sanitation", "hygiene"), "infection_control"),
+        (("enforcement", "violation", "penalty"), "enforcement")
+    )
+
+    # Source file substring -> (chunk ID prefix, citation prefix); most specific first
+    DOCUMENT_PREFIXES = (
+        ("IDAPA 16.02.19", "idapa_16.02.19", "IDAPA 16.02.19"),
+        ("IDAPA 16.02.1", "idapa_16.02.01", "IDAPA 16.02.01"),
+        ("IDAPA 16.05.01", "idapa_16.05.01", "IDAPA 16.05.01"),
+        ("IDAPA 16.05.06", "idapa_16.05.06", "IDAPA 16.05.06"),
+        ("IDAPA 16.txt", "idapa_16.03.22", "IDAPA 16.03.22"),
+        ("IDAPA 16 ", "idapa_16.03.22", "IDAPA 16.03.22"),
+        ("IDAPA 24.34.01", "idapa_24.34.01", "IDAPA 24.34.01"),
+        ("IDAPA 24.39.30", "idapa_24.39.30", "IDAPA 24.39.30"),
+        ("IDAPA 24", "idapa_24", "IDAPA 24"),
+        ("TITLE 39", "title_39", "TITLE 39"),
+        ("Title 74", "title_74", "TITLE 74"),
+        ("ADA Accessibility Guidelines", "ada_adaag", "ADAAG"),
+        ("US Public Health Food Code", "fda_food_code", "FDA Food Code")
+    )
+    DEFAULT_DOCUMENT_PREFIXES = ("idaho_reg", "IDAPA")
+
+    # Source file substrings of raw files that are not regulation text (link lists)
+    EXCLUDED_FILES = ("additional referenced document links",)
+
+    # Sections with fewer numbered subsections than this get no subsection chunks
+    MIN_SUBSECTIONS = 2
+
+    # Sliding windows for files without section headers; 500 estimated tokens is about
+    # 1500 characters, so a window fits the 2000 characters the prompts show per chunk
+    WINDOW_TOKENS = 500
+    WINDOW_OVERLAP_TOKENS = 75
+    # Files with fewer section headers than this are chunked in windows
+    MIN_SECTION_HEADERS = 2
+    # Windowed text is cut into parts at the first paragraph break past this many
+    # characters; a part boundary closes the window, so parts can be chunked in parallel
+    WINDOW_PART_CHARS = 256 * 1024
+
+    # Files larger than this are split at section boundaries for parallel processing
+    PARALLEL_SPLIT_BYTES = 256 * 1024
+
     def __init__(self, raw_data_dir: str, processed_data_dir: str):
         self.raw_data_dir = Path(raw_data_dir)
         self.processed_data_dir = Path(processed_data_dir)
         self.processed_data_dir.mkdir(parents=True, exist_ok=True)
 
+        # Prefixes resolved once per source file instead of once per chunk
+        self._document_prefixes: Dict[str, Tuple[str, str]] = {}
+        if self.raw_data_dir.is_dir():
+            for filename in self.source_files():
+                self.document_prefixes(filename)
+
+    def source_files(self) -> List[str]:
+        """Text files in the raw data directory that are chunked (EXCLUDED_FILES left out)."""
+        return [
+            txt_file.name for txt_file in self.raw_data_dir.glob("*.txt")
+            if not any(excluded in txt_file.name for excluded in self.EXCLUDED_FILES)
+        ]
+
     def determine_category(self, section_num: int, title: str) -> str:
         """Determine category based on section number and title."""
         # First try section number ranges
-        for range_str, category in self.CATEGORY_MAPPING.items():
-            if "-" in range_str:
-                start, end = map(int, range_str.split("-"))
-                if start <= section_num <= end:
-                    return category
+        i = bisect_right(self._CATEGORY_STARTS, section_num) - 1
+        if i >= 0 and section_num <= self._CATEGORY_ENDS[i]:
+            return self._CATEGORY_NAMES[i]
 
         # Fallback to keyword matching in title
         title_lower = title.lower()
-        if any(word in title_lower for word in ["staff", "personnel", "employee"]):
-            return "staffing"
-        elif any(word in title_lower for word in ["medication", "drug", "pharmaceutical"]):
-            return "medications"
-        elif any(word in title_lower for word in ["food", "meal", "diet", "nutrition"]):
-            return "dietary"
-        elif any(word in title_lower for word in ["building", "physical", "construction", "fire"]):
-            return "physical_plant"
-        elif any(word in title_lower for word in ["license", "licensing", "permit"]):
-            return "licensing"
-        elif any(word in title_lower for word in ["resident", "care", "service"]):
-            return "resident_care"
-        elif any(word in title_lower for word in ["admission", "discharge", "agreement"]):
-            return "admission_discharge"
-        elif any(word in title_lower for word in ["nursing", "assessment", "health"]):
-            return "nursing_assessment"
-        elif any(word in title_lower for word in ["infection", "sanitation", "hygiene"]):
-            return "infection_control"
-        elif any(word in title_lower for word in ["enforcement", "violation", "penalty"]):
-            return "enforcement"
+        for keywords, category in self.CATEGORY_KEYWORDS:
+            if any(word in title_lower for word in keywords):
+                return category
 
         return "general"
 
@@ -130,33 +226,39 @@ class IDAPATextProcessor:
         Each section (e.g., 100., 101., etc.) becomes a chunk.
         Skips table of contents and only processes actual regulatory content.
         """
-        chunks = []
-        lines = text.split('\n')
+        return list(self.iter_sections(text.split('\n'), source_file))
+
+    def iter_sections(self, lines: Iterable[str], source_file: str) -> Iterator[RegulationChunk]:
+        """
+        Yield section chunks as each section closes.
 
+        Consumes lines one at a time (a list, or an open file handle for constant
+        memory); only the lines of the current section are held. Each section chunk is
+        followed by its subsection chunks, if it has any (see iter_subsections).
+        """
         current_section = None
         current_content = []
         current_title = ""
         in_toc = True  # Start by assuming we're in table of contents
 
-        # Pattern to match ALL CAPS section headers like "100. LICENSING REQUIREMENTS."
-        section_header_pattern = r'^(\d{3,4})\.\s+([A-Z][A-Z\s\-,&()]+)\.'
-        # Pattern to match RESERVED sections
-        reserved_pattern = r'^\d{3,4}\s*--\s*\d{3,4}\.\s*\(RESERVED\)'
-
-        for i, line in enumerate(lines):
+        for line in lines:
             line_stripped = line.strip()
 
-            # Detect when we've moved past the table of contents
-            # Look for the first ALL CAPS section header
-            if in_toc and re.match(section_header_pattern, line_stripped):
-                in_toc = False
+            # Classify the line once: headers and RESERVED markers both start with a digit
+            header = None
+            reserved = False
+            if line_stripped[:1].isdigit():
+                header = SECTION_HEADER_RE.match(line_stripped)
+                if header is None:
+                    reserved = RESERVED_RE.match(line_stripped) is not None
 
-            # Skip lines if we're still in table of contents
+            # The first ALL CAPS section header ends the table of contents
             if in_toc:
-                continue
+                if header is None:
+                    continue
+                in_toc = False
 
-            # Check if this is a RESERVED section marker
-            if re.match(reserved_pattern, line_stripped):
+            if reserved:
                 # Save current section before hitting reserved
                 if current_section is not None and current_content:
                     chunk = self._create_chunk(
@@ -166,18 +268,15 @@ class IDAPATextProcessor:
                         source_file
                     )
                     if chunk:
-                        chunks.append(chunk)
+                        yield chunk
+                        yield from self.iter_subsections(chunk, current_content)
 
                 # Reset for next section
                 current_section = None
                 current_content = []
                 current_title = ""
-                continue
 
-            # Check if this line is an ALL CAPS section header
-            match = re.match(section_header_pattern, line_stripped)
-
-            if match:
+            elif header is not None:
                 # Save previous section if exists
                 if current_section is not None and current_content:
                     chunk = self._create_chunk(
@@ -187,11 +286,12 @@ class IDAPATextProcessor:
                         source_file
                     )
                     if chunk:
-                        chunks.append(chunk)
+                        yield chunk
+                        yield from self.iter_subsections(chunk, current_content)
 
                 # Start new section
-                current_section = int(match.group(1))
-                current_title = match.group(2).strip()
+                current_section = int(header.group(1))
+                current_title = header.group(2).strip()
                 current_content = [line_stripped]  # Include header in content
 
             elif current_section is not None:
@@ -207,9 +307,267 @@ class IDAPATextProcessor:
                 source_file
             )
             if chunk:
-                chunks.append(chunk)
+                yield chunk
+                yield from self.iter_subsections(chunk, current_content)
+
+    def iter_subsections(self, section: RegulationChunk, lines: List[str]) -> Iterator[RegulationChunk]:
+        """
+        Yield a section's numbered subsections ("01. Title. ...") as child chunks.
+
+        Each child runs from its subsection line to the next one (or the end of the
+        section) and links to the section by parent_id. Text before the first subsection
+        is only in the section chunk. Sections with fewer than MIN_SUBSECTIONS
+        subsections yield nothing.
+
+        Numbering can restart inside one section (a second "01." run, e.g. where later
+        section headers are not recognized); later runs get an occurrence suffix
+        ("280.01_2") so child ids stay unique.
+        """
+        starts = []  # (line position, number, title)
+        for i, line in enumerate(lines):
+            if line[:1].isdigit():
+                match = SUBSECTION_RE.match(line)
+                if match:
+                    starts.append((i, match.group(1), match.group(2).strip()))
+
+        if len(starts) < self.MIN_SUBSECTIONS:
+            return
+
+        run = 1
+        previous = 0
+        for k, (start, number, title) in enumerate(starts):
+            # Numbering that goes back starts a new run
+            if int(number) <= previous:
+                run += 1
+            previous = int(number)
+
+            end = starts[k + 1][0] if k + 1 < len(starts) else len(lines)
+            content = '\n'.join(lines[start:end]).strip()
+            if not content:
+                continue
+            key = number if run == 1 else f"{number}_{run}"
+            yield self._create_subsection_chunk(section, key, title, content)
+
+    def _create_subsection_chunk(
+        self,
+        section: RegulationChunk,
+        key: str,
+        title: str,
+        content: str
+    ) -> RegulationChunk:
+        """
+        Create a subsection chunk; ID and citation extend the section's ("...100.01").
+
+        key is the subsection number, with the run suffix for restarted numbering
+        ("01_2"); the citation carries only the number printed in the text.
+        """
+        return RegulationChunk(
+            chunk_id=f"{section.chunk_id}.{key}",
+            content=content,
+            citation=f"{section.citation}.{key.split('_')[0]}",
+            section_title=f"{section.section_title} - {title}",
+            category=section.category,
+            state=section.state,
+            effective_date=section.effective_date,
+            source_file=section.source_file,
+            section_number=section.section_number,
+            parent_id=section.chunk_id,
+            subsection=key
+        )
+
+    def has_section_headers(self, lines: Iterable[str]) -> bool:
+        """Whether text has IDAPA-style section headers (otherwise it is chunked in windows)."""
+        found = 0
+        for line in lines:
+            line_stripped = line.strip()
+            if line_stripped[:1].isdigit() and SECTION_HEADER_RE.match(line_stripped):
+                found += 1
+                if found >= self.MIN_SECTION_HEADERS:
+                    return True
+        return False
+
+    def iter_sentences(
+        self,
+        lines: Iterable[str],
+        heading: Tuple = (None, None)
+    ) -> Iterator[Tuple[Optional[str], str, Tuple]]:
+        """
+        Yield (sentence, separator, heading) from hard-wrapped text.
+
+        Wrapped lines are joined, blank lines and numbered headings end paragraphs
+        (separator "\n"), and heading is the (label, title) of the last numbered heading.
+        A run of text without any sentence end is cut at a line end once it fills a window.
+        The first blank line past WINDOW_PART_CHARS yields a part boundary (sentence None).
+
+        Args:
+            lines: Text lines
+            heading: Heading in effect before the first line
+        """
+        paragraph = ""
+        max_chars = self.WINDOW_TOKENS * CHARS_PER_TOKEN
+        part_chars = 0
+
+        for line in lines:
+            line_stripped = line.strip()
+            part_chars += len(line_stripped) + 1
+
+            match = None
+            if line_stripped[:1].isdigit():
+                match = NUMBERED_HEADING_RE.match(line_stripped)
+
+            if not line_stripped or match:
+                if paragraph:
+                    yield paragraph, "\n", heading
+                    paragraph = ""
+                if match:
+                    heading = (match.group(1), match.group(2).strip())
+                if not line_stripped:
+                    if part_chars >= self.WINDOW_PART_CHARS:
+                        yield None, "\n", heading
+                        part_chars = 0
+                    continue
+
+            # The tail has no sentence end, so only the joint and the new line are scanned
+            scan_from = len(paragraph)
+            paragraph = f"{paragraph} {line_stripped}" if paragraph else line_stripped
+
+            # Complete sentences are emitted; the tail may continue on the next line
+            start = 0
+            for match in SENTENCE_END_RE.finditer(paragraph, scan_from):
+                yield paragraph[start:match.start()], " ", heading
+                start = match.end()
+            paragraph = paragraph[start:]
+
+            if len(paragraph) >= max_chars:
+                yield paragraph, " ", heading
+                paragraph = ""
+
+        if paragraph:
+            yield paragraph, "\n", heading
+
+    def iter_units(self, sentences: Iterable[Tuple]) -> Iterator[Optional[Tuple]]:
+        """
+        Window units (text, separator, tokens, heading) of sentences; part boundaries pass as None.
+
+        Sentences longer than a window are split with batch_packing.split_text.
+        """
+        for sentence, separator, heading in sentences:
+            if sentence is None:
+                yield None
+                continue
+            pieces = split_text(sentence, self.WINDOW_TOKENS)
+            for i, piece in enumerate(pieces):
+                yield piece, separator if i == len(pieces) - 1 else " ", estimate_tokens(piece), heading
+
+    def carry_over(self, window: List[Tuple], next_tokens: int = 0) -> List[Tuple]:
+        """Last units of a window (up to WINDOW_OVERLAP_TOKENS) that start the next window."""
+        carried = []
+        carried_tokens = 0
+        for unit in reversed(window):
+            if (carried_tokens + unit[2] > self.WINDOW_OVERLAP_TOKENS
+                    or carried_tokens + unit[2] + next_tokens > self.WINDOW_TOKENS):
+                break
+            carried.append(unit)
+            carried_tokens += unit[2]
+        return carried[::-1]
+
+    def iter_windows(
+        self,
+        lines: Iterable[str],
+        source_file: str,
+        carried: Iterable[Tuple] = (),
+        heading: Tuple = (None, None)
+    ) -> Iterator[RegulationChunk]:
+        """
+        Yield overlapping windows of whole sentences for text without section headers.
+
+        Each window holds up to WINDOW_TOKENS estimated tokens and starts with the last
+        sentences (up to WINDOW_OVERLAP_TOKENS) of the window before it, so a passage cut
+        at a window edge is whole in one of the two. A part boundary (see iter_sentences)
+        closes the window early, so each part can be chunked on its own from the units
+        carried into it (see split_windows).
+
+        Args:
+            lines: Text lines
+            source_file: Source file name
+            carried: Units the first window starts with (a part after the first)
+            heading: Heading in effect before the first line
+        """
+        window = list(carried)  # (text, separator, tokens, heading)
+        window_tokens = sum(unit[2] for unit in window)
+        fresh = 0  # Trailing units not included in an earlier window
+        index = 0
+
+        for unit in self.iter_units(self.iter_sentences(lines, heading)):
+            tokens = unit[2] if unit is not None else 0
+
+            if fresh and (unit is None or window_tokens + tokens > self.WINDOW_TOKENS):
+                chunk = self._create_window_chunk(index, window[len(window) - fresh:], window, source_file)
+                if chunk:
+                    index += 1
+                    yield chunk
+
+                # Carry the last sentences over as the start of the next window
+                window = self.carry_over(window, tokens)
+                window_tokens = sum(carried_unit[2] for carried_unit in window)
+                fresh = 0
+
+            if unit is not None:
+                window.append(unit)
+                window_tokens += tokens
+                fresh += 1
+
+        if fresh:
+            chunk = self._create_window_chunk(index, window[len(window) - fresh:], window, source_file)
+            if chunk:
+                yield chunk
+
+    def window_labels(self, source_file: str, index: int, label: Optional[str]) -> Tuple[str, str]:
+        """Chunk ID and citation of a sliding-window chunk."""
+        doc_prefix, citation_prefix = self.document_prefixes(source_file)
+        citation = f"{citation_prefix} § {label}" if label else citation_prefix
+        return f"{doc_prefix}_w{index}", citation
+
+    def _create_window_chunk(
+        self,
+        index: int,
+        fresh_units: List[Tuple],
+        window: List[Tuple],
+        source_file: str
+    ) -> Optional[RegulationChunk]:
+        """Create a RegulationChunk from a window; labeled by the heading its new text starts under."""
+        content = "".join(text + separator for text, separator, _, _ in window).strip()
+        if not content:
+            return None
 
-        return chunks
+        label, title = fresh_units[0][3]
+        section_title = title or Path(source_file).stem
+        chunk_id, citation = self.window_labels(source_file, index, label)
+
+        return RegulationChunk(
+            chunk_id=chunk_id,
+            content=content,
+            citation=citation,
+            section_title=section_title,
+            category=self.determine_category(-1, section_title),
+            state="Idaho",
+            effective_date="2025",  # Update with actual date from document
+            source_file=source_file,
+            window_index=index,
+            section_label=label
+        )
+
+    def document_prefixes(self, source_file: str) -> Tuple[str, str]:
+        """Chunk ID and citation prefixes for a source file."""
+        prefixes = self._document_prefixes.get(source_file)
+        if prefixes is None:
+            prefixes = self.DEFAULT_DOCUMENT_PREFIXES
+            for substring, doc_prefix, citation_prefix in self.DOCUMENT_PREFIXES:
+                if substring in source_file:
+                    prefixes = (doc_prefix, citation_prefix)
+                    break
+            self._document_prefixes[source_file] = prefixes
+        return prefixes
 
     def _create_chunk(
         self,
@@ -228,37 +586,7 @@ class IDAPATextProcessor:
         if "RESERVED" in section_title.upper():
             return None
 
-        # Determine document type from filename (more specific matching - longest first!)
-        if "IDAPA 16.02.19" in source_file:
-            doc_prefix = "idapa_16.02.19"
-            citation_prefix = "IDAPA 16.02.19"
-        elif "IDAPA 16.02.1" in source_file:
-            doc_prefix = "idapa_16.02.01"
-            citation_prefix = "IDAPA 16.02.01"
-        elif "IDAPA 16.05.01" in source_file:
-            doc_prefix = "idapa_16.05.01"
-            citation_prefix = "IDAPA 16.05.01"
-        elif "IDAPA 16.05.06" in source_file:
-            doc_prefix = "idapa_16.05.06"
-            citation_prefix = "IDAPA 16.05.06"
-        elif "IDAPA 16.txt" in source_file or "IDAPA 16 " in source_file:
-            doc_prefix = "idapa_16.03.22"
-            citation_prefix = "IDAPA 16.03.22"
-        elif "IDAPA 24.34.01" in source_file:
-            doc_prefix = "idapa_24.34.01"
-            citation_prefix = "IDAPA 24.34.01"
-        elif "IDAPA 24.39.30" in source_file:
-            doc_prefix = "idapa_24.39.30"
-            citation_prefix = "IDAPA 24.39.30"
-        elif "IDAPA 24" in source_file:
-            doc_prefix = "idapa_24"
-            citation_prefix = "IDAPA 24"
-        elif "TITLE 39" in source_file:
-            doc_prefix = "title_39"
-            citation_prefix = "TITLE 39"
-        else:
-            doc_prefix = "idaho_reg"
-            citation_prefix = "IDAPA"
+        doc_prefix, citation_prefix = self.document_prefixes(source_file)
 
         chunk_id = f"{doc_prefix}_{section_num}"
         citation = f"{citation_prefix}.{section_num:03d}"
@@ -272,37 +600,247 @@ class IDAPATextProcessor:
             category=category,
             state="Idaho",
             effective_date="2025",  # Update with actual date from document
-            source_file=source_file
+            source_file=source_file,
+            section_number=section_num
+        )
+
+    def relabel_chunk(self, chunk: RegulationChunk, source_file: str) -> RegulationChunk:
+        """The same section attributed to another source file (for byte-identical files)."""
+        doc_prefix, citation_prefix = self.document_prefixes(source_file)
+        section_num = chunk.section_number
+
+        parent_id = None
+        if chunk.window_index is not None:
+            chunk_id, citation = self.window_labels(source_file, chunk.window_index, chunk.section_label)
+        else:
+            chunk_id = f"{doc_prefix}_{section_num}"
+            citation = f"{citation_prefix}.{section_num:03d}"
+            if chunk.subsection is not None:
+                parent_id = chunk_id
+                chunk_id = f"{chunk_id}.{chunk.subsection}"
+                citation = f"{citation}.{chunk.subsection.split('_')[0]}"
+
+        return RegulationChunk(
+            chunk_id=chunk_id,
+            content=chunk.content,
+            citation=citation,
+            section_title=chunk.section_title,
+            category=chunk.category,
+            state=chunk.state,
+            effective_date=chunk.effective_date,
+            source_file=source_file,
+            section_number=section_num,
+            window_index=chunk.window_index,
+            section_label=chunk.section_label,
+            parent_id=parent_id,
+            subsection=chunk.subsection
         )
 
     def process_file(self, filename: str) -> List[RegulationChunk]:
         """Process a single regulation text file."""
+        return list(self.iter_file_chunks(filename))
+
+    def iter_file_chunks(self, filename: str) -> Iterator[RegulationChunk]:
+        """Yield a file's chunks while reading it line by line."""
         file_path = self.raw_data_dir / filename
 
         if not file_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        print(f"Processing {filename}...")
+        # Section chunking for IDAPA-style files, sliding windows for everything else
+        with open(file_path, 'r', encoding='utf-8') as f:
+            windowed = not self.has_section_headers(f)
+        chunker = self.iter_windows if windowed else self.iter_sections
+
+        print(f"Processing {filename}{' (sliding windows)' if windowed else ''}...")
 
+        # Time spent chunking only, not while the consumer holds the generator
+        count = 0
+        elapsed = 0.0
+        start = time.perf_counter()
         with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read()
+            for chunk in chunker(f, filename):
+                count += 1
+                elapsed += time.perf_counter() - start
+                yield chunk
+                start = time.perf_counter()
+        elapsed += time.perf_counter() - start
 
-        chunks = self.chunk_by_sections(text, filename)
+        megabytes = file_path.stat().st_size / 1024 / 1024
+        print(f"  Created {count} chunks from {filename} ({megabytes / elapsed if elapsed else 0:.1f} MB/s)")
 
-        print(f"  Created {len(chunks)} chunks from {filename}")
+    def process_all_files(self, workers: int = 1) -> Dict[str, List[RegulationChunk]]:
+        """
+        Process all source text files in the raw data directory (see source_files).
 
-        return chunks
+        Args:
+            workers: Processes to parse with (1 parses in this process, one file after
+                another); results are identical and in the same order either way
+        """
+        if workers > 1:
+            return self._process_files_parallel(self.source_files(), workers)
 
-    def process_all_files(self) -> Dict[str, List[RegulationChunk]]:
-        """Process all text files in the raw data directory."""
         all_chunks = {}
 
-        for txt_file in self.raw_data_dir.glob("*.txt"):
-            chunks = self.process_file(txt_file.name)
-            all_chunks[txt_file.name] = chunks
+        for filename in self.source_files():
+            all_chunks[filename] = self.process_file(filename)
+
+        return all_chunks
+
+    def split_at_sections(self, text: str, target_bytes: int) -> List[str]:
+        """
+        Split a file's text before section headers into parts of about target_bytes.
+
+        Cuts are only made at section headers after the first one (past the table of
+        contents), where chunk_by_sections closes a section anyway, so chunking the
+        parts one after another gives the same chunks as chunking the whole text.
+        """
+        lines = text.split('\n')
+
+        parts = []
+        start = 0
+        size = 0
+        seen_header = False
+
+        for i, line in enumerate(lines):
+            if SECTION_HEADER_RE.match(line.strip()):
+                if seen_header and size >= target_bytes:
+                    parts.append('\n'.join(lines[start:i]))
+                    start = i
+                    size = 0
+                seen_header = True
+            size += len(line) + 1
+
+        parts.append('\n'.join(lines[start:]))
+        return parts
+
+    def split_windows(self, text: str) -> List[Tuple[str, List[Tuple], Tuple]]:
+        """
+        Split text without section headers at the part boundaries of iter_sentences.
+
+        Returns (part text, carried units, heading) per part: the units the part's first
+        window starts with and the heading in effect where the part starts. Chunking the
+        parts with these (chunk_windows) gives the windows of the whole text, numbered
+        from 0 in each part.
+        """
+        lines = text.split('\n')
+
+        parts = []
+        start = 0
+        part_chars = 0
+        heading = (None, None)
+        carried, start_heading = [], heading
+        # (line, heading before it) where iter_sentences starts a paragraph
+        paragraph_starts = []
+        after_break = True
+
+        for i, line in enumerate(lines):
+            line_stripped = line.strip()
+            part_chars += len(line_stripped) + 1
+
+            match = None
+            if line_stripped[:1].isdigit():
+                match = NUMBERED_HEADING_RE.match(line_stripped)
+            if match or (line_stripped and after_break):
+                paragraph_starts.append((i, heading))
+            if match:
+                heading = (match.group(1), match.group(2).strip())
+            after_break = not line_stripped
+
+            if not line_stripped and part_chars >= self.WINDOW_PART_CHARS:
+                parts.append(('\n'.join(lines[start:i + 1]), carried, start_heading))
+                carried = self._carried_at(lines, i, paragraph_starts)
+                start, start_heading, part_chars = i + 1, heading, 0
+
+        parts.append(('\n'.join(lines[start:]), carried, start_heading))
+        return parts
+
+    def _carried_at(self, lines: List[str], end: int, paragraph_starts: List[Tuple]) -> List[Tuple]:
+        """Units carried over a part boundary at line end, from the paragraphs before it."""
+        units = []
+        # Enough whole paragraphs to hold more than the overlap, so the carried units are
+        # the same as when the window is closed there in one pass over the text
+        for line, heading in reversed(paragraph_starts):
+            sentences = self.iter_sentences(lines[line:end], heading)
+            units = [unit for unit in self.iter_units(sentences) if unit is not None]
+            if sum(unit[2] for unit in units) > self.WINDOW_OVERLAP_TOKENS:
+                break
+        return self.carry_over(units)
+
+    def chunk_windows(
+        self,
+        text: str,
+        source_file: str,
+        carried: Iterable[Tuple] = (),
+        heading: Tuple = (None, None)
+    ) -> List[RegulationChunk]:
+        """Split text without section headers (or one part of it, see split_windows) into sliding windows."""
+        return list(self.iter_windows(text.split('\n'), source_file, carried, heading))
+
+    def _process_files_parallel(self, filenames: List[str], workers: int) -> Dict[str, List[RegulationChunk]]:
+        """Chunk files (large ones in section- or window-aligned parts) across a process pool."""
+        work = []  # (filename, chunker, chunker arguments)
+        windowed = []
+        for filename in filenames:
+            with open(self.raw_data_dir / filename, 'r', encoding='utf-8') as f:
+                text = f.read()
+            if not self.has_section_headers(text.split('\n')):
+                windowed.append(filename)
+                for part, carried, heading in self.split_windows(text):
+                    work.append((filename, self.chunk_windows, (part, filename, carried, heading)))
+                continue
+            for part in self.split_at_sections(text, self.PARALLEL_SPLIT_BYTES):
+                work.append((filename, self.chunk_by_sections, (part, filename)))
+
+        print(f"Processing {len(filenames)} files as {len(work)} parts on {workers} processes...")
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(work)) or 1) as executor:
+            results = executor.map(
+                _run_chunker,
+                [chunker for _, chunker, _ in work],
+                [args for _, _, args in work]
+            )
+
+            # map() yields in submission order: files in glob order, parts in file order
+            all_chunks = {filename: [] for filename in filenames}
+            for (filename, _, _), chunks in zip(work, results):
+                all_chunks[filename].extend(chunks)
+
+        # Windows are numbered per part; renumber them through the file
+        for filename in windowed:
+            for index, chunk in enumerate(all_chunks[filename]):
+                chunk.window_index = index
+                chunk.chunk_id, chunk.citation = self.window_labels(filename, index, chunk.section_label)
+
+        for filename, chunks in all_chunks.items():
+            print(f"  Created {len(chunks)} chunks from {filename}")
 
         return all_chunks
 
+    def iter_all_chunks(
+        self,
+        filenames: Optional[List[str]] = None,
+        duplicate_files: Optional[Dict[str, List[str]]] = None
+    ) -> Iterator[RegulationChunk]:
+        """
+        Yield chunks file by file without collecting the whole corpus.
+
+        Args:
+            filenames: Files in the raw data directory (source_files, in
+                process_all_files order, if None)
+            duplicate_files: File -> byte-identical files (see dedup.group_identical_files);
+                identical files are not parsed again, their chunks are relabeled copies
+        """
+        if filenames is None:
+            filenames = self.source_files()
+        duplicate_files = duplicate_files or {}
+
+        for filename in filenames:
+            for chunk in self.iter_file_chunks(filename):
+                yield chunk
+                for duplicate in duplicate_files.get(filename, []):
+                    yield self.relabel_chunk(chunk, duplicate)
+
     def save_chunks(self, chunks: List[RegulationChunk], output_filename: str = "chunks.json"):
         """Save chunks to JSON file."""
         output_path = self.processed_data_dir / output_filename
@@ -333,6 +871,11 @@ class IDAPATextProcessor:
             print(f"{'-'*80}\n")
 
 
+def _run_chunker(chunker, args: Tuple) -> List[RegulationChunk]:
+    """Process pool entry point: call a bound chunking method on one part."""
+    return chunker(*args)
+
+
 def main():
     """Main processing pipeline."""
 
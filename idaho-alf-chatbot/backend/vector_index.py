@@ -0,0 +1,92 @@
+"""
+Vector index for Idaho ALF RegNavigator
+Chunk embeddings stacked into one unit-normalized matrix for vectorized cosine scoring.
+"""
+
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingMatrix:
+    """Unit-normalized chunk embeddings addressed by row in the engine's chunk list."""
+
+    def __init__(self, chunks: List[Dict]):
+        """
+        Stack the embeddings of every chunk that has one.
+
+        Args:
+            chunks: Index chunks (rows without an "embedding" are skipped)
+        """
+        rows = [row for row, chunk in enumerate(chunks) if "embedding" in chunk]
+        self.rows = np.asarray(rows, dtype=np.int64)
+
+        # chunk row -> matrix position (-1 for chunks without an embedding)
+        self.position = np.full(len(chunks), -1, dtype=np.int64)
+        self.position[self.rows] = np.arange(len(rows))
+
+        if rows:
+            matrix = np.asarray([chunks[row]["embedding"] for row in rows], dtype=np.float64)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = matrix / norms
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def _unit(query_embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(query_embedding, dtype=np.float64)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores(self, query_embedding: List[float], rows: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Cosine similarity of a query with chunk rows.
+
+        Args:
+            query_embedding: Query embedding
+            rows: Chunk rows to score (all embedded rows if None); each must have an embedding
+
+        Returns:
+            Similarities aligned with rows (or with self.rows)
+        """
+        if not len(self.rows):
+            return np.zeros(0 if rows is None else len(rows))
+
+        query = self._unit(query_embedding)
+        if rows is None:
+            return self.matrix @ query
+        return self.matrix[self.position[np.asarray(rows, dtype=np.int64)]] @ query
+
+    def ranked(
+        self,
+        query_embedding: List[float],
+        similarity_threshold: float = 0.0,
+        limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows at or above a similarity threshold, best first.
+
+        Args:
+            query_embedding: Query embedding
+            similarity_threshold: Minimum similarity
+            limit: Keep only the best rows (partial selection instead of a full sort)
+
+        Returns:
+            (chunk rows, similarities), ties kept in chunk order
+        """
+        similarities = self.scores(query_embedding)
+        keep = np.nonzero(similarities >= similarity_threshold)[0]
+
+        if limit is not None and len(keep) > limit:
+            keep = np.sort(keep[np.argpartition(-similarities[keep], limit - 1)[:limit]])
+
+        order = keep[np.argsort(-similarities[keep], kind="stable")]
+        return self.rows[order], similarities[order]
+
+    def similarity(self, row_a: int, row_b: int) -> float:
+        """Cosine similarity between two chunk rows."""
+        return float(self.matrix[self.position[row_a]] @ self.matrix[self.position[row_b]])
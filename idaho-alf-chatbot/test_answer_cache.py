@@ -0,0 +1,79 @@
+"""
+Checks for the semantic answer cache.
+
+A near-duplicate question that retrieves the same chunks from the same index gets the
+cached answer; anything else (another chunk set, index version or temperature) misses.
+A full cache evicts the answer used least recently, and a zero-size cache stores nothing.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from answer_cache import SemanticAnswerCache
+
+CHUNK_IDS = ["IDAPA_16.03.22_152", "IDAPA_16.03.22_600"]
+
+
+def test_near_duplicate_question_hits():
+    """A similar question with the same chunks, index and params reuses the answer."""
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.store([1.0, 0.1, 0.0], CHUNK_IDS, "v1", {"response": "answer"}, params=(0.3,))
+
+    hit = cache.lookup([1.0, 0.12, 0.0], list(reversed(CHUNK_IDS)), "v1", params=(0.3,))
+    assert hit is not None and hit["response"] == {"response": "answer"}
+    assert hit["chunk_ids"] == CHUNK_IDS
+
+    assert cache.lookup([0.0, 1.0, 0.0], CHUNK_IDS, "v1", params=(0.3,)) is None
+    assert cache.lookup([1.0, 0.1, 0.0], CHUNK_IDS[:1], "v1", params=(0.3,)) is None
+    assert cache.lookup([1.0, 0.1, 0.0], CHUNK_IDS, "v2", params=(0.3,)) is None
+    assert cache.lookup([1.0, 0.1, 0.0], CHUNK_IDS, "v1", params=(0.7,)) is None
+
+
+def test_full_cache_evicts_least_recently_used():
+    """Storing into a full cache drops the answer used least recently."""
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store([1.0, 0.0, 0.0], ["a"], "v1", {"response": "a"})
+    cache.store([0.0, 1.0, 0.0], ["b"], "v1", {"response": "b"})
+    assert cache.lookup([1.0, 0.0, 0.0], ["a"], "v1") is not None  # "b" is now least recently used
+    cache.store([0.0, 0.0, 1.0], ["c"], "v1", {"response": "c"})
+
+    assert cache.lookup([0.0, 1.0, 0.0], ["b"], "v1") is None
+    assert cache.lookup([1.0, 0.0, 0.0], ["a"], "v1")["response"] == {"response": "a"}
+    assert cache.lookup([0.0, 0.0, 1.0], ["c"], "v1")["response"] == {"response": "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_zero_size_cache_stores_nothing():
+    """max_entries=0 disables storing instead of failing."""
+    cache = SemanticAnswerCache(max_entries=0)
+    cache.store([1.0, 0.0], ["a"], "v1", {"response": "a"})
+    assert cache.lookup([1.0, 0.0], ["a"], "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cached_answer_is_a_copy():
+    """Callers changing a returned answer do not change the cached one."""
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], ["a"], "v1", {"response": "a", "citations": []})
+    cache.lookup([1.0, 0.0], ["a"], "v1")["response"]["citations"].append("changed")
+    assert cache.lookup([1.0, 0.0], ["a"], "v1")["response"]["citations"] == []
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_near_duplicate_question_hits,
+        test_full_cache_evicts_least_recently_used,
+        test_zero_size_cache_stores_nothing,
+        test_cached_answer_is_a_copy
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,98 @@
+"""
+Checks for the concurrent embedding client against the stand-in embedding server.
+
+Embeddings come back in input order (the server shuffles response items), requests in
+flight stay within the concurrency limit, oversized batches are split instead of failing,
+and throttled requests are retried.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from async_embeddings import AsyncEmbeddingClient
+from stub_embedding_server import StubEmbeddingServer, stub_embedding
+
+DIMENSIONS = 16
+
+
+def make_batches(count: int, size: int):
+    return [[f"chunk {batch} {item}" for item in range(size)] for batch in range(count)]
+
+
+def embed(server: StubEmbeddingServer, batches, **kwargs):
+    async def run():
+        async with AsyncEmbeddingClient(server.url, "key", "text-embedding-3-large", **kwargs) as client:
+            completed = []
+            results = await client.embed_batches(batches, on_batch=lambda index, _: completed.append(index))
+            return results, completed, client.stats()
+    return asyncio.run(run())
+
+
+def assert_embeddings_match(batches, results):
+    for texts, embeddings in zip(batches, results):
+        assert len(embeddings) == len(texts)
+        for text, embedding in zip(texts, embeddings):
+            assert embedding.dtype == np.float32
+            assert np.allclose(embedding, stub_embedding(text, DIMENSIONS), atol=1e-6), text
+
+
+def test_results_in_input_order_within_concurrency():
+    """Batches sent concurrently come back in order, with at most max_concurrency in flight."""
+    batches = make_batches(8, 5)
+    with StubEmbeddingServer(dimensions=DIMENSIONS, latency=0.02) as server:
+        results, completed, stats = embed(server, batches, max_concurrency=3)
+        server_stats = server.stats()
+
+    assert_embeddings_match(batches, results)
+    assert sorted(completed) == list(range(len(batches)))
+    assert stats["requests"] == len(batches)
+    assert 1 < server_stats["max_in_flight"] <= 3
+
+
+def test_float_list_responses():
+    """Responses without base64 encoding decode to the same vectors."""
+    batches = make_batches(2, 3)
+    with StubEmbeddingServer(dimensions=DIMENSIONS, latency=0.0) as server:
+        results, _, _ = embed(server, batches, encoding_format=None)
+    assert_embeddings_match(batches, results)
+
+
+def test_oversized_batch_split():
+    """A batch over the provider's item limit is split in halves and still returns in order."""
+    batches = make_batches(1, 10)
+    with StubEmbeddingServer(dimensions=DIMENSIONS, latency=0.0, max_items=4) as server:
+        results, _, stats = embed(server, batches)
+    assert_embeddings_match(batches, results)
+    assert stats["splits"] >= 2
+
+
+def test_throttled_requests_retried():
+    """429 responses are retried after the server's retry-after delay."""
+    batches = make_batches(4, 2)
+    with StubEmbeddingServer(dimensions=DIMENSIONS, latency=0.0, requests_per_second=2) as server:
+        results, _, stats = embed(server, batches, max_concurrency=4, backoff_base=0.05)
+    assert_embeddings_match(batches, results)
+    assert stats["throttled"] >= 1
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_results_in_input_order_within_concurrency,
+        test_float_list_responses,
+        test_oversized_batch_split,
+        test_throttled_requests_retried
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
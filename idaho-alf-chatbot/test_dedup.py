@@ -0,0 +1,106 @@
+"""
+Checks for ingest deduplication.
+
+Chunks with identical content are stored once: the first one is kept and later ones
+become its aliases, even when they turn up after the first was emitted. Byte-identical
+raw files are grouped, and citations of an alias still resolve in the citation graph.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from dedup import ChunkDeduplicator, group_identical_files
+from citation_graph import CitationGraph
+
+SHARED = "Each facility must post the resident rights in a conspicuous place."
+
+
+def make_chunk(number: int, content: str, source_file: str = "IDAPA 16.txt") -> dict:
+    return {
+        "chunk_id": f"IDAPA_16.03.22_{number}",
+        "citation": f"IDAPA 16.03.22.{number}",
+        "section_title": f"Section {number}",
+        "content": content,
+        "source_file": source_file
+    }
+
+
+def test_duplicates_become_aliases():
+    """Later chunks with the same content are dropped and listed on the first one."""
+    chunks = [
+        make_chunk(100, SHARED),
+        make_chunk(200, "Residents must receive thirty (30) calendar days notice of discharge."),
+        make_chunk(550, SHARED, source_file="IDAPA 16 copy.txt"),
+        make_chunk(551, SHARED, source_file="IDAPA 16 copy.txt")
+    ]
+    deduplicator = ChunkDeduplicator()
+    unique = deduplicator.apply(chunks)
+
+    assert [chunk["chunk_id"] for chunk in unique] == ["IDAPA_16.03.22_100", "IDAPA_16.03.22_200"]
+    assert unique[0]["aliases"] == [
+        {"chunk_id": "IDAPA_16.03.22_550", "citation": "IDAPA 16.03.22.550", "source_file": "IDAPA 16 copy.txt"},
+        {"chunk_id": "IDAPA_16.03.22_551", "citation": "IDAPA 16.03.22.551", "source_file": "IDAPA 16 copy.txt"}
+    ]
+    assert "aliases" not in unique[1]
+    assert "aliases" not in chunks[0]  # input chunks are not modified
+    assert deduplicator.stats()["duplicate_chunks"] == 2
+
+
+def test_aliases_found_after_chunk_emitted():
+    """A canonical chunk streamed out before its duplicate still gets the alias when written."""
+    deduplicator = ChunkDeduplicator()
+    first = make_chunk(100, SHARED)
+    assert deduplicator.add(first)
+    assert not deduplicator.add(make_chunk(550, SHARED))
+    assert [alias["chunk_id"] for alias in deduplicator.with_aliases(first)["aliases"]] == ["IDAPA_16.03.22_550"]
+
+
+def test_reingested_chunk_keeps_aliases():
+    """Chunks read back from an index keep their aliases; their own ID is not an alias."""
+    deduplicator = ChunkDeduplicator()
+    stored = dict(make_chunk(100, SHARED), aliases=[{"chunk_id": "IDAPA_16.03.22_550", "citation": "IDAPA 16.03.22.550"}])
+    unique = deduplicator.apply([stored, make_chunk(100, SHARED), make_chunk(551, SHARED)])
+
+    assert len(unique) == 1
+    assert [alias["chunk_id"] for alias in unique[0]["aliases"]] == ["IDAPA_16.03.22_550", "IDAPA_16.03.22_551"]
+
+
+def test_identical_files_grouped():
+    """Byte-identical raw files are grouped under the first one in processing order."""
+    with tempfile.TemporaryDirectory() as directory:
+        for name, text in (("a.txt", "rules"), ("b.txt", "other rules"), ("c.txt", "rules")):
+            (Path(directory) / name).write_text(text, encoding="utf-8")
+        assert group_identical_files(Path(directory), ["a.txt", "b.txt", "c.txt"]) == {"a.txt": ["c.txt"], "b.txt": []}
+
+
+def test_alias_citations_resolve_in_graph():
+    """A reference to an alias's section leads to the stored canonical chunk."""
+    unique = ChunkDeduplicator().apply([
+        make_chunk(100, "Admission follows Section 550 of these rules."),
+        make_chunk(200, SHARED),
+        make_chunk(550, SHARED)
+    ])
+    graph = CitationGraph.from_chunks(unique)
+    assert [ref["chunk_id"] for ref in graph.expand(["IDAPA_16.03.22_100"])] == ["IDAPA_16.03.22_200"]
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_duplicates_become_aliases,
+        test_aliases_found_after_chunk_emitted,
+        test_reingested_chunk_keeps_aliases,
+        test_identical_files_grouped,
+        test_alias_citations_resolve_in_graph
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
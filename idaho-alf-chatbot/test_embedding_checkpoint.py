@@ -0,0 +1,147 @@
+"""
+Checks for resuming an embedding job from its checkpoint.
+
+A job that fails part way keeps the batches it completed; the rerun only sends the
+rest to the provider and writes the same index a clean run would. A torn trailing
+record from a crash is dropped, not trusted.
+"""
+
+import io
+import sys
+import json
+import tempfile
+import contextlib
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from embeddings import ChunkEmbeddingManager, create_embedding_generator
+from embedding_checkpoint import EmbeddingCheckpoint, checkpoint_path
+from stub_embedding_server import StubEmbeddingServer, stub_embedding
+
+CHUNK_COUNT = 50
+BATCH_SIZE = 10
+
+
+def make_chunks():
+    return [
+        {
+            "chunk_id": f"IDAPA_16.03.22_{100 + i}",
+            "citation": f"IDAPA 16.03.22.{100 + i}",
+            "section_title": f"Section {100 + i}",
+            "content": f"Requirements of section {100 + i}."
+        }
+        for i in range(CHUNK_COUNT)
+    ]
+
+
+def make_generator(server: StubEmbeddingServer, fail_on_request: int = 0):
+    """Sequential generator for the stand-in server, raising on one request if asked."""
+    generator = create_embedding_generator("openai", api_key="key", api_url=server.url)
+    generator.create_async_client = None
+    generate = generator.generate_embeddings
+    calls = {"requests": 0}
+
+    def generate_embeddings(texts):
+        calls["requests"] += 1
+        if calls["requests"] == fail_on_request:
+            raise RuntimeError("connection reset")
+        return generate(texts)
+
+    generator.generate_embeddings = generate_embeddings
+    return generator
+
+
+def assert_index_complete(index_path: Path, chunks):
+    with open(index_path, 'r', encoding='utf-8') as f:
+        written = json.load(f)
+    assert [chunk["chunk_id"] for chunk in written] == [chunk["chunk_id"] for chunk in chunks]
+    for chunk in written:
+        assert np.allclose(chunk["embedding"], stub_embedding(chunk["content"], 64), atol=1e-6)
+
+
+def test_failed_job_resumes_from_checkpoint():
+    """A rerun after a failure embeds only the batches that had not completed."""
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        chunks = make_chunks()
+        with open(Path(directory) / "all_chunks.json", 'w', encoding='utf-8') as f:
+            json.dump(chunks, f)
+
+        with StubEmbeddingServer(dimensions=64, latency=0.0) as server:
+            failing = ChunkEmbeddingManager(make_generator(server, fail_on_request=3), directory)
+            try:
+                failing.embed_chunks(batch_size=BATCH_SIZE)
+                assert False, "the job should have failed"
+            except RuntimeError:
+                pass
+
+            index_path = Path(directory) / "chunks_with_embeddings.json"
+            assert not index_path.exists()
+            assert len(EmbeddingCheckpoint(checkpoint_path(index_path), "text-embedding-3-large")) == 2 * BATCH_SIZE
+
+            before = server.stats()["requests"]
+            ChunkEmbeddingManager(make_generator(server), directory).embed_chunks(batch_size=BATCH_SIZE)
+            assert server.stats()["requests"] - before == CHUNK_COUNT // BATCH_SIZE - 2
+
+        assert_index_complete(index_path, chunks)
+        assert not checkpoint_path(index_path).exists()
+
+
+def test_concurrent_resume_skips_checkpointed_chunks():
+    """The concurrent path also sends only chunks missing from the checkpoint."""
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        chunks = make_chunks()
+        index_path = Path(directory) / "chunks_with_embeddings.json"
+        checkpoint = EmbeddingCheckpoint(checkpoint_path(index_path), "text-embedding-3-large")
+        done = chunks[:20]
+        checkpoint.append([c["content"] for c in done], [stub_embedding(c["content"], 64) for c in done])
+
+        with StubEmbeddingServer(dimensions=64, latency=0.01) as server:
+            generator = create_embedding_generator("openai", api_key="key", api_url=server.url)
+            manager = ChunkEmbeddingManager(generator, directory)
+            manager.embed_chunk_list(chunks, BATCH_SIZE, concurrency=3, checkpoint=checkpoint, keep_embeddings=False)
+            assert server.stats()["requests"] == (CHUNK_COUNT - 20) // BATCH_SIZE
+
+        checkpoint.write_index(chunks, index_path)
+        checkpoint.close()
+        assert_index_complete(index_path, chunks)
+
+
+def test_torn_record_dropped():
+    """A partial last line left by a crash is truncated when the checkpoint is reopened."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "chunks_with_embeddings.json.checkpoint.jsonl"
+        checkpoint = EmbeddingCheckpoint(path, "text-embedding-3-large")
+        checkpoint.append(["first", "second"], [[0.5, 0.25], [0.125, 1.0]])
+        checkpoint.close()
+        with open(path, 'ab') as f:
+            f.write(b'{"hash": "abc", "embed')
+
+        reopened = EmbeddingCheckpoint(path, "text-embedding-3-large")
+        assert len(reopened) == 2 and "first" in reopened
+        assert np.allclose(reopened.get("second"), [0.125, 1.0])
+        reopened.close()
+
+        # Another model never reuses the records
+        other = EmbeddingCheckpoint(path, "voyage-3")
+        assert len(other) == 0
+        other.close()
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_failed_job_resumes_from_checkpoint,
+        test_concurrent_resume_skips_checkpointed_chunks,
+        test_torn_record_dropped
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
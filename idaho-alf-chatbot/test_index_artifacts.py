@@ -0,0 +1,84 @@
+"""
+Checks for the artifacts stored next to the index (citation graph, fact index).
+
+An artifact built from another chunk set (the index was rewritten without it) must be
+rebuilt on load instead of served.
+"""
+
+import io
+import sys
+import json
+import tempfile
+import contextlib
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from citation_graph import CITATION_GRAPH_FILE, build_citation_graph, load_or_build_citation_graph
+from fact_index import FACT_INDEX_FILE, FactIndex, build_fact_index, load_or_build_fact_index
+
+
+def make_chunks():
+    """Two sections of one document, the first citing the second."""
+    return [
+        {
+            "chunk_id": "IDAPA_16.03.22_100",
+            "citation": "IDAPA 16.03.22.100",
+            "section_title": "Admission",
+            "content": "Residents are admitted as described in Section 200 of these rules."
+        },
+        {
+            "chunk_id": "IDAPA_16.03.22_200",
+            "citation": "IDAPA 16.03.22.200",
+            "section_title": "Discharge",
+            "content": "A resident must receive thirty (30) calendar days notice of discharge."
+        }
+    ]
+
+
+def test_citation_graph_rebuilt_for_new_index():
+    """A citation graph stored for an older index is rebuilt and saved on load."""
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        index_path = Path(directory) / "chunks_with_embeddings.json"
+        chunks = make_chunks()
+        build_citation_graph(chunks, str(index_path.parent / CITATION_GRAPH_FILE))
+
+        graph = load_or_build_citation_graph(chunks, index_path)
+        assert graph.expand(["IDAPA_16.03.22_100"])[0]["chunk_id"] == "IDAPA_16.03.22_200"
+
+        # Index rewritten with a renamed target chunk
+        chunks[1]["chunk_id"] = "IDAPA_16.03.22_200_v2"
+        graph = load_or_build_citation_graph(chunks, index_path)
+        assert graph.expand(["IDAPA_16.03.22_100"])[0]["chunk_id"] == "IDAPA_16.03.22_200_v2"
+
+        with open(index_path.parent / CITATION_GRAPH_FILE, 'r', encoding='utf-8') as f:
+            assert json.load(f)["fingerprint"] == graph.fingerprint
+
+
+def test_fact_index_rebuilt_for_new_index():
+    """A fact index stored for an older index is never served; it is rebuilt on load."""
+    question = "How many days notice for discharge?"
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        index_path = Path(directory) / "chunks_with_embeddings.json"
+        chunks = make_chunks()
+        build_fact_index(chunks, str(index_path.parent / FACT_INDEX_FILE))
+        assert "thirty (30)" in load_or_build_fact_index(chunks, index_path).lookup(question)["answer"]
+
+        # Index rewritten with a changed notice period
+        chunks[1]["content"] = chunks[1]["content"].replace("thirty (30)", "fifteen (15)")
+        index = load_or_build_fact_index(chunks, index_path)
+        assert "fifteen (15)" in index.lookup(question)["answer"]
+        assert FactIndex.load(str(index_path.parent / FACT_INDEX_FILE)).fingerprint == index.fingerprint
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (test_citation_graph_rebuilt_for_new_index, test_fact_index_rebuilt_for_new_index):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
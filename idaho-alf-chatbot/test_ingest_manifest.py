@@ -0,0 +1,141 @@
+"""
+Checks for incremental ingestion driven by the ingest manifest.
+
+The manifest diff gives the exact added/changed/removed files (a new parser version
+counts as a change), and update_index applied to that delta leaves the same index and
+manifest as rebuilding from scratch, including aliases of identical files, while only
+embedding the chunks of affected files. Which copy of an identical chunk is stored
+depends on file order, so indexes are compared as groups of chunk and alias ids.
+"""
+
+import io
+import sys
+import json
+import shutil
+import tempfile
+import contextlib
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import ingest_manifest
+from ingest_manifest import MANIFEST_FILE, IngestManifest, update_index
+from embeddings import ChunkEmbeddingManager, create_embedding_generator
+from txt_processor import IDAPATextProcessor
+from stub_embedding_server import StubEmbeddingServer
+
+RAW_DIR = ROOT / "data" / "raw"
+CHANGED_FILE = "IDAPA 24.txt"
+COPIED_FILE = "IDAPA 16.05.06 criminal history background checks.txt"
+COPY = "criminal history background checks copy.txt"  # default chunk id prefix
+# Byte-identical files: chunks of the one parsed second are aliases of the first one's
+IDENTICAL_FILES = ("IDAPA 16.02.19 food code.txt", "IDAPA 24.39.30 rules of building safety.txt")
+
+
+def test_diff_reports_delta():
+    """diff sorts files into added, changed, removed and unchanged."""
+    with tempfile.TemporaryDirectory() as directory:
+        raw_dir = Path(directory)
+        for name in ("kept.txt", "edited.txt", "reparsed.txt", "new.txt"):
+            (raw_dir / name).write_text(name, encoding="utf-8")
+
+        manifest = IngestManifest(raw_dir / MANIFEST_FILE)
+        for name in ("kept.txt", "edited.txt", "reparsed.txt"):
+            manifest.record(raw_dir, name, [f"{name}_0"])
+        manifest.files["gone.txt"] = {"sha256": "0" * 64, "parser_version": ingest_manifest.PARSER_VERSION, "chunk_ids": []}
+        manifest.files["reparsed.txt"]["parser_version"] = "old parser"
+        manifest.save()
+        (raw_dir / "edited.txt").write_text("edited", encoding="utf-8")
+
+        delta = IngestManifest(raw_dir / MANIFEST_FILE).diff(raw_dir, ["kept.txt", "edited.txt", "reparsed.txt", "new.txt"])
+        assert delta == {
+            "added": ["new.txt"],
+            "changed": ["edited.txt", "reparsed.txt"],
+            "removed": ["gone.txt"],
+            "unchanged": ["kept.txt"]
+        }
+
+
+def index_contents(output_dir: Path):
+    """(content, (chunk_id, source_file) of the stored chunk and its aliases) per stored chunk, and the manifest."""
+    with open(output_dir / "chunks_with_embeddings.json", 'r', encoding='utf-8') as f:
+        chunks = json.load(f)
+    with open(output_dir / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    groups = sorted(
+        (
+            chunk["content"],
+            tuple(sorted(
+                [(chunk["chunk_id"], chunk["source_file"])]
+                + [(alias["chunk_id"], alias["source_file"]) for alias in chunk.get("aliases", [])]
+            ))
+        )
+        for chunk in chunks
+    )
+    return groups, manifest
+
+
+def source_files(groups) -> set:
+    return {source_file for _, members in groups for _, source_file in members}
+
+
+def run_update(server: StubEmbeddingServer, raw_dir: Path, output_dir: Path) -> dict:
+    generator = create_embedding_generator("openai", api_key="key", api_url=server.url)
+    processor = IDAPATextProcessor(str(raw_dir), str(output_dir))
+    manager = ChunkEmbeddingManager(generator, str(output_dir))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return update_index(processor, manager, output_dir / "chunks_with_embeddings.json")
+
+
+def test_update_index_matches_full_rebuild():
+    """Changing, removing and adding files updates the index to what a rebuild produces."""
+    with tempfile.TemporaryDirectory() as directory:
+        raw_dir, output_dir, rebuilt_dir = (Path(directory) / name for name in ("raw", "out", "rebuilt"))
+        for path in (raw_dir, output_dir, rebuilt_dir):
+            path.mkdir()
+        for name in (CHANGED_FILE, COPIED_FILE) + IDENTICAL_FILES:
+            shutil.copy(RAW_DIR / name, raw_dir / name)
+
+        with StubEmbeddingServer(latency=0.0) as server:
+            first = run_update(server, raw_dir, output_dir)
+            assert len(first["added_files"]) == 4
+            groups, _ = index_contents(output_dir)
+            aliased = [members for _, members in groups if len(members) > 1]
+            assert aliased and all({file for _, file in members} == set(IDENTICAL_FILES) for members in aliased)
+
+            assert run_update(server, raw_dir, output_dir)["chunks"] is None  # nothing to do
+
+            # Edit one file, remove one of the identical pair, add a copy of another
+            changed = raw_dir / CHANGED_FILE
+            changed.write_text(changed.read_text(encoding="utf-8").replace("Board", "Bored", 3), encoding="utf-8")
+            (raw_dir / IDENTICAL_FILES[0]).unlink()
+            shutil.copy(raw_dir / COPIED_FILE, raw_dir / COPY)
+
+            report = run_update(server, raw_dir, output_dir)
+            assert report["added_files"] == [COPY]
+            assert report["changed_files"] == [CHANGED_FILE]
+            assert report["removed_files"] == [IDENTICAL_FILES[0]]
+            assert COPIED_FILE not in report["reparsed_files"]
+            assert 0 < report["embedded_chunks"] < report["chunks"]
+
+            run_update(server, raw_dir, rebuilt_dir)
+
+        groups, manifest = index_contents(output_dir)
+        assert (groups, manifest) == index_contents(rebuilt_dir)
+        assert IDENTICAL_FILES[0] not in source_files(groups) | set(manifest["files"])
+        assert IDENTICAL_FILES[1] in source_files(groups)
+        aliased = [members for _, members in groups if len(members) > 1]
+        assert aliased and all({file for _, file in members} == {COPIED_FILE, COPY} for members in aliased)
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (test_diff_reports_delta, test_update_index_matches_full_rebuild):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
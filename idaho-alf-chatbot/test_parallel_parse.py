@@ -0,0 +1,79 @@
+"""
+Checks that parsing across a process pool gives exactly the sequential chunks.
+
+Large files are cut into parts at section headers (or window boundaries for files
+without headers) and chunked in separate processes; the chunks, their IDs and window
+numbering must match parsing each file in one piece.
+"""
+
+import io
+import sys
+import tempfile
+import contextlib
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from txt_processor import IDAPATextProcessor
+
+RAW_DIR = ROOT / "data" / "raw"
+SECTIONED_FILE = "IDAPA 16.txt"
+WINDOWED_FILE = "ADA Accessibility Guidelines for Buildings and Facilities.txt"
+
+
+def as_dicts(all_chunks: dict) -> dict:
+    return {filename: [chunk.to_dict() for chunk in chunks] for filename, chunks in all_chunks.items()}
+
+
+def parse(processor: IDAPATextProcessor, workers: int) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return as_dicts(processor.process_all_files(workers=workers))
+
+
+def assert_same_chunks(sequential: dict, parallel: dict):
+    assert list(parallel) == list(sequential)
+    for filename, chunks in sequential.items():
+        assert len(parallel[filename]) == len(chunks), filename
+        for expected, chunk in zip(chunks, parallel[filename]):
+            assert chunk == expected, (filename, expected["chunk_id"], chunk["chunk_id"])
+
+
+def test_parallel_parse_matches_sequential():
+    """Every raw file parses to the same chunks, in the same order, with two processes."""
+    with tempfile.TemporaryDirectory() as directory:
+        processor = IDAPATextProcessor(str(RAW_DIR), directory)
+        assert_same_chunks(parse(processor, 1), parse(processor, 2))
+
+
+def test_small_parts_match_sequential():
+    """Cutting files into many small parts still reproduces sections and window numbering."""
+    with tempfile.TemporaryDirectory() as directory:
+        processor = IDAPATextProcessor(str(RAW_DIR), directory)
+        # Part boundaries also close windows when parsing sequentially
+        processor.PARALLEL_SPLIT_BYTES = 8 * 1024
+        processor.WINDOW_PART_CHARS = 4 * 1024
+        filenames = [SECTIONED_FILE, WINDOWED_FILE]
+        with contextlib.redirect_stdout(io.StringIO()):
+            sequential = as_dicts({filename: processor.process_file(filename) for filename in filenames})
+
+        with open(RAW_DIR / WINDOWED_FILE, 'r', encoding='utf-8') as f:
+            assert len(processor.split_windows(f.read())) > 4
+        with open(RAW_DIR / SECTIONED_FILE, 'r', encoding='utf-8') as f:
+            assert len(processor.split_at_sections(f.read(), processor.PARALLEL_SPLIT_BYTES)) > 4
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            parallel = as_dicts(processor._process_files_parallel(filenames, 2))
+        assert_same_chunks(sequential, parallel)
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (test_parallel_parse_matches_sequential, test_small_parts_match_sequential):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,76 @@
+"""
+Checks for the memoized prompt context blocks.
+
+A cached block renders exactly what render_block would, numbered contexts match the
+blocks joined by hand, and a full cache evicts the block used least recently.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from prompt_context import PromptBlockCache, STYLE_BASIC, STYLE_IMPROVED, build_context, render_block
+
+
+def make_chunk(number: int) -> dict:
+    return {
+        "chunk_id": f"IDAPA_16.03.22_{number}",
+        "citation": f"IDAPA 16.03.22.{number}",
+        "section_title": f"Section {number}",
+        "content": f"Requirements of section {number}. " * 20
+    }
+
+
+def test_cached_blocks_match_rendering():
+    """Hits return the same text as rendering the chunk again, for both styles."""
+    blocks = PromptBlockCache()
+    chunk = make_chunk(100)
+    for style in (STYLE_BASIC, STYLE_IMPROVED):
+        first = blocks.block(chunk, 200, style)
+        assert blocks.block(chunk, 200, style) == first == render_block(chunk, 200, style)
+    assert blocks.stats()["hits"] == 2 and blocks.stats()["misses"] == 2
+
+
+def test_build_context_numbers_blocks():
+    """The joined context numbers blocks in retrieval order."""
+    chunks = [make_chunk(300), make_chunk(100)]
+    context = build_context(chunks, PromptBlockCache(), 200, STYLE_IMPROVED)
+    assert context == (
+        f"\n[1] {render_block(chunks[0], 200, STYLE_IMPROVED)}"
+        f"\n\n[2] {render_block(chunks[1], 200, STYLE_IMPROVED)}"
+    )
+
+
+def test_full_cache_evicts_least_recently_used():
+    """Rendering into a full cache drops the block used least recently."""
+    blocks = PromptBlockCache(max_entries=2)
+    first, second, third = make_chunk(100), make_chunk(200), make_chunk(300)
+    blocks.block(first, 200, STYLE_BASIC)
+    blocks.block(second, 200, STYLE_BASIC)
+    blocks.block(first, 200, STYLE_BASIC)  # second is now least recently used
+    blocks.block(third, 200, STYLE_BASIC)
+
+    stats = blocks.stats()
+    assert stats["blocks"] == 2 and stats["evictions"] == 1
+    blocks.block(first, 200, STYLE_BASIC)
+    assert blocks.stats()["hits"] == stats["hits"] + 1
+    blocks.block(second, 200, STYLE_BASIC)
+    assert blocks.stats()["misses"] == stats["misses"] + 1
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_cached_blocks_match_rendering,
+        test_build_context_numbers_blocks,
+        test_full_cache_evicts_least_recently_used
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
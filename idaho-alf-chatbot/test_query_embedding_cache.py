@@ -0,0 +1,89 @@
+"""
+Checks for the query embedding cache (in-memory LRU tier plus shared SQLite tier).
+
+Trivially different questions share an entry, the memory tier evicts the least recently
+used entry, expired entries are never served, and a new worker finds embeddings in the
+SQLite tier as the same float32 vectors the memory tier returns.
+"""
+
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from embedding_cache import QueryEmbeddingCache
+
+MODEL = "text-embedding-3-large"
+
+
+def test_normalized_questions_share_an_entry():
+    """Case and whitespace differences hit the same entry."""
+    cache = QueryEmbeddingCache(max_entries=4)
+    cache.put(MODEL, "How many  residents per caregiver?", [0.25, 0.5])
+    assert cache.get(MODEL, "how many residents per caregiver?") is not None
+    assert cache.get("voyage-3", "how many residents per caregiver?") is None
+
+
+def test_memory_tier_evicts_least_recently_used():
+    """A full memory tier drops the entry used least recently, not the oldest one."""
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put(MODEL, "first", [1.0, 0.0])
+    cache.put(MODEL, "second", [0.0, 1.0])
+    assert cache.get(MODEL, "first") is not None  # "second" is now least recently used
+    cache.put(MODEL, "third", [1.0, 1.0])
+
+    assert cache.get(MODEL, "second") is None
+    assert cache.get(MODEL, "first") is not None
+    assert cache.get(MODEL, "third") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_not_served():
+    """Entries older than the TTL are misses in both tiers."""
+    with tempfile.TemporaryDirectory() as directory:
+        disk_path = str(Path(directory) / "query_embedding_cache.sqlite")
+        cache = QueryEmbeddingCache(max_entries=4, ttl_seconds=0.05, disk_path=disk_path)
+        cache.put(MODEL, "question", [0.5, 0.5])
+        time.sleep(0.1)
+
+        assert cache.get(MODEL, "question") is None
+        assert QueryEmbeddingCache(ttl_seconds=0.05, disk_path=disk_path).get(MODEL, "question") is None
+
+
+def test_disk_tier_shared_with_new_worker():
+    """A second cache on the same file serves the embedding as the same float32 vector."""
+    with tempfile.TemporaryDirectory() as directory:
+        disk_path = str(Path(directory) / "query_embedding_cache.sqlite")
+        QueryEmbeddingCache(disk_path=disk_path).put(MODEL, "question", [0.1, 0.2, 0.3])
+
+        worker = QueryEmbeddingCache(disk_path=disk_path)
+        from_disk = worker.get(MODEL, "question")
+        from_memory = worker.get(MODEL, "question")
+        stats = worker.stats()
+
+        assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+        for embedding in (from_disk, from_memory):
+            assert isinstance(embedding, np.ndarray) and embedding.dtype == np.float32
+            assert np.allclose(embedding, [0.1, 0.2, 0.3])
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_normalized_questions_share_an_entry,
+        test_memory_tier_evicts_least_recently_used,
+        test_expired_entries_not_served,
+        test_disk_tier_shared_with_new_worker
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
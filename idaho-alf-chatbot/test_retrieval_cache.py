@@ -0,0 +1,75 @@
+"""
+Checks for the retrieval result cache.
+
+Keys round the query vector, so float noise from the provider still hits, while any
+search parameter (including the rerank budget) or index version gives another key.
+A full cache evicts the result list used least recently.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from retrieval_cache import RetrievalCache
+
+QUERY = [0.12345, -0.5, 0.75]
+
+
+def test_key_rounds_query_vector():
+    """Query vectors equal after quantization share a key."""
+    cache = RetrievalCache(quantization_scale=1000)
+    key = cache.make_key(QUERY, "v1", top_k=5)
+    assert cache.make_key([0.1234501, -0.5000001, 0.75], "v1", top_k=5) == key
+    assert cache.make_key([0.125, -0.5, 0.75], "v1", top_k=5) != key
+
+
+def test_key_covers_parameters_and_index_version():
+    """Another index version or search parameter never reuses a cached result."""
+    cache = RetrievalCache()
+    key = cache.make_key(QUERY, "v1", top_k=5, rerank_budget_ms=25.0)
+    assert cache.make_key(QUERY, "v1", rerank_budget_ms=25.0, top_k=5) == key
+    assert cache.make_key(QUERY, "v2", top_k=5, rerank_budget_ms=25.0) != key
+    assert cache.make_key(QUERY, "v1", top_k=8, rerank_budget_ms=25.0) != key
+    assert cache.make_key(QUERY, "v1", top_k=5, rerank_budget_ms=5.0) != key
+
+
+def test_full_cache_evicts_least_recently_used():
+    """Storing into a full cache drops the result list used least recently."""
+    cache = RetrievalCache(max_entries=2)
+    cache.put("a", [(0, 0.9, None)])
+    cache.put("b", [(1, 0.8, None)])
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", [(2, 0.7, {"retained": True})])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [(0, 0.9, None)]
+    assert cache.get("c") == [(2, 0.7, {"retained": True})]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_drops_everything():
+    """Swapping the index invalidates every cached result."""
+    cache = RetrievalCache()
+    cache.put("a", [(0, 0.9, None)])
+    cache.invalidate()
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_key_rounds_query_vector,
+        test_key_covers_parameters_and_index_version,
+        test_full_cache_evicts_least_recently_used,
+        test_invalidate_drops_everything
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,97 @@
+"""
+Checks for server-side conversation sessions.
+
+Sessions evicted from the in-memory LRU spill to SQLite and come back intact, a turn
+recorded on a session evicted meanwhile is kept, and session IDs the store did not
+create are unknown rather than silently created.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from sessions import MAX_PENDING_MESSAGES, SessionStore
+
+
+def test_evicted_session_restored_from_spill():
+    """A session pushed out of memory is restored with its summary, turns and rows."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(max_sessions=1, spill_path=str(Path(directory) / "sessions.sqlite"))
+        first = store.create()
+        store.record_turn(first, "What is the staffing ratio?", "One per ...", [3, 7], "v1")
+        store.create()  # evicts first
+
+        restored = store.get(first.session_id)
+        assert restored is not first
+        assert restored.turns == 1 and restored.retained_rows == [3, 7]
+        assert restored.pending[0]["content"] == "What is the staffing ratio?"
+        assert store.prior_rows(restored, "v1") == [3, 7]
+        assert store.prior_rows(restored, "v2") is None
+        assert store.stats()["restored"] == 1
+
+
+def test_turn_on_evicted_session_kept():
+    """Recording a turn on a session that was spilled meanwhile does not lose the turn."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(max_sessions=1, spill_path=str(Path(directory) / "sessions.sqlite"))
+        session = store.create()
+        store.create()  # evicts session while its request is still running
+
+        store.record_turn(session, "question", "answer", [1], "v1")
+        assert store.get(session.session_id).turns == 1
+
+        # Evicted and restored by another request: the restored copy gets the turn
+        store.create()
+        restored = store.get(session.session_id)
+        store.record_turn(session, "follow-up", "answer", [2], "v1", rows_reused=0)
+        assert restored.turns == 2 and restored.retained_rows == [2]
+        assert store.get(session.session_id) is restored
+
+
+def test_unknown_session_ids_not_created():
+    """get() only returns sessions created by the store; deleted ones are gone."""
+    store = SessionStore()
+    assert store.get("client-chosen-id") is None
+
+    session = store.create()
+    assert store.get(session.session_id) is session
+    assert store.delete(session.session_id)
+    assert store.get(session.session_id) is None
+    assert not store.delete(session.session_id)
+
+
+def test_summary_keeps_messages_recorded_meanwhile():
+    """Finishing a summary drops only the messages it covered."""
+    store = SessionStore()
+    session = store.create()
+    for turn in range(MAX_PENDING_MESSAGES):
+        store.record_turn(session, f"question {turn}", f"answer {turn}", [], "v1")
+    assert len(session.pending) == MAX_PENDING_MESSAGES
+
+    prompt, covered = store.start_summary(session)
+    assert store.start_summary(session) is None  # already being summarized
+    store.record_turn(session, "late question", "late answer", [], "v1")
+    store.finish_summary(session, "Discussed staffing.", covered)
+
+    assert session.summary == "Discussed staffing."
+    assert [message["content"] for message in session.pending] == ["late question", "late answer"]
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_evicted_session_restored_from_spill,
+        test_turn_on_evicted_session_kept,
+        test_unknown_session_ids_not_created,
+        test_summary_keeps_messages_recorded_meanwhile
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
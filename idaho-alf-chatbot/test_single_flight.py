@@ -0,0 +1,123 @@
+"""
+Checks for single-flight coalescing of identical /query requests.
+
+Concurrent callers with one key share a single run and its result, a cancelled leader
+request does not cancel the run its followers wait on, errors reach every caller, and
+a finished key starts a new run.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from single_flight import SingleFlight
+
+
+class Work:
+    """Counts runs; each run waits until released."""
+
+    def __init__(self, result=None, error=None):
+        self.runs = 0
+        self.release = None
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def _start(flight: SingleFlight, work: Work, callers: int, **kwargs):
+    """Start callers on one key and let them all reach the in-flight run."""
+    work.release = asyncio.Event()
+    tasks = [asyncio.ensure_future(flight.do("key", work, **kwargs)) for _ in range(callers)]
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_concurrent_callers_share_one_result():
+    """Three identical requests run the work once and get the same result."""
+    async def run():
+        flight = SingleFlight()
+        work = Work(result={"usage": {"provider_calls": {"embedding": 1, "llm": 1}}})
+        tasks = await _start(flight, work, 3, provider_calls=lambda r: sum(r["usage"]["provider_calls"].values()))
+        work.release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert work.runs == 1
+        assert all(result is results[0] for result in results)
+        stats = flight.stats()
+        assert stats["leaders"] == 1 and stats["followers"] == 2
+        assert stats["provider_calls_saved"] == 4
+        assert stats["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_keeps_followers_running():
+    """Cancelling the first request still delivers the shared result to the others."""
+    async def run():
+        flight = SingleFlight()
+        work = Work(result="answer")
+        leader, follower = await _start(flight, work, 2)
+        leader.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+
+        assert await follower == "answer"
+        assert leader.cancelled()
+        assert work.runs == 1
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_caller():
+    """A failed run raises in the leader and in each follower."""
+    async def run():
+        flight = SingleFlight()
+        work = Work(error=RuntimeError("provider down"))
+        tasks = await _start(flight, work, 2)
+        work.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.stats()["shared_errors"] == 1
+
+    asyncio.run(run())
+
+
+def test_finished_key_runs_again():
+    """A request arriving after the run finished starts a new run."""
+    async def run():
+        flight = SingleFlight()
+        work = Work(result="answer")
+        for _ in range(2):
+            (task,) = await _start(flight, work, 1)
+            work.release.set()
+            await task
+        assert work.runs == 2 and flight.stats()["followers"] == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_concurrent_callers_share_one_result,
+        test_cancelled_leader_keeps_followers_running,
+        test_errors_reach_every_caller,
+        test_finished_key_runs_again
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)
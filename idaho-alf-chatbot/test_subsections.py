@@ -0,0 +1,119 @@
+"""
+Checks for subsection chunks and how hits on them roll up to their section.
+
+Hits on numbered subsections become one result per section at the position of its best
+hit, and prompts carry the matched subsections in document order, also in sections
+whose numbering restarts ("01." to "03.", then "01." again).
+"""
+
+import io
+import sys
+import contextlib
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from subsections import prompt_chunk, roll_up, subsection_citations, subsection_order
+from txt_processor import IDAPATextProcessor
+
+# Section 100 numbers 01.-02., then restarts at 01. (ids of the second run end in "_2")
+SECTION_ID = "IDAPA_16.03.22_100"
+CHILD_IDS = ["IDAPA_16.03.22_100.01", "IDAPA_16.03.22_100.02", "IDAPA_16.03.22_100.01_2", "IDAPA_16.03.22_100.02_2"]
+
+
+def make_chunks() -> dict:
+    chunks = [
+        {"chunk_id": SECTION_ID, "citation": "IDAPA 16.03.22.100", "section_title": "Staffing", "content": "100. STAFFING."},
+        {"chunk_id": "IDAPA_16.03.22_200", "citation": "IDAPA 16.03.22.200", "section_title": "Discharge", "content": "200. DISCHARGE."}
+    ]
+    for position, chunk_id in enumerate(CHILD_IDS):
+        label = chunk_id.rsplit(".", 1)[1]
+        chunks.append({
+            "chunk_id": chunk_id,
+            "parent_id": SECTION_ID,
+            "citation": f"IDAPA 16.03.22.100.{label[:2]}",
+            "section_title": "Staffing",
+            "content": f"subsection {position}"
+        })
+    return {chunk["chunk_id"]: chunk for chunk in chunks}
+
+
+def hit(chunks_by_id: dict, chunk_id: str, similarity: float) -> dict:
+    return {"chunk": chunks_by_id[chunk_id], "similarity": similarity}
+
+
+def test_hits_roll_up_to_sections():
+    """Subsection hits merge into their section at the rank of the best one."""
+    chunks_by_id = make_chunks()
+    results = list(roll_up([
+        hit(chunks_by_id, CHILD_IDS[3], 0.9),
+        hit(chunks_by_id, "IDAPA_16.03.22_200", 0.8),
+        hit(chunks_by_id, CHILD_IDS[0], 0.7),
+        hit(chunks_by_id, SECTION_ID, 0.6)
+    ], chunks_by_id))
+
+    assert [result["chunk"]["chunk_id"] for result in results] == [SECTION_ID, "IDAPA_16.03.22_200"]
+    assert results[0]["similarity"] == 0.9
+    assert results[0]["subsections"] == [CHILD_IDS[3], CHILD_IDS[0]]
+    assert "subsections" not in results[1]
+
+
+def test_whole_section_hit_and_exclusions():
+    """A section that matched whole stays whole; excluded sections are skipped."""
+    chunks_by_id = make_chunks()
+    hits = [hit(chunks_by_id, SECTION_ID, 0.9), hit(chunks_by_id, CHILD_IDS[1], 0.8)]
+    (result,) = roll_up(hits, chunks_by_id)
+    assert "subsections" not in result and prompt_chunk(result, chunks_by_id) is result["chunk"]
+
+    assert list(roll_up(hits, chunks_by_id, exclude_ids=[SECTION_ID])) == []
+
+
+def test_prompt_keeps_document_order_across_restarts():
+    """Matched subsections are rendered in document order, restarted numbering included."""
+    chunks_by_id = make_chunks()
+    result = {"chunk": chunks_by_id[SECTION_ID], "similarity": 0.9, "subsections": [CHILD_IDS[2], CHILD_IDS[1], CHILD_IDS[0]]}
+
+    chunk = prompt_chunk(result, chunks_by_id)
+    assert chunk["content"] == "subsection 0\nsubsection 1\nsubsection 2"
+    assert chunk["chunk_id"] == SECTION_ID + "#01+02+01_2"
+    assert chunk["citation"] == "IDAPA 16.03.22.100"
+    assert subsection_citations(result, chunks_by_id) == [
+        "IDAPA 16.03.22.100.01", "IDAPA 16.03.22.100.02", "IDAPA 16.03.22.100.01"
+    ]
+
+
+def test_parsed_subsections_sort_in_document_order():
+    """In the parsed corpus, subsection ids are unique and sort back into parse order."""
+    processor = IDAPATextProcessor(str(ROOT / "data" / "raw"), str(ROOT / "data" / "processed"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = [chunk.to_dict() for chunk in processor.iter_all_chunks()]
+
+    ids = [chunk["chunk_id"] for chunk in chunks]
+    assert len(ids) == len(set(ids))
+
+    children = {}
+    for chunk in chunks:
+        if "parent_id" in chunk:
+            children.setdefault(chunk["parent_id"], []).append(chunk["chunk_id"])
+    assert set(children) <= set(ids)
+    assert any("_" in child_id.rsplit(".", 1)[1] for child_ids in children.values() for child_id in child_ids)
+    for child_ids in children.values():
+        assert sorted(child_ids, key=subsection_order) == child_ids, child_ids
+
+
+if __name__ == "__main__":
+    failed = False
+    for check in (
+        test_hits_roll_up_to_sections,
+        test_whole_section_hit_and_exclusions,
+        test_prompt_keeps_document_order_across_restarts,
+        test_parsed_subsections_sort_in_document_order
+    ):
+        try:
+            check()
+            print(f"✅ PASS: {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ FAIL: {check.__doc__}\n   {e}")
+    sys.exit(1 if failed else 0)